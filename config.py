@@ -5,3 +5,11 @@ AMOUNT_OF_QUERY2_WORKERS = 5
 AMOUNT_OF_QUERY3_WORKERS = 5
 AMOUNT_OF_QUERY5_WORKERS = 5
 AMOUNT_OF_DOCTOR = 4
+# queues not kept on the broker disk: their messages are lost if the broker
+# restarts. Publishers to them should list them in TRANSIENT_ROUTES
+TRANSIENT_QUEUES = []
+# queues paged to disk right away instead of held in memory (long backlogs)
+LAZY_QUEUES = []
+# the local broker (server/utils/middleware/localBroker.py) stands in for
+# RabbitMQ and every component runs with MIDDLEWARE=local
+LOCAL_BROKER = False
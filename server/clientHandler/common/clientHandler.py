@@ -7,6 +7,8 @@ from multiprocessing import Semaphore
 from utils.protocolHandler import ProtocolHandler
 from utils.TCPhandler import SocketBroken
 from common.queryManager import QueryManager, QUERY1_ID, QUERY2_ID, QUERY3_ID, QUERY5_ID
+from utils.middleware.middleware import new_middleware, ASYNC, BLOCKING
+from utils.middleware.middlewarePool import MiddlewarePool
 
 REVIEW_REACTION_DELAY_SCALER = 0.4
 BOOK_REACTION_DELAY_SCALER = 0.1
@@ -22,6 +24,8 @@ class ClientHandler:
         self._server_socket.listen(1)
         self._server_on = True
         self.max_users = config_params['max_users']
+        self.review_compression = config_params['review_compression']
+        self.columnar_chunks = config_params['columnar_chunks']
         self._semaphore = Semaphore(value=self.max_users)
         self._threads = []
         self._thread_stoppers = []
@@ -32,6 +36,16 @@ class ClientHandler:
             QUERY5_ID: config_params['n_workers_q5']
         }
 
+        backend = config_params['middleware_backend']
+        if backend == ASYNC:
+            # its publishes are sent by the consuming loop, query managers never start one
+            logging.warning('action: config | async middleware does not publish without consuming, using blocking')
+            backend = BLOCKING
+        publish_window = config_params['publish_window']
+        # one connection per pooled middleware, shared by every client thread
+        self.pool = MiddlewarePool(lambda: new_middleware(backend, publish_window=publish_window),
+                                   size=config_params['pool_size'])
+
     def run(self):
         logging.info('action: run_server')
         while self._server_on:
@@ -44,6 +58,7 @@ class ClientHandler:
 
         self._server_socket.close()
         logging.debug('action: release_socket | result: success')
+        self.pool.close()
         logging.info('action: stop_server | result: success')
 
     def connect(self, client_sock):
@@ -74,7 +89,9 @@ class ClientHandler:
         try:
             client_id = protocolHandler.wait_handshake()
             logging.info(f'action: handle_client | ip: {addr} | uuid: {str(client_id)}')
-            manager = QueryManager(client_id, workers_by_query=self.workers_by_query)
+            manager = QueryManager(client_id, workers_by_query=self.workers_by_query, pool=self.pool,
+                                   review_compression=self.review_compression,
+                                   columnar=self.columnar_chunks)
             keep_reading = True
             while keep_reading and not event_stop.is_set():
                 t, msg_id, value = protocolHandler.read()
@@ -96,7 +113,6 @@ class ClientHandler:
                     keep_reading = False
                     logging.debug('action: review_eof | value: EOF | result: success')
                 protocolHandler.ack()
-            manager.stop()
         except (SocketBroken, OSError) as e:
             logging.error(f'action: receive_message | result: fail | error: {str(e) or repr(e)}')
 
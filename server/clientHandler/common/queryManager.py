@@ -1,6 +1,5 @@
 from model.book import Book
 from common.sharder import shard
-from utils.middleware.middleware import Middleware
 from utils.serializer.q1InSerializer import Q1InSerializer              # type: ignore
 from utils.serializer.q2InSerializer import Q2InSerializer              # type: ignore
 from utils.serializer.q3BookInSerializer import Q3BookInSerializer      # type: ignore
@@ -8,11 +7,10 @@ from utils.serializer.q3ReviewInSerializer import Q3ReviewInSerializer  # type:
 from utils.serializer.q5BookInSerializer import Q5BookInSerializer      # type: ignore
 from utils.serializer.q5ReviewInSerializer import Q5ReviewInSerializer  # type: ignore
 from utils.persistentMap import PersistentMap
-from utils.model.message import Message, MessageType
+from utils.model.message import Message, MessageType, NO_COMPRESSION, TOTAL
 
 import os
 
-TOTAL = "total"
 QUERY1_ID = 'Q1'
 QUERY2_ID = 'Q2'
 QUERY3_ID = 'Q3'
@@ -51,10 +49,15 @@ def explode_by_authors(books):
 
 
 class QueryManager:
-    def __init__(self, client_id, workers_by_query):
-        self.middleware = Middleware()
+    def __init__(self, client_id, workers_by_query, pool, review_compression=NO_COMPRESSION, columnar=False):
+        # middlewares shared with the other clients, one checked out per chunk
+        self.pool = pool
         self.client_id = client_id
         self.workers_by_query = workers_by_query
+        # review chunks are most of the traffic, the workers take any compression
+        self.review_compression = review_compression
+        # columnar chunks: workers decode the columns they filter on first
+        self.columnar = columnar
 
         if str(client_id) and not os.path.exists(str(client_id)):
             os.mkdir(str(client_id))
@@ -88,7 +91,12 @@ class QueryManager:
 
         self.total_reviews.load(lambda k, v: v)
 
-    def __send_book_eof(self, query_id):
+    def encode(self, serializer, chunk):
+        if self.columnar:
+            return serializer.to_columns(chunk)
+        return serializer.to_bytes(chunk)
+
+    def __send_book_eof(self, middleware, query_id):
         for worker_i in self.total_books[query_id]:
             eof = Message(
                 client_id=self.client_id,
@@ -98,32 +106,34 @@ class QueryManager:
                     TOTAL: self.total_books[query_id][worker_i]
                 }
             )
-            self.middleware.produce(
+            middleware.produce(
                 eof.to_bytes(),
                 out_queue_name=OUT_BOOKS_QUEUE(query_id, worker_i)
             )
 
     def terminate_books(self):
-        self.__send_book_eof(QUERY1_ID)
-        self.__send_book_eof(QUERY2_ID)
-        self.__send_book_eof(QUERY3_ID)
-        self.__send_book_eof(QUERY5_ID)
-
-    def __distribute_books(self, chunk_id: int, sharded_chunks: list, query_id: str):
+        with self.pool.checkout() as middleware:
+            self.__send_book_eof(middleware, QUERY1_ID)
+            self.__send_book_eof(middleware, QUERY2_ID)
+            self.__send_book_eof(middleware, QUERY3_ID)
+            self.__send_book_eof(middleware, QUERY5_ID)
+            middleware.confirm()
+
+    def __distribute_books(self, middleware, chunk_id: int, sharded_chunks: list, query_id: str):
         n_workers = len(sharded_chunks)
         for worker_i in range(1, n_workers+1):
             i = worker_i - 1
             if not sharded_chunks[i]:
                 continue
             self.total_books[query_id][str(worker_i)] += len(sharded_chunks[i])
-            data_wi = self.book_serializers[query_id].to_bytes(sharded_chunks[i])
+            data_wi = self.encode(self.book_serializers[query_id], sharded_chunks[i])
             msg = Message(
                 ID=chunk_id,
                 client_id=self.client_id,
                 type=MessageType.DATA,
                 data=data_wi,
             )
-            self.middleware.produce(
+            middleware.produce(
                 msg.to_bytes(),
                 out_queue_name=OUT_BOOKS_QUEUE(query_id, worker_i)
             )
@@ -132,27 +142,29 @@ class QueryManager:
         if str(chunk_id) == self.total_books[LAST_CHUNK]:
             return
 
-        # Query 1:
-        value_grouped_by_title = group_by_key(chunk, self.workers_by_query[QUERY1_ID], lambda b: b.title)
-        self.__distribute_books(chunk_id, value_grouped_by_title, QUERY1_ID)
-
-        # Query 2:
+        # sharded before the checkout, the middleware is only held to publish
+        q1_chunks = group_by_key(chunk, self.workers_by_query[QUERY1_ID], lambda b: b.title)
         exploded = explode_by_authors(chunk)
-        value_grouped_by_author = group_by_key(exploded, self.workers_by_query[QUERY2_ID], lambda b: b.authors[0])
-        self.__distribute_books(chunk_id, value_grouped_by_author, QUERY2_ID)
-
-        # Query 3/4:
-        value_grouped_by_title = group_by_key(chunk, self.workers_by_query[QUERY3_ID], lambda b: b.title)
-        self.__distribute_books(chunk_id, value_grouped_by_title, QUERY3_ID)
-
-        # Query 5:
-        value_grouped_by_title = group_by_key(chunk, self.workers_by_query[QUERY5_ID], lambda b: b.title)
-        self.__distribute_books(chunk_id, value_grouped_by_title, QUERY5_ID)
+        q2_chunks = group_by_key(exploded, self.workers_by_query[QUERY2_ID], lambda b: b.authors[0])
+        q3_chunks = group_by_key(chunk, self.workers_by_query[QUERY3_ID], lambda b: b.title)
+        q5_chunks = group_by_key(chunk, self.workers_by_query[QUERY5_ID], lambda b: b.title)
+
+        with self.pool.checkout() as middleware:
+            # Query 1:
+            self.__distribute_books(middleware, chunk_id, q1_chunks, QUERY1_ID)
+            # Query 2:
+            self.__distribute_books(middleware, chunk_id, q2_chunks, QUERY2_ID)
+            # Query 3/4:
+            self.__distribute_books(middleware, chunk_id, q3_chunks, QUERY3_ID)
+            # Query 5:
+            self.__distribute_books(middleware, chunk_id, q5_chunks, QUERY5_ID)
+            # every shard is in the broker before the chunk is marked as sent
+            middleware.confirm()
 
         self.total_books[LAST_CHUNK] = str(chunk_id)
         self.total_books.flush()
 
-    def __send_review_eof(self, query_id):
+    def __send_review_eof(self, middleware, query_id):
         for worker_i in self.total_reviews[query_id]:
             eof = Message(
                 client_id=self.client_id,
@@ -162,30 +174,33 @@ class QueryManager:
                     TOTAL: self.total_reviews[query_id][worker_i]
                 }
             )
-            self.middleware.produce(
+            middleware.produce(
                 eof.to_bytes(),
                 out_queue_name=OUT_REVIEWS_QUEUE(query_id, worker_i)
             )
 
     def terminate_reviews(self):
-        self.__send_review_eof(QUERY3_ID)
-        self.__send_review_eof(QUERY5_ID)
+        with self.pool.checkout() as middleware:
+            self.__send_review_eof(middleware, QUERY3_ID)
+            self.__send_review_eof(middleware, QUERY5_ID)
+            middleware.confirm()
 
-    def __distribute_reviews(self, chunk_id: int, sharded_chunks: list, query_id: str):
+    def __distribute_reviews(self, middleware, chunk_id: int, sharded_chunks: list, query_id: str):
         n_workers = len(sharded_chunks)
         for worker_i in range(1, n_workers+1):
             i = worker_i - 1
             if not sharded_chunks[i]:
                 continue
             self.total_reviews[query_id][str(worker_i)] += len(sharded_chunks[i])
-            data_wi = self.review_serializers[query_id].to_bytes(sharded_chunks[i])
+            data_wi = self.encode(self.review_serializers[query_id], sharded_chunks[i])
             msg = Message(
                 ID=chunk_id,
                 client_id=self.client_id,
                 type=MessageType.DATA,
                 data=data_wi,
+                compression=self.review_compression,
             )
-            self.middleware.produce(
+            middleware.produce(
                 msg.to_bytes(),
                 out_queue_name=OUT_REVIEWS_QUEUE(query_id, worker_i)
             )
@@ -194,16 +209,15 @@ class QueryManager:
         if str(chunk_id) == self.total_reviews[LAST_CHUNK]:
             return
 
-        # Query 3/4:
-        reviews_grouped_by_title = group_by_key(chunk, self.workers_by_query[QUERY3_ID], lambda r: r.title)
-        self.__distribute_reviews(chunk_id, reviews_grouped_by_title, QUERY3_ID)
+        q3_chunks = group_by_key(chunk, self.workers_by_query[QUERY3_ID], lambda r: r.title)
+        q5_chunks = group_by_key(chunk, self.workers_by_query[QUERY5_ID], lambda r: r.title)
 
-        # Query 5:
-        reviews_grouped_by_author = group_by_key(chunk, self.workers_by_query[QUERY5_ID], lambda r: r.title)
-        self.__distribute_reviews(chunk_id, reviews_grouped_by_author, QUERY5_ID)
+        with self.pool.checkout() as middleware:
+            # Query 3/4:
+            self.__distribute_reviews(middleware, chunk_id, q3_chunks, QUERY3_ID)
+            # Query 5:
+            self.__distribute_reviews(middleware, chunk_id, q5_chunks, QUERY5_ID)
+            middleware.confirm()
 
         self.total_reviews[LAST_CHUNK] = str(chunk_id)
         self.total_reviews.flush()
-
-    def stop(self):
-        self.middleware.stop()
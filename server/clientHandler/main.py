@@ -43,6 +43,11 @@ def initialize_config():
         config_params["n_workers_q2"] = int(os.getenv('N_WORKERS_Q2', config["DEFAULT"]["N_WORKERS_Q2"]))
         config_params["n_workers_q3"] = int(os.getenv('N_WORKERS_Q3', config["DEFAULT"]["N_WORKERS_Q3"]))
         config_params["n_workers_q5"] = int(os.getenv('N_WORKERS_Q5', config["DEFAULT"]["N_WORKERS_Q5"]))
+        config_params["publish_window"] = int(os.getenv('PUBLISH_WINDOW', config["DEFAULT"]["PUBLISH_WINDOW"]))
+        config_params["middleware_backend"] = os.getenv('MIDDLEWARE', config["DEFAULT"]["MIDDLEWARE"])
+        config_params["pool_size"] = int(os.getenv('POOL_SIZE', config["DEFAULT"]["POOL_SIZE"]))
+        config_params["review_compression"] = os.getenv('REVIEW_COMPRESSION', config["DEFAULT"]["REVIEW_COMPRESSION"])
+        config_params["columnar_chunks"] = bool(int(os.getenv('COLUMNAR_CHUNKS', config["DEFAULT"]["COLUMNAR_CHUNKS"])))
 
         config_params["heartbeat_ip"] = os.environ['HEARTBEAT_IP']
         config_params["heartbeat_port"] = int(os.environ['HEARTBEAT_PORT'])
@@ -9,8 +9,9 @@ from common.query1Synchronizer import Query1Synchronizer, IN_QUEUE_NAME
 from utils.clientTrackerSynchronizer import BASE_DIRECTORY
 from utils.worker import TOTAL, WORKER_ID
 from utils.middleware.testMiddleware import TestMiddleware
+from utils.metaStore import MetaStore
 from utils.serializer.q1OutSerializer import Q1OutSerializer    # type: ignore
-from utils.model.message import Message, MessageType
+from utils.model.message import Message, MessageType, pack_batch
 from utils.model.virus import Disease, virus
 
 
@@ -103,6 +104,51 @@ class TestUtils(unittest.TestCase):
         for b in books:
             assert b.title in filtered, f'{b.title} not in {filtered}'
 
+    def test_meta_store_keeps_last_valid_slot(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_meta_store'
+        eof_id = str(uuid.uuid4())
+        meta = MetaStore(path)
+        meta['WORKED'] = {'1': 0, '2': 0}
+        meta['DONE'] = False
+        meta['EOF_ID'] = eof_id
+        meta.flush()
+        meta['WORKED']['2'] += 7
+        meta.flush()
+        size = os.path.getsize(path)
+        meta['DONE'] = True
+        meta.flush()
+        # slots are updated in place
+        assert os.path.getsize(path) == size
+        meta.close()
+
+        _meta = MetaStore(path)
+        _meta.load()
+        assert _meta['WORKED'] == {'1': 0, '2': 7}
+        assert _meta['DONE'] is True
+        assert _meta['EOF_ID'] == eof_id
+
+        # torn write of the newest slot: the previous flush is kept
+        offset = _meta.header_len + (_meta.seq % 2) * _meta.slot_len
+        with open(path, 'r+b') as fp:
+            fp.seek(offset + 5)
+            fp.write(b'\xff\xff')
+        _meta.close()
+        _meta = MetaStore(path)
+        _meta.load()
+        assert _meta['DONE'] is False
+        assert _meta['WORKED'] == {'1': 0, '2': 7}
+
+        # a new key changes the layout
+        _meta['TOTAL'] = 3
+        _meta.flush()
+        _meta.close()
+        _meta = MetaStore(path)
+        _meta.load()
+        assert _meta['TOTAL'] == 3 and _meta['WORKED'] == {'1': 0, '2': 7}
+        _meta.close()
+        os.remove(path)
+
     def test_sync(self):
         client_id = uuid.UUID('00000000-0000-0000-0000-000000000000')
         test_middleware = TestMiddleware()
@@ -124,6 +170,33 @@ class TestUtils(unittest.TestCase):
         sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
         self.check(client_id, [b1, b2, b3, b4], sent)
 
+    def test_sync_batched_messages(self):
+        client_id = uuid.UUID('a0000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_4_books()
+        self.append_chunk(client_id, test_middleware, 1, [b1, b2])
+        self.append_chunk(client_id, test_middleware, 2, [b3])
+        self.append_eof(client_id, test_middleware, 1, len([b1, b2]))
+        self.append_eof(client_id, test_middleware, 2, len([b3]))
+        self.append_eof(client_id, test_middleware, 3, len([]))
+        self.append_chunk(client_id, test_middleware, 4, [b4])
+        self.append_eof(client_id, test_middleware, 4, len([b4]))
+
+        raw_msgs = [raw_msg for raw_msg, _ in test_middleware.messages]
+        test_middleware.messages = []
+        test_middleware.add_message(pack_batch(raw_msgs[:3]), IN_QUEUE_NAME)
+        # redelivered batch: its messages are duplicates
+        test_middleware.add_message(pack_batch(raw_msgs[:3]), IN_QUEUE_NAME)
+        test_middleware.add_message(pack_batch(raw_msgs[3:]), IN_QUEUE_NAME)
+
+        worker = Query1Synchronizer(n_workers=4, test_middleware=test_middleware)
+        worker.run()
+
+        sent = [Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent]
+        assert len(sent) == len(set(sent))
+        self.check(client_id, [b1, b2, b3, b4], set(sent))
+
     def test_synchronizer_premature_eof(self):
         client_id = uuid.UUID('10000000-0000-0000-0000-000000000000')
         test_middleware = TestMiddleware()
@@ -1,5 +1,7 @@
 import unittest
+import unittest.mock
 import shutil
+import pickle
 import uuid
 import os
 import io
@@ -10,6 +12,11 @@ from utils.serializer.q1InSerializer import Q1InSerializer      # type: ignore
 from utils.serializer.q1OutSerializer import Q1OutSerializer    # type: ignore
 from common.query1Worker import Query1Worker, IN_QUEUE_NAME
 from utils.worker import TOTAL, BASE_DIRECTORY
+from utils.persistentSet import PersistentSet
+from utils.workedClients import WorkedClients, RECORD_LEN
+from utils.logManager import LogManager, FLUSH, SYNC_COMMIT, SYNC_GROUP
+from utils.clientTracker import ClientTracker
+from utils.model.log import BeginLine, CommitLine
 from utils.middleware.testMiddleware import TestMiddleware
 from utils.model.message import Message, MessageType
 from utils.model.virus import Disease, virus
@@ -253,6 +260,103 @@ class TestUtils(unittest.TestCase):
         )
         return the_hobbit, the_lotr, the_aotb, the_simlmarillion
 
+    def test_persistent_set_keeps_order_and_drops_short_write(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_persistent_set'
+        chunks = PersistentSet(path)
+        ids = [uuid.uuid4() for _ in range(3)]
+        for chunk_id in ids + [ids[0]]:
+            chunks.append(chunk_id)
+        assert len(chunks) == 3
+        assert os.path.getsize(path) == 3 * 16
+
+        # torn write at the tail of the file
+        with open(path, 'ab') as fp:
+            fp.write(uuid.uuid4().bytes[:7])
+
+        _chunks = PersistentSet(path)
+        _chunks.load()
+        assert list(_chunks) == ids
+        assert _chunks[0] == ids[0]
+        assert ids[2] in _chunks
+        assert os.path.getsize(path) == 3 * 16
+        os.remove(path)
+
+    def test_worked_clients_expire_on_compaction(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_worked_clients'
+        worked_clients = WorkedClients(path, ttl=60)
+        old, new = uuid.uuid4(), uuid.uuid4()
+        worked_clients.append(old)
+        worked_clients.append(new)
+        worked_clients.map[old] -= 120
+        assert old in worked_clients and new in worked_clients
+
+        worked_clients.compact()
+        assert old not in worked_clients and new in worked_clients
+        assert os.path.getsize(path) == RECORD_LEN
+
+        # torn write at the tail of the file
+        with open(path, 'ab') as fp:
+            fp.write(uuid.uuid4().bytes[:7])
+
+        _worked_clients = WorkedClients(path, ttl=60)
+        _worked_clients.load()
+        assert list(_worked_clients) == [new]
+        assert os.path.getsize(path) == RECORD_LEN
+        os.remove(path)
+
+    def test_log_manager_truncates_previous_record_in_place(self):
+        client_id = uuid.uuid4()
+        os.makedirs(BASE_DIRECTORY + '/' + str(client_id))
+        self.assertRaises(ValueError, LogManager, client_id, 'never')
+
+        log_manager = LogManager(client_id, SYNC_COMMIT)
+        log_manager.integers = ['WORKED']
+        chunk_1, chunk_2 = uuid.uuid4(), uuid.uuid4()
+
+        log_manager.begin(chunk_1)
+        log_manager.log_metadata('WORKED', 100)
+        log_manager.write_record()
+        log_manager.commit(chunk_1)
+
+        log_manager.begin(chunk_2)
+        log_manager.write_record()
+        log_manager.commit(chunk_2)
+
+        expected = BeginLine(chunk_2).encode() + CommitLine(chunk_2).encode()
+        assert log_manager.read() == expected
+        log_manager.close()
+        with open(log_manager.log_file, 'rb') as fp:
+            assert fp.read() == expected
+        shutil.rmtree(BASE_DIRECTORY + '/' + str(client_id))
+
+    def test_tracker_syncs_files_before_commit_line(self):
+        fdatasync = os.fdatasync
+
+        def commit_syncs(durability):
+            tracker = ClientTracker(uuid.uuid4(), durability=durability)
+            tracker.data['k'] = 'v0'
+            tracker.persist(uuid.uuid4(), flush_data=True, WORKED=1)
+
+            synced = []
+
+            def record(fd):
+                synced.append(os.path.basename(os.readlink(f'/proc/self/fd/{fd}')))
+                fdatasync(fd)
+            with unittest.mock.patch('os.fdatasync', record):
+                tracker.log_manager.hold_change('k', 'v0', 'v1')
+                tracker.data['k'] = 'v1'
+                tracker.persist(uuid.uuid4(), flush_data=True, WORKED=1)
+            tracker.close()
+            ClientTracker.clear(tracker.client_id)
+            return synced
+
+        assert commit_syncs(FLUSH) == []
+        # the COMMIT line is synced after every file it covers, the chunks before the ack
+        assert commit_syncs(SYNC_GROUP) == ['data', 'meta', 'log', 'chunks']
+        assert commit_syncs(SYNC_COMMIT) == ['log', 'data', 'meta', 'log', 'chunks']
+
     def test_worker_filter(self):
         def matches_function(b: Book):
             return 'distributed' in b.title.lower()
@@ -273,6 +377,34 @@ class TestUtils(unittest.TestCase):
         sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
         self.check(client_id, [b1, b2, b3], sent)
 
+    def test_worker_reads_legacy_messages(self):
+        def matches_function(b: Book):
+            return 'distributed' in b.title.lower()
+
+        def legacy_bytes(msg):
+            # [id][client id][type][args len][pickled args][data]
+            raw_args = pickle.dumps(msg.args) if msg.args else b''
+            return msg.ID.bytes + msg.client_id.bytes + msg.type.value \
+                + len(raw_args).to_bytes(4, 'big') + raw_args + msg.data
+
+        client_id = uuid.UUID('60000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_books_distributed()
+
+        self.append_chunk(client_id, test_middleware, [b1, b4])
+        chunk = Message(client_id=client_id, type=MessageType.DATA, data=Q1InSerializer().to_bytes([b2, b3]))
+        test_middleware.add_message(legacy_bytes(chunk), IN_QUEUE_NAME(WORKER_ID))
+        eof = Message(client_id=client_id, type=MessageType.EOF, data=b'', args={TOTAL: 4})
+        test_middleware.add_message(legacy_bytes(eof), IN_QUEUE_NAME(WORKER_ID))
+
+        worker = Query1Worker(peer_id=WORKER_ID, peers=10, chunk_size=2,
+                              matches=matches_function, test_middleware=test_middleware)
+        worker.run()
+
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1, b2, b3], sent)
+
     def test_worker_premature_eof(self):
         def matches_function(b: Book):
             return 'distributed' in b.title.lower()
@@ -34,15 +34,13 @@ class Q2Partial:
 
     def encode(self):
         bytes_aut = self.author.encode('utf-8')
-        bytes_arr = b''
-        for i in self.decades:
-            bytes_arr += int.to_bytes(i, length=2, byteorder='big')
-        bytes = b''
-        bytes += int.to_bytes(len(bytes_aut), length=1, byteorder='big')
-        bytes += bytes_aut
-        bytes += int.to_bytes(len(bytes_arr), length=1, byteorder='big')
-        bytes += bytes_arr
-        return bytes
+        bytes_arr = b''.join([int.to_bytes(i, length=2, byteorder='big') for i in self.decades])
+        return b''.join([
+            int.to_bytes(len(bytes_aut), length=1, byteorder='big'),
+            bytes_aut,
+            int.to_bytes(len(bytes_arr), length=1, byteorder='big'),
+            bytes_arr,
+        ])
 
     def update(self, book):
         decade = 10 * (int(book.publishedDate)//10)
@@ -1,5 +1,6 @@
 from utils.synchronizer import Synchronizer, TOTAL
-from utils.middleware.middleware import Middleware
+from utils.middleware.middleware import new_middleware, BLOCKING
+from utils.logManager import FLUSH
 from utils.serializer.q2OutSerializer import Q2OutSerializer    # type: ignore
 from utils.model.message import Message, MessageType
 
@@ -9,8 +10,12 @@ TAG = 'Q2'
 
 
 class Query2Synchronizer(Synchronizer):
-    def __init__(self, n_workers, test_middleware=None):
-        middleware = test_middleware if test_middleware else Middleware()
+    def __init__(self, n_workers, group_size=1, group_timeout=0, durability=FLUSH,
+                 max_entries=0, prefetch_count=0, ack_batch=1,
+                 publish_window=0, batch_size=0, transient_routes=(), middleware_backend=BLOCKING, test_middleware=None):
+        middleware = test_middleware if test_middleware else new_middleware(
+            middleware_backend, prefetch_count=prefetch_count, ack_batch=ack_batch, publish_window=publish_window,
+            batch_size=batch_size, transient_routes=transient_routes)
         middleware.consume(queue_name=IN_QUEUE_NAME, callback=self.recv)
         super().__init__(
             middleware=middleware,
@@ -19,7 +24,11 @@ class Query2Synchronizer(Synchronizer):
             out_serializer=Q2OutSerializer(),
             # This synchronizer doesn't aggregate, so chunk_size does not matter.
             # Also, it is not used in 'Synchronizer' abstraction. So might be deleted
-            chunk_size=1
+            chunk_size=1,
+            group_size=group_size,
+            group_timeout=group_timeout,
+            durability=durability,
+            max_entries=max_entries
         )
         self.recovery()
 
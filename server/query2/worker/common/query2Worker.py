@@ -1,7 +1,8 @@
 import logging
 
 from utils.worker import Worker
-from utils.middleware.middleware import Middleware
+from utils.middleware.middleware import new_middleware, BLOCKING
+from utils.logManager import FLUSH
 from dto.q2Partial import Q2Partial
 from utils.serializer.q2InSerializer import Q2InSerializer              # type: ignore
 from utils.serializer.q2OutSerializer import Q2OutSerializer            # type: ignore
@@ -16,8 +17,12 @@ def out_queue_name():
 
 
 class Query2Worker(Worker):
-    def __init__(self, peer_id, peers, chunk_size, min_decades, test_middleware=None):
-        middleware = test_middleware if test_middleware else Middleware()
+    def __init__(self, peer_id, peers, chunk_size, min_decades, group_size=1, group_timeout=0, durability=FLUSH,
+                 max_entries=0, prefetch_count=0, ack_batch=1,
+                 publish_window=0, batch_size=0, transient_routes=(), middleware_backend=BLOCKING, test_middleware=None):
+        middleware = test_middleware if test_middleware else new_middleware(
+            middleware_backend, prefetch_count=prefetch_count, ack_batch=ack_batch, publish_window=publish_window,
+            batch_size=batch_size, transient_routes=transient_routes)
         middleware.consume(queue_name=in_queue_name(peer_id), callback=self.recv)
 
         super().__init__(middleware=middleware,
@@ -25,7 +30,11 @@ class Query2Worker(Worker):
                          out_serializer=Q2OutSerializer(),
                          peer_id=peer_id,
                          peers=peers,
-                         chunk_size=chunk_size,)
+                         chunk_size=chunk_size,
+                         group_size=group_size,
+                         group_timeout=group_timeout,
+                         durability=durability,
+                         max_entries=max_entries)
         self.min_decades = min_decades
 
         self.recovery()
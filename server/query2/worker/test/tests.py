@@ -12,6 +12,8 @@ from utils.serializer.q2PartialSerializer import Q2PartialSerializer    # type:
 from utils.serializer.q2InSerializer import Q2InSerializer              # type: ignore
 from utils.serializer.q2OutSerializer import Q2OutSerializer            # type: ignore
 from utils.worker import TOTAL, BASE_DIRECTORY
+from utils.appendOnlyMap import AppendOnlyMap, LazyValue, MIN_STALE_RECORDS
+from utils.clientTracker import ClientTracker
 from utils.model.message import Message, MessageType
 from common.query2Worker import Query2Worker, in_queue_name
 
@@ -138,6 +140,112 @@ class TestUtils(unittest.TestCase):
         assert partial2.author == _partial2.author
         assert partial2.decades == _partial2.decades
 
+    def test_append_only_map_recovers_last_values(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_append_only_map'
+        data = AppendOnlyMap(path)
+        data['Dennis Ritchie'] = Q2Partial('Dennis Ritchie', [1970])
+        data['Brian Kernighan'] = Q2Partial('Brian Kernighan', [1970, 1980])
+        data.flush()
+        size = os.path.getsize(path)
+
+        data['Dennis Ritchie'].decades.add(1990)
+        data.touch('Dennis Ritchie')
+        del data['Brian Kernighan']
+        data.flush()
+        # only the dirty keys are appended, the first records are untouched
+        assert os.path.getsize(path) > size
+
+        # torn write at the tail of the log
+        with open(path, 'ab') as fp:
+            fp.write(b'\x01\x00\x0eDennis')
+
+        _data = AppendOnlyMap(path)
+        _data.load(Q2Partial.decode)
+        assert len(_data) == 1
+        assert _data['Dennis Ritchie'].decades == {1970, 1990}
+        assert 'Brian Kernighan' not in _data
+
+        _data.checkpoint()
+        _data = AppendOnlyMap(path)
+        _data.load(Q2Partial.decode)
+        assert _data.n_records == 1
+        assert _data['Dennis Ritchie'].decades == {1970, 1990}
+        os.remove(path)
+
+    def test_append_only_map_lazy_load(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_append_only_map_lazy'
+        data = AppendOnlyMap(path)
+        data['Dennis Ritchie'] = Q2Partial('Dennis Ritchie', [1970, 1990])
+        data['Brian Kernighan'] = Q2Partial('Brian Kernighan', [1970])
+        data.flush()
+
+        _data = AppendOnlyMap(path)
+        _data.load(Q2Partial.decode, lazy=True)
+        assert 'Dennis Ritchie' in _data and len(_data) == 2
+        assert type(_data.map['Dennis Ritchie']) is LazyValue
+        assert _data['Dennis Ritchie'].decades == {1970, 1990}
+        assert type(_data.map['Brian Kernighan']) is LazyValue
+
+        # values never decoded survive a checkpoint untouched
+        _data.checkpoint()
+        _data = AppendOnlyMap(path)
+        _data.load(Q2Partial.decode, lazy=True)
+        assert sorted(v.author for v in _data.values()) == ['Brian Kernighan', 'Dennis Ritchie']
+        os.remove(path)
+
+    def test_append_only_map_checkpoints_stale_records(self):
+        os.makedirs(BASE_DIRECTORY, exist_ok=True)
+        path = BASE_DIRECTORY + '/test_append_only_map_checkpoint'
+        data = AppendOnlyMap(path)
+        data['Brian Kernighan'] = Q2Partial('Brian Kernighan', [1970])
+        for year in range(2 * MIN_STALE_RECORDS):
+            data['Dennis Ritchie'] = Q2Partial('Dennis Ritchie', [year])
+            data.flush()
+            # the replayed tail never grows past the checkpoint threshold
+            assert data.stale_records() < MIN_STALE_RECORDS
+
+        _data = AppendOnlyMap(path)
+        _data.load(Q2Partial.decode)
+        assert _data.n_records < MIN_STALE_RECORDS + 2
+        assert _data['Dennis Ritchie'].decades == data['Dennis Ritchie'].decades
+        assert 'Brian Kernighan' in _data
+        os.remove(path)
+
+    def test_recovery_undoes_after_torn_data_record(self):
+        client_id = uuid.UUID('90000000-0000-0000-0000-000000000000')
+        tracker = ClientTracker(client_id)
+        tracker.parser = Q2Partial.decode
+        tracker.data['Dennis Ritchie'] = Q2Partial('Dennis Ritchie', [1970])
+        tracker.data['Brian Kernighan'] = Q2Partial('Brian Kernighan', [1960])
+        tracker.persist(uuid.uuid4(), flush_data=True, WORKED=2)
+
+        for author, decade in [('Dennis Ritchie', 1980), ('Brian Kernighan', 1990)]:
+            old = tracker.data[author].copy()
+            tracker.data[author].decades.add(decade)
+            tracker.log_manager.hold_change(author, old, tracker.data[author].copy())
+
+        # the worker dies in the middle of appending the new values
+        def torn_flush():
+            records = b''.join([tracker.data.encode_record(k) for k in tracker.data.dirty])
+            with open(tracker.data.path, 'ab') as fp:
+                fp.write(records[:-3])
+            raise Disease
+        tracker.data.flush = torn_flush
+        self.assertRaises(Disease, tracker.persist, uuid.uuid4(), flush_data=True, WORKED=2)
+        tracker.close()
+
+        # the undo is appended before the data is loaded, after the torn record
+        tracker = ClientTracker(client_id)
+        tracker.parser = Q2Partial.decode
+        tracker.recovery()
+        tracker.load_data()
+        assert tracker.data['Dennis Ritchie'].decades == {1970}
+        assert tracker.data['Brian Kernighan'].decades == {1960}
+        tracker.close()
+        ClientTracker.clear(client_id)
+
     def make_books_asoiaf(self):
         agot = Book(
             title='A Game of Thrones',
@@ -417,6 +525,104 @@ class TestUtils(unittest.TestCase):
         self.check(client_1, [martin], sent)
         self.check(client_2, [tolkien], sent)
 
+    def test_group_commit_parallel_multiclient(self):
+        client_1 = uuid.UUID('60000000-0000-0000-0000-000000000000')
+        client_2 = uuid.UUID('61000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4, b5 = self.make_books_asoiaf()
+        c1, c2, c3, c4 = self.make_books_tlotr()
+        d1, d2, d3 = self.make_books_mistborn()
+
+        self.append_chunk(client_1, test_middleware, [b1, b2, d1])
+        self.append_eof(client_1, test_middleware, 8)
+        self.append_chunk(client_2, test_middleware, [c1, c2, d1])
+        self.append_chunk(client_1, test_middleware, [b3, b4, d2])
+        self.append_chunk(client_2, test_middleware, [c3, d2])
+        self.append_eof(client_2, test_middleware, 7)
+        self.append_chunk(client_1, test_middleware, [b5, d3])
+        self.append_chunk(client_2, test_middleware, [c4, d3])
+
+        worker = Query2Worker(peer_id=WORKER_ID, peers=10, chunk_size=2, min_decades=2,
+                              group_size=3, group_timeout=10, test_middleware=test_middleware)
+        worker.run()
+
+        assert len(test_middleware.deferred) == 0, f'unacked messages: {len(test_middleware.deferred)}'
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        martin = b1.authors[0]
+        tolkien = c1.authors[0]
+        self.check(client_1, [martin], sent)
+        self.check(client_2, [tolkien], sent)
+
+    def test_group_commit_crash_redelivers_uncommitted_chunks(self):
+        client_id = uuid.UUID('70000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4, b5 = self.make_books_asoiaf()
+        c1, c2, c3, c4 = self.make_books_tlotr()
+        d1, d2, d3 = self.make_books_mistborn()
+
+        self.append_chunk(client_id, test_middleware, [b1, b2, c1, d1])
+        self.append_chunk(client_id, test_middleware, [b3, c2, c3, d2])
+        self.append_chunk(client_id, test_middleware, [b4])
+
+        # the group timer never commits: [b4] is left staged when the worker dies
+        def crash():
+            raise Disease
+        test_middleware.call_later = lambda delay, callback: test_middleware.timers.append(crash)
+        worker = Query2Worker(peer_id=WORKER_ID, peers=10, chunk_size=2, min_decades=2,
+                              group_size=2, group_timeout=10, test_middleware=test_middleware)
+        self.assertRaises(Disease, worker.run)
+        assert len(test_middleware.messages) == 1, 'uncommitted chunk was not redelivered'
+
+        del test_middleware.call_later
+        self.append_chunk(client_id, test_middleware, [b5, c4, d3])
+        self.append_eof(client_id, test_middleware, 12)
+        worker = Query2Worker(peer_id=WORKER_ID, peers=10, chunk_size=2, min_decades=2,
+                              group_size=2, group_timeout=10, test_middleware=test_middleware)
+        worker.run()
+
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        martin = b1.authors[0]
+        tolkien = c1.authors[0]
+        self.check(client_id, [martin, tolkien], sent)
+
+    def test_recovery_defers_data_loading(self):
+        client_1 = uuid.UUID('80000000-0000-0000-0000-000000000000')
+        client_2 = uuid.UUID('81000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4, b5 = self.make_books_asoiaf()
+        c1, c2, c3, c4 = self.make_books_tlotr()
+        d1, d2, d3 = self.make_books_mistborn()
+
+        self.append_chunk(client_1, test_middleware, [b1, b2, d1])
+        self.append_chunk(client_1, test_middleware, [b3, b4, d2])
+        self.append_chunk(client_2, test_middleware, [c1, c2, d1])
+        worker = Query2Worker(peer_id=WORKER_ID, peers=10, chunk_size=2, min_decades=2,
+                              test_middleware=test_middleware)
+        worker.run()
+
+        # restart: trackers are back, their aggregates stay on disk
+        worker = Query2Worker(peer_id=WORKER_ID, peers=10, chunk_size=2, min_decades=2,
+                              test_middleware=test_middleware)
+        assert not worker.clients[client_1].data.loaded
+        assert not worker.clients[client_2].data.loaded
+
+        self.append_chunk(client_1, test_middleware, [b5, d3])
+        self.append_eof(client_1, test_middleware, 8)
+        worker.run()
+        assert client_1 not in worker.clients
+        assert not worker.clients[client_2].data.loaded
+
+        self.append_chunk(client_2, test_middleware, [c3, d2])
+        self.append_chunk(client_2, test_middleware, [c4, d3])
+        self.append_eof(client_2, test_middleware, 7)
+        worker.run()
+
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        martin = b1.authors[0]
+        tolkien = c1.authors[0]
+        self.check(client_1, [martin], sent)
+        self.check(client_2, [tolkien], sent)
+
 
 if __name__ == '__main__':
     unittest.main()
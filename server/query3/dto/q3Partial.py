@@ -49,22 +49,17 @@ class Q3Partial:
     def encode(self):
         bytes_title = self.title.encode('utf-8')
 
-        bytes_arr = b''
-        bytes_arr += int.to_bytes(len(self.authors), length=1, byteorder='big')
+        parts = [int.to_bytes(len(bytes_title), length=1, byteorder='big'), bytes_title]
+
+        parts.append(int.to_bytes(len(self.authors), length=1, byteorder='big'))
         for author in self.authors:
             bytes_auth = author.encode('utf-8')
-            bytes_arr += int.to_bytes(len(bytes_auth), length=1, byteorder='big')
-            bytes_arr += bytes_auth
-
-        bytes = b''
-        bytes += int.to_bytes(len(bytes_title), length=1, byteorder='big')
-        bytes += bytes_title
-
-        bytes += bytes_arr
+            parts.append(int.to_bytes(len(bytes_auth), length=1, byteorder='big'))
+            parts.append(bytes_auth)
 
-        bytes += int.to_bytes(self.n, length=4, byteorder='big')
-        bytes += struct.pack("!f", self.scoreAvg)   # std_length=4
-        return bytes
+        parts.append(int.to_bytes(self.n, length=4, byteorder='big'))
+        parts.append(struct.pack("!f", self.scoreAvg))   # std_length=4
+        return b''.join(parts)
 
     def update(self, review: Review):
         avg = self.scoreAvg
@@ -2,7 +2,8 @@ import logging
 import uuid
 
 from utils.synchronizer import Synchronizer, TOTAL
-from utils.middleware.middleware import Middleware
+from utils.middleware.middleware import new_middleware, BLOCKING
+from utils.logManager import FLUSH
 from utils.serializer.q3PartialSerializer import Q3PartialSerializer    # type: ignore
 from utils.serializer.q3OutSerializer import Q3OutSerializer            # type: ignore
 from dto.q3Partial import Q3Partial
@@ -16,14 +17,22 @@ Q4_EOF_ID = "Q4_EOF_ID"
 
 
 class Query3Synchronizer(Synchronizer):
-    def __init__(self, n_workers, chunk_size, n_top, test_middleware=None):
-        middleware = test_middleware if test_middleware else Middleware()
+    def __init__(self, n_workers, chunk_size, n_top, group_size=1, group_timeout=0, durability=FLUSH,
+                 max_entries=0, prefetch_count=0, ack_batch=1,
+                 publish_window=0, batch_size=0, transient_routes=(), middleware_backend=BLOCKING, test_middleware=None):
+        middleware = test_middleware if test_middleware else new_middleware(
+            middleware_backend, prefetch_count=prefetch_count, ack_batch=ack_batch, publish_window=publish_window,
+            batch_size=batch_size, transient_routes=transient_routes)
         middleware.consume(queue_name=IN_QUEUE_NAME, callback=self.recv)
         super().__init__(middleware=middleware,
                          n_workers=n_workers,
                          in_serializer=Q3PartialSerializer(),
                          out_serializer=Q3OutSerializer(),
-                         chunk_size=chunk_size,)
+                         chunk_size=chunk_size,
+                         group_size=group_size,
+                         group_timeout=group_timeout,
+                         durability=durability,
+                         max_entries=max_entries)
         self.n_top = n_top
         self.recovery()
 
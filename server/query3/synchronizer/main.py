@@ -26,6 +26,17 @@ def initialize_config():
         config_params["n_workers"] = int(os.getenv('N_WORKERS', config["DEFAULT"]["N_WORKERS"]))
         config_params["chunk_size"] = int(os.getenv('CHUNK_SIZE', config["DEFAULT"]["CHUNK_SIZE"]))
         config_params["n_top"] = int(os.getenv('N_TOP', config["DEFAULT"]["N_TOP"]))
+        config_params["group_size"] = int(os.getenv('GROUP_SIZE', config["DEFAULT"]["GROUP_SIZE"]))
+        config_params["group_timeout"] = int(os.getenv('GROUP_TIMEOUT', config["DEFAULT"]["GROUP_TIMEOUT"]))
+        config_params["durability"] = os.getenv('DURABILITY', config["DEFAULT"]["DURABILITY"])
+        config_params["max_entries"] = int(os.getenv('MAX_ENTRIES', config["DEFAULT"]["MAX_ENTRIES"]))
+        config_params["prefetch_count"] = int(os.getenv('PREFETCH_COUNT', config["DEFAULT"]["PREFETCH_COUNT"]))
+        config_params["ack_batch"] = int(os.getenv('ACK_BATCH', config["DEFAULT"]["ACK_BATCH"]))
+        config_params["publish_window"] = int(os.getenv('PUBLISH_WINDOW', config["DEFAULT"]["PUBLISH_WINDOW"]))
+        config_params["batch_size"] = int(os.getenv('BATCH_SIZE', config["DEFAULT"]["BATCH_SIZE"]))
+        transient_routes = os.getenv('TRANSIENT_ROUTES', config["DEFAULT"]["TRANSIENT_ROUTES"])
+        config_params["transient_routes"] = [r for r in transient_routes.split(',') if r]
+        config_params["middleware_backend"] = os.getenv('MIDDLEWARE', config["DEFAULT"]["MIDDLEWARE"])
 
         config_params["heartbeat_ip"] = os.environ['HEARTBEAT_IP']
         config_params["heartbeat_port"] = int(os.environ['HEARTBEAT_PORT'])
@@ -54,7 +65,17 @@ def main():
     heartbeat.start()
 
     # Initialize server and start server loop
-    worker = Query3Synchronizer(n_workers, chunk_size, n_top)
+    worker = Query3Synchronizer(n_workers, chunk_size, n_top,
+                                group_size=config_params["group_size"],
+                                group_timeout=config_params["group_timeout"],
+                                durability=config_params["durability"],
+                                max_entries=config_params["max_entries"],
+                                prefetch_count=config_params["prefetch_count"],
+                                ack_batch=config_params["ack_batch"],
+                                publish_window=config_params["publish_window"],
+                                batch_size=config_params["batch_size"],
+                                transient_routes=config_params["transient_routes"],
+                                middleware_backend=config_params["middleware_backend"])
     exitcode = worker.run()
 
     heartbeat.terminate()
@@ -8,6 +8,7 @@ from common.query3Synchronizer import Query3Synchronizer, IN_QUEUE_NAME, Q3_TAG,
 from utils.clientTrackerSynchronizer import BASE_DIRECTORY
 from utils.worker import TOTAL, WORKER_ID
 from utils.middleware.testMiddleware import TestMiddleware
+from utils.logManager import LogManager
 from utils.serializer.q3PartialSerializer import Q3PartialSerializer    # type: ignore
 from utils.serializer.q3OutSerializer import Q3OutSerializer            # type: ignore
 from dto.q3Partial import Q3Partial
@@ -365,6 +366,51 @@ class TestUtils(unittest.TestCase):
         self.check(client_2, [n1, n2, n3, n8, n9], sent_q4)
         self.check(client_3, [n6, n7, n8, n9], sent_q4)
 
+    def test_group_commit_sync_crash_before_commit(self):
+        client_id = uuid.UUID('60000000-0000-0000-0000-000000000000')
+
+        test_middleware = TestMiddleware()
+
+        n1, n2, n3, n4, n5, n6, n7, n8, n9, n10 = self.make_partials()
+        self.append_chunk(client_id, test_middleware, 1, [n1, n4])
+        self.append_chunk(client_id, test_middleware, 1, [n7])
+        self.append_chunk(client_id, test_middleware, 3, [n10])
+        self.append_chunk(client_id, test_middleware, 3, [n9, n2, n5])
+        self.append_chunk(client_id, test_middleware, 4, [n8])
+        self.append_chunk(client_id, test_middleware, 4, [n3])
+        self.append_chunk(client_id, test_middleware, 4, [n6])
+
+        self.append_eof(client_id, test_middleware, 1, 3)
+        self.append_eof(client_id, test_middleware, 2, 0)
+        self.append_eof(client_id, test_middleware, 3, 4)
+        self.append_eof(client_id, test_middleware, 4, 3)
+
+        # the first group record is written, but dies before its COMMIT line
+        commit = LogManager.commit
+
+        def crash(log_manager, chunk_id, worker_id=None):
+            LogManager.commit = commit
+            raise Disease
+
+        LogManager.commit = crash
+        try:
+            while True:
+                try:
+                    sync = Query3Synchronizer(n_workers=4, chunk_size=2, n_top=5,
+                                              group_size=3, group_timeout=10, test_middleware=test_middleware)
+                    sync.run()
+                    break
+                except Disease:
+                    continue
+        finally:
+            LogManager.commit = commit
+
+        assert len(test_middleware.deferred) == 0, f'unacked messages: {len(test_middleware.deferred)}'
+        sent_q3 = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent_by_tag[Q3_TAG]])
+        self.check(client_id, [n1, n2, n3, n4, n5, n6, n7, n8, n9, n10], sent_q3)
+        sent_q4 = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent_by_tag[Q4_TAG]])
+        self.check(client_id, [n1, n2, n3, n4, n5], sent_q4)
+
 
 if __name__ == '__main__':
     unittest.main()
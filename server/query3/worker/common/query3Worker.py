@@ -1,8 +1,8 @@
 import logging
-import io
 
 from utils.worker import Worker, TOTAL
-from utils.middleware.middleware import Middleware, ACK, NACK
+from utils.middleware.middleware import new_middleware, BLOCKING, ACK
+from utils.logManager import FLUSH
 from dto.q3Partial import Q3Partial
 from utils.serializer.q3ReviewInSerializer import Q3ReviewInSerializer  # type: ignore
 from utils.serializer.q3PartialSerializer import Q3PartialSerializer    # type: ignore
@@ -23,12 +23,24 @@ def OUT_QUEUE_NAME():
 
 
 N_BOOKS = "N_BOOKS"
+EXPECTED_BOOKS = "EXPECTED_BOOKS"
 ALL_BOOKS_RECEIVED = "ALL_BOOKS_RECEIVED"
 
 
 class Query3Worker(Worker):
-    def __init__(self, min_amount_reviews, minimum_date, maximum_date, peer_id, peers, chunk_size, test_middleware=None):
-        middleware = test_middleware if test_middleware else Middleware()
+    def __init__(self, min_amount_reviews, minimum_date, maximum_date, peer_id, peers, chunk_size,
+                 group_size=1, group_timeout=0, durability=FLUSH,
+                 max_entries=0, prefetch_count=0, ack_batch=1,
+                 publish_window=0, batch_size=0, transient_routes=(), middleware_backend=BLOCKING, parallel=False, test_middleware=None):
+        # parallel: books and reviews are consumed from their own threads
+        if parallel and group_size > 1:
+            # a group would span clients owned by the other consumer
+            logging.warning('action: config | group commit is not supported with parallel queues, disabled')
+            group_size = 1
+        middleware = test_middleware if test_middleware else new_middleware(
+            middleware_backend, parallel=parallel,
+            prefetch_count=prefetch_count, ack_batch=ack_batch, publish_window=publish_window,
+            batch_size=batch_size, transient_routes=transient_routes)
         middleware.consume(queue_name=IN_BOOKS_QUEUE_NAME(peer_id), callback=self.recv_book)
         middleware.consume(queue_name=IN_REVIEWS_QUEUE_NAME(peer_id), callback=self.recv)
 
@@ -37,7 +49,11 @@ class Query3Worker(Worker):
                          out_serializer=Q3PartialSerializer(),
                          peer_id=peer_id,
                          peers=peers,
-                         chunk_size=chunk_size,)
+                         chunk_size=chunk_size,
+                         group_size=group_size,
+                         group_timeout=group_timeout,
+                         durability=durability,
+                         max_entries=max_entries)
 
         self.min_amount_reviews = min_amount_reviews
         self.maximum_date = maximum_date
@@ -50,6 +66,9 @@ class Query3Worker(Worker):
         if N_BOOKS not in self.tracker.meta_data:
             self.tracker.log_manager.integers.append(N_BOOKS)
             self.tracker.meta_data[N_BOOKS] = 0
+        if EXPECTED_BOOKS not in self.tracker.meta_data:
+            self.tracker.log_manager.integers.append(EXPECTED_BOOKS)
+            self.tracker.meta_data[EXPECTED_BOOKS] = -1
         if ALL_BOOKS_RECEIVED not in self.tracker.meta_data:
             self.tracker.log_manager.booleans.append(ALL_BOOKS_RECEIVED)
             self.tracker.meta_data[ALL_BOOKS_RECEIVED] = False
@@ -70,50 +89,68 @@ class Query3Worker(Worker):
             logging.debug(f'action: new_book | result: saving | book: {book}')
             self.tracker.data[book.title] = Q3Partial(book.title, book.authors)
 
+    def select_books(self, columns):
+        # same dates as matches_criteria
+        return columns.between('publishedDate', self.minimum_date, self.maximum_date)
+
     def recv_raw_book(self, raw, chunk_id):
-        reader = io.BytesIO(raw)
-        input_chunk = self.book_serializer.from_chunk(reader)
+        input_chunk = self.book_serializer.from_buffer(raw, select=self.select_books)
         logging.debug(f'action: new_chunk | chunck_len: {len(input_chunk)}')
         for input in input_chunk:
             self.save_book(input)
 
-        self.tracker.persist(chunk_id, flush_data=True,
-                             N_BOOKS=self.tracker.meta_data[N_BOOKS]+len(input_chunk))
+        n_books = self.tracker.meta_data[N_BOOKS]+self.book_serializer.chunk_len(raw)
+        if n_books == self.tracker.meta_data[EXPECTED_BOOKS]:
+            # the EOF came first, this was the last chunk
+            self.tracker.persist(chunk_id, flush_data=True, N_BOOKS=n_books, ALL_BOOKS_RECEIVED=True)
+            logging.debug('action: recv_book | success | all_books_received')
+        else:
+            self.tracker.persist(chunk_id, flush_data=True, N_BOOKS=n_books)
 
     def recv_book(self, raw_msg, key):
         msg = Message.from_bytes(raw_msg)
-        if msg.client_id in self.worked_clients:
-            return ACK
+        with self.client_lock(msg.client_id):
+            if msg.client_id in self.worked_clients:
+                return ACK
 
-        self.context_switch(msg.client_id)
+            self.context_switch(msg.client_id)
 
-        if msg.ID in self.tracker.worked_chunks:
-            return ACK
+            if msg.ID in self.tracker.worked_chunks:
+                return ACK
 
-        if msg.type == MessageType.EOF:
-            if msg.args[TOTAL] != self.tracker.meta_data[N_BOOKS]:
-                diff = msg.args[TOTAL]-self.tracker.meta_data[N_BOOKS]
-                logging.debug(f'action: recv_book_eof | remaining: {diff} left')
-                return NACK
+            if msg.type == MessageType.EOF:
+                if msg.args[TOTAL] != self.tracker.meta_data[N_BOOKS]:
+                    # the last book chunk completes the books
+                    diff = msg.args[TOTAL]-self.tracker.meta_data[N_BOOKS]
+                    logging.debug(f'action: recv_book_eof | remaining: {diff} left')
+                    self.tracker.persist(msg.ID, EXPECTED_BOOKS=msg.args[TOTAL])
+                else:
+                    self.tracker.persist(msg.ID, ALL_BOOKS_RECEIVED=True)
+                    logging.debug('action: recv_book_eof | success | all_books_received')
             else:
-                self.tracker.persist(msg.ID, ALL_BOOKS_RECEIVED=True)
-                logging.debug('action: recv_book_eof | success | all_books_received')
-                return ACK
-        self.recv_raw_book(msg.data, msg.ID)
-        return ACK
+                self.recv_raw_book(msg.data, msg.ID)
+
+            if self.tracker.meta_data[ALL_BOOKS_RECEIVED]:
+                self.release_parked()
+            return self.ack(self.tracker)
 
     #################
     # REVIEW WORKER #
     #################
     def recv(self, raw_msg, key):
         msg = Message.from_bytes(raw_msg)
-        if msg.client_id in self.worked_clients:
-            return ACK
-        self.context_switch(msg.client_id)
-        if not self.tracker.meta_data[ALL_BOOKS_RECEIVED]:
-            logging.debug('action: recv_raw | status: not_all_books_received | NACK')
-            return NACK
-        return super().recv(raw_msg, key)
+        with self.client_lock(msg.client_id):
+            if msg.client_id in self.worked_clients:
+                return ACK
+            self.context_switch(msg.client_id)
+            if not self.tracker.meta_data[ALL_BOOKS_RECEIVED]:
+                logging.debug('action: recv_raw | status: not_all_books_received | parking')
+                self.park(raw_msg)
+                return ACK
+            return super().recv(raw_msg, key)
+
+    def ready_for_parked(self):
+        return self.tracker.meta_data[ALL_BOOKS_RECEIVED]
 
     def forward_eof(self, eof):
         self.middleware.produce(eof, OUT_QUEUE_NAME())
@@ -121,6 +158,10 @@ class Query3Worker(Worker):
     def forward_data(self, data):
         self.middleware.produce(data, OUT_QUEUE_NAME())
 
+    def select(self, columns):
+        # reviews of books that are not saved are ignored by work
+        return columns.isin('title', self.tracker.data.keys())
+
     def work(self, input):
         review = input
         logging.debug(f'action: new_review | review: {review}')
@@ -1,4 +1,9 @@
 import unittest
+import unittest.mock
+import threading
+import tempfile
+import socket
+import json
 import shutil
 import uuid
 import os
@@ -13,6 +18,9 @@ from utils.serializer.q3ReviewInSerializer import Q3ReviewInSerializer  # type:
 from utils.serializer.q3PartialSerializer import Q3PartialSerializer    # type: ignore
 from utils.model.message import Message, MessageType
 from utils.middleware.testMiddleware import TestMiddleware
+from utils.middleware.parallelMiddleware import ParallelMiddleware
+from utils.middleware import localBroker as broker
+from utils.clientTracker import ClientTracker
 from common.query3Worker import Query3Worker, IN_BOOKS_QUEUE_NAME, IN_REVIEWS_QUEUE_NAME
 
 from utils.model.virus import virus, Disease
@@ -21,6 +29,95 @@ from utils.model.virus import virus, Disease
 WORKER_ID = 2
 
 
+class HandlerThreadMiddleware(TestMiddleware):
+    """
+    Runs the callbacks in a thread of its own, not the one calling start,
+    as AsyncMiddleware does. Calls made from any other thread are recorded.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.handler = None
+        self.misrouted = []
+
+    def start(self):
+        errors = []
+
+        def __handle():
+            self.handler = threading.get_ident()
+            try:
+                TestMiddleware.start(self)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=__handle)
+        thread.start()
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def check_thread(self, action):
+        if self.handler is not None and threading.get_ident() != self.handler:
+            self.misrouted.append(action)
+
+    def ack_deferred(self):
+        self.check_thread('ack_deferred')
+        super().ack_deferred()
+
+    def call_later(self, delay, callback):
+        self.check_thread('call_later')
+        super().call_later(delay, callback)
+
+    def produce(self, data, out_queue_name):
+        self.check_thread('produce')
+        super().produce(data, out_queue_name)
+
+
+class BrokerClient():
+    # a raw connection to a LocalBroker, served over a socketpair
+    def __init__(self, local_broker):
+        self.sock, server_sock = socket.socketpair()
+        self.serving = threading.Thread(target=local_broker.serve, args=(server_sock,), daemon=True)
+        self.serving.start()
+        self.reader = self.sock.makefile('rb')
+
+    def send(self, frame_type, payload):
+        self.sock.sendall(broker.frame(frame_type, payload))
+
+    def consume(self, queue_name, prefetch):
+        self.send(broker.CONSUME, broker.encode_str(queue_name) + broker.PREFETCH.pack(prefetch))
+
+    def publish(self, routing_key, body, persistent=True):
+        self.send(broker.PUBLISH, broker.encode_str('') + broker.encode_str(routing_key)
+                  + broker.FLAG.pack(persistent) + body)
+
+    def ack(self, tag, multiple=False):
+        self.send(broker.ACK, broker.TAG.pack(tag) + broker.FLAG.pack(multiple))
+
+    def sync(self):
+        # [(tag, redelivered, body)] delivered before the SYNC_OK
+        self.send(broker.SYNC, broker.TAG.pack(0))
+        delivered = []
+        while True:
+            frame_type, payload = broker.read_frame(self.reader)
+            if frame_type == broker.SYNC_OK:
+                return delivered
+            if frame_type == broker.DECLARE_OK:
+                self.declared = broker.decode_str(payload, 0)[0]
+                continue
+            tag = broker.TAG.unpack_from(payload)[0]
+            redelivered = broker.FLAG.unpack_from(payload, broker.TAG.size)[0]
+            _, offset = broker.decode_str(payload, broker.TAG.size + broker.FLAG.size)
+            _, offset = broker.decode_str(payload, offset)
+            delivered.append((tag, redelivered, bytes(payload[offset:])))
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+        # the broker is done with the connection once serve returns
+        self.serving.join()
+
+
 class TestUtils(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -43,12 +140,12 @@ class TestUtils(unittest.TestCase):
             eof.ID = eof_id
         test_middleware.add_message(eof.to_bytes(), IN_BOOKS_QUEUE_NAME(WORKER_ID))
 
-    def append_book_chunk(self, client_id, test_middleware, chunk, chunk_id=None):
+    def append_book_chunk(self, client_id, test_middleware, chunk, chunk_id=None, columnar=False):
         serializer = Q3BookInSerializer()
         msg = Message(
             client_id=client_id,
             type=MessageType.DATA,
-            data=serializer.to_bytes(chunk),
+            data=serializer.to_columns(chunk) if columnar else serializer.to_bytes(chunk),
         )
         if chunk_id:
             msg.ID = chunk_id
@@ -67,12 +164,12 @@ class TestUtils(unittest.TestCase):
             eof.ID = eof_id
         test_middleware.add_message(eof.to_bytes(), IN_REVIEWS_QUEUE_NAME(WORKER_ID))
 
-    def append_review_chunk(self, client_id, test_middleware, chunk, chunk_id=None):
+    def append_review_chunk(self, client_id, test_middleware, chunk, chunk_id=None, columnar=False):
         serializer = Q3ReviewInSerializer()
         msg = Message(
             client_id=client_id,
             type=MessageType.DATA,
-            data=serializer.to_bytes(chunk),
+            data=serializer.to_columns(chunk) if columnar else serializer.to_bytes(chunk),
         )
         if chunk_id:
             msg.ID = chunk_id
@@ -530,6 +627,339 @@ class TestUtils(unittest.TestCase):
         self.check(client_2, [b2.title, b3.title], sent)
         self.check(client_3, [b1.title, b2.title, b3.title], sent)
 
+    def test_parallel_multiclient_with_entries_budget(self):
+        client_1 = uuid.UUID('60000000-0000-0000-0000-000000000000')
+        client_2 = uuid.UUID('61000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1_1 = self.make_reviews(b1, 8, 1.5)
+        rs2_1 = self.make_reviews(b2, 6, 2.5)
+        rs_1 = rs1_1+rs2_1
+        rs3_2 = self.make_reviews(b3, 5, 3.5)
+        rs4_2 = self.make_reviews(b4, 2, 4.5)
+        rs_2 = rs3_2+rs4_2
+
+        self.append_book_chunk(client_1, test_middleware, [b1, b2])
+        self.append_book_chunk(client_2, test_middleware, [b3, b4])
+        self.append_book_eof(client_1, test_middleware, sent=2)
+        self.append_book_eof(client_2, test_middleware, sent=2)
+        self.append_review_chunk(client_1, test_middleware, rs1_1[:4] + rs2_1[:3])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[:3] + rs4_2)
+        self.append_review_chunk(client_1, test_middleware, rs1_1[4:] + rs2_1[3:])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[3:])
+        self.append_review_eof(client_1, test_middleware, sent=len(rs_1))
+        self.append_review_eof(client_2, test_middleware, sent=len(rs_2))
+
+        unloads = []
+        unload_data = ClientTracker.unload_data
+
+        def count_unload(tracker):
+            unloads.append(tracker.client_id)
+            unload_data(tracker)
+
+        ClientTracker.unload_data = count_unload
+        try:
+            # one client's books at a time: every switch unloads the other one
+            worker = Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                                  peer_id=WORKER_ID, peers=10, chunk_size=2, max_entries=2,
+                                  test_middleware=test_middleware)
+            worker.run()
+        finally:
+            ClientTracker.unload_data = unload_data
+
+        assert client_1 in unloads and client_2 in unloads, f'unloaded: {unloads}'
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_1, [b1.title, b2.title], sent)
+        self.check(client_2, [b3.title], sent)
+
+    def test_parallel_queues_multiclient(self):
+        client_1 = uuid.UUID('70000000-0000-0000-0000-000000000000')
+        client_2 = uuid.UUID('71000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1_1 = self.make_reviews(b1, 8, 1.5)
+        rs2_1 = self.make_reviews(b2, 6, 2.5)
+        rs_1 = rs1_1+rs2_1
+        rs3_2 = self.make_reviews(b3, 5, 3.5)
+        rs4_2 = self.make_reviews(b4, 2, 4.5)
+        rs_2 = rs3_2+rs4_2
+
+        # client_2 books come first, client_1 books keep the books queue busy
+        self.append_book_chunk(client_2, test_middleware, [b3, b4])
+        self.append_book_eof(client_2, test_middleware, sent=2)
+        for _ in range(20):
+            self.append_book_chunk(client_1, test_middleware, [b1])
+        self.append_book_chunk(client_1, test_middleware, [b2])
+        self.append_book_eof(client_1, test_middleware, sent=21)
+        self.append_review_chunk(client_1, test_middleware, rs1_1[:4] + rs2_1[:3])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[:3] + rs4_2)
+        self.append_review_chunk(client_1, test_middleware, rs1_1[4:] + rs2_1[3:])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[3:])
+        self.append_review_eof(client_1, test_middleware, sent=len(rs_1))
+        self.append_review_eof(client_2, test_middleware, sent=len(rs_2))
+
+        parallel = ParallelMiddleware(TestMiddleware)
+        worker = Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                              peer_id=WORKER_ID, peers=10, chunk_size=2, parallel=True,
+                              test_middleware=parallel)
+        # one consumer (and thread) per queue
+        assert len(parallel.middlewares) == 2
+        for middleware in parallel.middlewares:
+            middleware.messages = [(msg, q) for msg, q in test_middleware.messages if q in middleware.callbacks]
+        worker.run()
+
+        sent = set([Message.from_bytes(raw_msg) for m in parallel.middlewares for raw_msg in m.sent])
+        self.check(client_1, [b1.title, b2.title], sent)
+        self.check(client_2, [b3.title], sent)
+
+    def test_parallel_queues_handler_threads(self):
+        client_1 = uuid.UUID('72000000-0000-0000-0000-000000000000')
+        client_2 = uuid.UUID('73000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1_1 = self.make_reviews(b1, 8, 1.5)
+        rs2_1 = self.make_reviews(b2, 6, 2.5)
+        rs_1 = rs1_1+rs2_1
+        rs3_2 = self.make_reviews(b3, 5, 3.5)
+        rs_2 = rs3_2
+
+        self.append_book_chunk(client_2, test_middleware, [b3, b4])
+        self.append_book_eof(client_2, test_middleware, sent=2)
+        for _ in range(20):
+            self.append_book_chunk(client_1, test_middleware, [b1])
+        self.append_book_chunk(client_1, test_middleware, [b2])
+        self.append_book_eof(client_1, test_middleware, sent=21)
+        self.append_review_chunk(client_1, test_middleware, rs1_1[:4] + rs2_1[:3])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[:3])
+        self.append_review_chunk(client_1, test_middleware, rs1_1[4:] + rs2_1[3:])
+        self.append_review_chunk(client_2, test_middleware, rs3_2[3:])
+        self.append_review_eof(client_1, test_middleware, sent=len(rs_1))
+        self.append_review_eof(client_2, test_middleware, sent=len(rs_2))
+
+        # the callbacks of each queue run in a handler thread, not in the consumer thread
+        parallel = ParallelMiddleware(HandlerThreadMiddleware)
+        worker = Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                              peer_id=WORKER_ID, peers=10, chunk_size=2, parallel=True,
+                              test_middleware=parallel)
+        for middleware in parallel.middlewares:
+            middleware.messages = [(msg, q) for msg, q in test_middleware.messages if q in middleware.callbacks]
+
+        # both queue threads may finish a client: clearing holds the worker lock
+        cleared = []
+        clear = ClientTracker.clear
+
+        def clear_holding_lock(client_id):
+            def probe():
+                acquired = worker.lock.acquire(blocking=False)
+                if acquired:
+                    worker.lock.release()
+                cleared.append((client_id, not acquired))
+            prober = threading.Thread(target=probe)
+            prober.start()
+            prober.join()
+            clear(client_id)
+        with unittest.mock.patch.object(ClientTracker, 'clear', clear_holding_lock):
+            worker.run()
+        assert sorted(cleared) == [(client_1, True), (client_2, True)]
+
+        # every output went through the middleware of the delivery it came from
+        for middleware in parallel.middlewares:
+            assert not middleware.misrouted, f'called from another consumer: {middleware.misrouted}'
+        sent = set([Message.from_bytes(raw_msg) for m in parallel.middlewares for raw_msg in m.sent])
+        self.check(client_1, [b1.title, b2.title], sent)
+        self.check(client_2, [b3.title], sent)
+
+    def test_early_reviews_are_parked(self):
+        client_id = uuid.UUID('80000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1 = self.make_reviews(b1, 8, 1.5)
+        rs2 = self.make_reviews(b2, 6, 2.5)
+        rs = rs1+rs2
+
+        # every review and the books EOF arrive before the books
+        self.append_review_chunk(client_id, test_middleware, rs1[:4] + rs2[:3])
+        self.append_book_eof(client_id, test_middleware, sent=4)
+        self.append_review_chunk(client_id, test_middleware, rs1[4:] + rs2[3:])
+        self.append_review_eof(client_id, test_middleware, sent=len(rs))
+        self.append_book_chunk(client_id, test_middleware, [b1, b2])
+        self.append_book_chunk(client_id, test_middleware, [b3, b4])
+        n_messages = len(test_middleware.messages)
+
+        worker = Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                              peer_id=WORKER_ID, peers=10, chunk_size=2, test_middleware=test_middleware)
+        worker.run()
+
+        # nothing was requeued
+        assert test_middleware.callback_counter == n_messages, \
+            f'callbacks: {test_middleware.callback_counter}, messages: {n_messages}'
+        assert not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1.title, b2.title], sent)
+
+    def test_parked_reviews_survive_crashes(self):
+        client_id = uuid.UUID('b0000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1 = self.make_reviews(b1, 8, 1.5)
+        rs2 = self.make_reviews(b2, 6, 2.5)
+        rs3 = self.make_reviews(b3, 4, 3.5)
+        rs4 = self.make_reviews(b4, 2, 4.5)
+        rs = rs1+rs2+rs3+rs4
+
+        self.append_review_chunk(client_id, test_middleware, rs1[:4] + rs3[:2])
+        self.append_review_chunk(client_id, test_middleware, rs2[:3] + rs4)
+        self.append_book_chunk(client_id, test_middleware, [b1, b2])
+        self.append_book_chunk(client_id, test_middleware, [b3, b4])
+        self.append_book_eof(client_id, test_middleware, sent=4)
+        self.append_review_chunk(client_id, test_middleware, rs2[3:])
+        self.append_review_eof(client_id, test_middleware, sent=len(rs))
+
+        def new_worker():
+            return Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                                peer_id=WORKER_ID, peers=10, chunk_size=2, test_middleware=test_middleware)
+
+        # 1st run: two chunks parked, crash on the first book chunk
+        with unittest.mock.patch.object(Query3Worker, 'recv_raw_book', side_effect=Disease):
+            self.assertRaises(Disease, new_worker().run)
+
+        # the crash tore a message being parked, another review chunk comes next
+        with open(BASE_DIRECTORY + '/' + str(client_id) + '/parked', 'ab') as fp:
+            fp.write(b'\x00\x00\x10\x00torn')
+        self.append_review_chunk(client_id, test_middleware, rs1[4:] + rs3[2:])
+        test_middleware.messages.insert(0, test_middleware.messages.pop())
+
+        # 2nd run: crash halfway through the parked reviews
+        work = Query3Worker.work
+        worked = []
+
+        def crash_once(worker, review):
+            worked.append(review)
+            if len(worked) == 8:
+                raise Disease
+            return work(worker, review)
+        with unittest.mock.patch.object(Query3Worker, 'work', crash_once):
+            self.assertRaises(Disease, new_worker().run)
+
+        # 3rd run: the recovery replays what is left parked
+        new_worker().run()
+
+        assert not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1.title, b2.title], sent)
+        partials = Q3PartialSerializer().from_chunk(io.BytesIO(
+            next(msg.data for msg in sent if msg.client_id == client_id and msg.type == MessageType.DATA)))
+        for partial in partials:
+            assert partial.n == {b1.title: 8, b2.title: 6}[partial.title], f'{partial.title}: {partial.n}'
+
+    def test_worker_columnar_chunks(self):
+        client_id = uuid.UUID('90000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1 = self.make_reviews(b1, 8, 1.5)
+        rs2 = self.make_reviews(b2, 6, 2.5)
+        rs3 = self.make_reviews(b3, 4, 3.5)
+        rs4 = self.make_reviews(b4, 2, 4.5)
+        rs = rs1+rs2+rs3+rs4
+
+        # b4 is out of the dates: left out of its chunk, still counted
+        self.append_book_chunk(client_id, test_middleware, [b1, b4], columnar=True)
+        self.append_book_chunk(client_id, test_middleware, [b2])
+        self.append_book_eof(client_id, test_middleware, sent=4)
+        self.append_book_chunk(client_id, test_middleware, [b3], columnar=True)
+
+        self.append_review_chunk(client_id, test_middleware, rs1[:4] + rs3[:2] + rs4, columnar=True)
+        self.append_review_chunk(client_id, test_middleware, rs2[:4] + rs3[2:])
+        self.append_review_chunk(client_id, test_middleware, rs1[4:] + rs2[4:], columnar=True)
+        self.append_review_eof(client_id, test_middleware, sent=len(rs))
+
+        worker = Query3Worker(min_amount_reviews=5, minimum_date=2000, maximum_date=2015,
+                              peer_id=WORKER_ID, peers=10, chunk_size=2, test_middleware=test_middleware)
+        worker.run()
+
+        assert not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1.title, b2.title], sent)
+
+
+class TestLocalBroker(unittest.TestCase):
+
+    def local_broker(self, directory):
+        definitions = os.path.join(directory, 'definitions.json')
+        with open(definitions, 'w') as fp:
+            json.dump({'queues': [{'name': 'Q', 'durable': True}],
+                       'exchanges': [{'name': 'X', 'type': 'direct'}]}, fp)
+        local_broker = broker.LocalBroker(definitions, 0, os.path.join(directory, 'broker'))
+        # the broker runs until killed and never closes its logs
+        self.addCleanup(self.close_logs, local_broker)
+        return local_broker
+
+    def close_logs(self, local_broker):
+        for q in local_broker.queues.values():
+            if q.log:
+                q.log.fp.close()
+
+    def test_broker_prefetch_and_multiple_ack(self):
+        with tempfile.TemporaryDirectory() as directory:
+            local_broker = self.local_broker(directory)
+            producer = BrokerClient(local_broker)
+            for i in range(5):
+                producer.publish('Q', bytes([i]))
+            producer.sync()
+
+            consumer = BrokerClient(local_broker)
+            consumer.consume('Q', 2)
+            assert consumer.sync() == [(1, False, b'\x00'), (2, False, b'\x01')]
+            consumer.ack(1)
+            assert consumer.sync() == [(3, False, b'\x02')]
+            # settles 2 and 3, not the ones after
+            consumer.ack(3, multiple=True)
+            assert consumer.sync() == [(4, False, b'\x03'), (5, False, b'\x04')]
+            consumer.close()
+
+            # the unacked come back, in order and flagged
+            consumer = BrokerClient(local_broker)
+            consumer.consume('Q', 0)
+            assert consumer.sync() == [(1, True, b'\x03'), (2, True, b'\x04')]
+            consumer.ack(2, multiple=True)
+            consumer.sync()
+            consumer.close()
+            producer.close()
+            assert not local_broker.queues['Q'].ready
+
+    def test_broker_drops_anonymous_queues(self):
+        with tempfile.TemporaryDirectory() as directory:
+            local_broker = self.local_broker(directory)
+            client = BrokerClient(local_broker)
+            client.send(broker.DECLARE, broker.encode_str(''))
+            client.sync()
+            queue_name = client.declared
+            assert queue_name.startswith('local.gen-')
+            client.send(broker.BIND, broker.encode_str('X') + broker.encode_str(queue_name) + broker.encode_str('k'))
+            client.sync()
+            assert (queue_name, 'k') in local_broker.exchanges['X'][1]
+
+            client.close()
+            assert queue_name not in local_broker.queues
+            assert local_broker.exchanges['X'][1] == []
+            assert not os.path.exists(os.path.join(directory, 'broker', f'{queue_name}.log'))
+
+    def test_broker_does_not_log_transient_messages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            producer = BrokerClient(self.local_broker(directory))
+            producer.publish('Q', b'persistent')
+            producer.publish('Q', b'transient', persistent=False)
+            producer.sync()
+            producer.close()
+
+            # a restarted broker only gets the logged ones
+            restarted = self.local_broker(directory)
+            assert [body for _, _, body, _ in restarted.queues['Q'].ready] == [b'persistent']
+
 
 if __name__ == '__main__':
     unittest.main()
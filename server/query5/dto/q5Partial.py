@@ -46,13 +46,12 @@ class Q5Partial:
     def encode(self):
         bytes_title = self.title.encode('utf-8')
 
-        bytes = b''
-        bytes += int.to_bytes(len(bytes_title), length=1, byteorder='big')
-        bytes += bytes_title
-
-        bytes += int.to_bytes(self.n, length=4, byteorder='big')
-        bytes += struct.pack("!f", self.sentimentAvg)   # std_length=4
-        return bytes
+        return b''.join([
+            int.to_bytes(len(bytes_title), length=1, byteorder='big'),
+            bytes_title,
+            int.to_bytes(self.n, length=4, byteorder='big'),
+            struct.pack("!f", self.sentimentAvg),   # std_length=4
+        ])
 
     def update(self, review: Review):
         avg = self.sentimentAvg
@@ -1,9 +1,5 @@
 from utils.serializer.serializer import Serializer
-from utils.protocol import SIZE_LENGTH
-from utils.protocol import integer_to_bytes, integer_from_bytes
-from utils.protocol import string_to_bytes, string_from_bytes
-from utils.protocol import float_to_bytes, float_from_bytes
-from utils.protocol import code_to_bytes
+from utils.serializer.schema import Schema, Field, FLOAT, INTEGER
 from dto.q5Partial import Q5Partial
 
 
@@ -16,35 +12,14 @@ class Q5PartialTypes():
 
 
 class Q5PartialSerializer(Serializer):
-    def make_raw_dict(self):
-        return {
-            Q5PartialTypes.TITLE: b'',
-            Q5PartialTypes.N: b'',
-            Q5PartialTypes.AVG: b'',
-        }
-
-    def from_raw_dict(self, raw_dict):
-        return Q5Partial(
-            title=string_from_bytes(raw_dict[Q5PartialTypes.TITLE]),
-            n=integer_from_bytes(raw_dict[Q5PartialTypes.N]),
-            sentimentAvg=float_from_bytes(raw_dict[Q5PartialTypes.AVG]),
-        )
-
-    def to_bytes(self, chunk: list):
-        raw_chunk = b''
-
-        for partialQ5 in chunk:
-            raw_partial = b''
-            raw_partial += string_to_bytes(partialQ5.title, Q5PartialTypes.TITLE)
-            raw_partial += integer_to_bytes(partialQ5.n, Q5PartialTypes.N)
-            raw_partial += float_to_bytes(partialQ5.sentimentAvg, Q5PartialTypes.AVG)
-
-            raw_chunk += code_to_bytes(Q5PartialTypes.PARTIAL)
-            raw_chunk += int.to_bytes(len(raw_partial), SIZE_LENGTH, 'big')
-            raw_chunk += raw_partial
-
-        result = code_to_bytes(Q5PartialTypes.CHUNK)
-        result += int.to_bytes(len(chunk), SIZE_LENGTH, 'big')
-        result += raw_chunk
-
-        return result
+    SCHEMA = Schema(
+        name='Q5Partial',
+        chunk_code=Q5PartialTypes.CHUNK,
+        object_code=Q5PartialTypes.PARTIAL,
+        fields=[
+            Field(Q5PartialTypes.TITLE, 'title', required=False),
+            Field(Q5PartialTypes.N, 'n', INTEGER, required=False),
+            Field(Q5PartialTypes.AVG, 'sentimentAvg', FLOAT, required=False),
+        ],
+        build=Q5Partial,
+    )
@@ -1,7 +1,5 @@
 from utils.serializer.serializer import Serializer
-from utils.protocol import SIZE_LENGTH
-from utils.protocol import string_to_bytes, string_from_bytes
-from utils.protocol import code_to_bytes
+from utils.serializer.schema import Schema, Field
 from model.review import Review
 
 
@@ -10,40 +8,18 @@ class Q5ReviewInTypes():
     REVIEW = 51
     TITLE = 52
     TEXT = 53
+    COLUMNS = 54
 
 
 class Q5ReviewInSerializer(Serializer):
-    def make_raw_dict(self):
-        return {
-            Q5ReviewInTypes.TITLE: b'',
-            Q5ReviewInTypes.TEXT: b'',
-        }
-
-    def from_raw_dict(self, raw_dict):
-        assert raw_dict[Q5ReviewInTypes.TITLE], "Invalid review: no title provided"
-        assert raw_dict[Q5ReviewInTypes.TEXT], "Invalid review: no text provided"
-
-        return Review(
-            id="",
-            title=string_from_bytes(raw_dict[Q5ReviewInTypes.TITLE]),
-            score=0.0,
-            text=string_from_bytes(raw_dict[Q5ReviewInTypes.TEXT]),
-        )
-
-    def to_bytes(self, chunk: list):
-        raw_chunk = b''
-
-        for review in chunk:
-            raw_review = b''
-            raw_review += string_to_bytes(review.title, Q5ReviewInTypes.TITLE)
-            raw_review += string_to_bytes(review.text, Q5ReviewInTypes.TEXT)
-
-            raw_chunk += code_to_bytes(Q5ReviewInTypes.REVIEW)
-            raw_chunk += int.to_bytes(len(raw_review), SIZE_LENGTH, 'big')
-            raw_chunk += raw_review
-
-        result = code_to_bytes(Q5ReviewInTypes.CHUNK)
-        result += int.to_bytes(len(chunk), SIZE_LENGTH, 'big')
-        result += raw_chunk
-
-        return result
+    SCHEMA = Schema(
+        name='review',
+        chunk_code=Q5ReviewInTypes.CHUNK,
+        columns_code=Q5ReviewInTypes.COLUMNS,
+        object_code=Q5ReviewInTypes.REVIEW,
+        fields=[
+            Field(Q5ReviewInTypes.TITLE, 'title'),
+            Field(Q5ReviewInTypes.TEXT, 'text'),
+        ],
+        build=lambda title, text: Review(id="", title=title, score=0.0, text=text),
+    )
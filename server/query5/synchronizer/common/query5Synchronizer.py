@@ -2,7 +2,8 @@ import logging
 from math import ceil
 
 from utils.synchronizer import Synchronizer, TOTAL
-from utils.middleware.middleware import Middleware
+from utils.middleware.middleware import new_middleware, BLOCKING
+from utils.logManager import FLUSH
 from utils.serializer.q5PartialSerializer import Q5PartialSerializer    # type: ignore
 from utils.serializer.q5OutSerializer import Q5OutSerializer            # type: ignore
 from dto.q5Partial import Q5Partial
@@ -14,14 +15,22 @@ TAG = 'Q5'
 
 
 class Query5Synchronizer(Synchronizer):
-    def __init__(self, n_workers, chunk_size, percentage, test_middleware=None):
-        middleware = test_middleware if test_middleware else Middleware()
+    def __init__(self, n_workers, chunk_size, percentage, group_size=1, group_timeout=0, durability=FLUSH,
+                 max_entries=0, prefetch_count=0, ack_batch=1,
+                 publish_window=0, batch_size=0, transient_routes=(), middleware_backend=BLOCKING, test_middleware=None):
+        middleware = test_middleware if test_middleware else new_middleware(
+            middleware_backend, prefetch_count=prefetch_count, ack_batch=ack_batch, publish_window=publish_window,
+            batch_size=batch_size, transient_routes=transient_routes)
         middleware.consume(queue_name=IN_QUEUE_NAME, callback=self.recv)
         super().__init__(middleware=middleware,
                          n_workers=n_workers,
                          in_serializer=Q5PartialSerializer(),
                          out_serializer=Q5OutSerializer(),
-                         chunk_size=chunk_size,)
+                         chunk_size=chunk_size,
+                         group_size=group_size,
+                         group_timeout=group_timeout,
+                         durability=durability,
+                         max_entries=max_entries)
         self.percentage = percentage
         self.recovery()
 
@@ -11,7 +11,7 @@ from model.review import Review
 from utils.serializer.q5BookInSerializer import Q5BookInSerializer      # type: ignore
 from utils.serializer.q5ReviewInSerializer import Q5ReviewInSerializer  # type: ignore
 from utils.serializer.q5PartialSerializer import Q5PartialSerializer    # type: ignore
-from utils.model.message import Message, MessageType
+from utils.model.message import Message, MessageType, NO_COMPRESSION, ZLIB, LZMA, MSG_TYPE
 from utils.middleware.testMiddleware import TestMiddleware
 from common.query5Worker import Query5Worker, IN_BOOKS_QUEUE_NAME, IN_REVIEWS_QUEUE_NAME
 
@@ -70,12 +70,13 @@ class TestUtils(unittest.TestCase):
             eof.ID = eof_id
         test_middleware.add_message(eof.to_bytes(), IN_REVIEWS_QUEUE_NAME(WORKER_ID))
 
-    def append_review_chunk(self, client_id, test_middleware, chunk, chunk_id=None):
+    def append_review_chunk(self, client_id, test_middleware, chunk, chunk_id=None, compression=NO_COMPRESSION):
         serializer = Q5ReviewInSerializer()
         msg = Message(
             client_id=client_id,
             type=MessageType.DATA,
             data=serializer.to_bytes(chunk),
+            compression=compression,
         )
         if chunk_id:
             msg.ID = chunk_id
@@ -279,6 +280,31 @@ class TestUtils(unittest.TestCase):
         sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
         self.check(client_id, [b1.title, b2.title], sent)
 
+    def test_worker_compressed_reviews(self):
+        client_id = uuid.UUID('a0000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1 = self.make_reviews(b1, 20, SENTIMENT_HIGH)
+        rs2 = self.make_reviews(b2, 20, SENTIMENT_LOW)
+
+        self.append_book_chunk(client_id, test_middleware, [b1, b2, b3, b4])
+        self.append_book_eof(client_id, test_middleware, sent=4)
+        self.append_review_chunk(client_id, test_middleware, rs1, compression=ZLIB)
+        self.append_review_chunk(client_id, test_middleware, rs2, compression=LZMA)
+        self.append_review_eof(client_id, test_middleware, sent=len(rs1+rs2))
+
+        # both chunks went compressed, under the same message type
+        raw_chunks = [raw_msg for raw_msg, _ in test_middleware.messages[2:4]]
+        assert all([raw_msg[MSG_TYPE] != MessageType.DATA.value[0] for raw_msg in raw_chunks])
+        assert all([Message.from_bytes(raw_msg).type == MessageType.DATA for raw_msg in raw_chunks])
+
+        worker = Query5Worker(category='Distributed Systems', peer_id=WORKER_ID, peers=10, chunk_size=2,
+                              test_middleware=test_middleware)
+        worker.run()
+
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1.title, b2.title], sent)
+
     def test_worker_premature_eof(self):
         client_id = uuid.UUID('10000000-0000-0000-0000-000000000000')
         test_middleware = TestMiddleware()
@@ -539,6 +565,36 @@ class TestUtils(unittest.TestCase):
         self.check(client_2, [b1.title], sent)
         self.check(client_3, [b1.title, b2.title, b3.title], sent)
 
+    def test_early_reviews_are_parked(self):
+        client_id = uuid.UUID('b0000000-0000-0000-0000-000000000000')
+        test_middleware = TestMiddleware()
+        b1, b2, b3, b4 = self.make_books_distributed()
+        rs1 = self.make_reviews(b1, 2, SENTIMENT_HIGH)
+        rs2 = self.make_reviews(b2, 4, SENTIMENT_LOW)
+        rs4 = self.make_reviews(b4, 2, SENTIMENT_NEUTRAL)
+        rs = rs1+rs2+rs4
+
+        # every review and the books EOF arrive before the books
+        self.append_review_chunk(client_id, test_middleware, [rs1[0], rs2[3], rs4[0]])
+        self.append_book_eof(client_id, test_middleware, sent=4)
+        self.append_review_chunk(client_id, test_middleware, [rs2[2], rs2[1], rs2[0]])
+        self.append_review_chunk(client_id, test_middleware, [rs1[1], rs4[1]])
+        self.append_review_eof(client_id, test_middleware, sent=len(rs))
+        self.append_book_chunk(client_id, test_middleware, [b1, b2])
+        self.append_book_chunk(client_id, test_middleware, [b3, b4])
+        n_messages = len(test_middleware.messages)
+
+        worker = Query5Worker(category='Distributed Systems', peer_id=WORKER_ID, peers=10, chunk_size=2,
+                              test_middleware=test_middleware)
+        worker.run()
+
+        # nothing was requeued
+        assert test_middleware.callback_counter == n_messages, \
+            f'callbacks: {test_middleware.callback_counter}, messages: {n_messages}'
+        assert not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        sent = set([Message.from_bytes(raw_msg) for raw_msg in test_middleware.sent])
+        self.check(client_id, [b1.title, b2.title], sent)
+
     def infected_worker_in_one_specific_line(self):
         client_1 = uuid.uuid4()
         client_2 = uuid.uuid4()
@@ -13,9 +13,10 @@ class ResultHandler():
         self.ip = config_params['ip']
         self.port = config_params['port']
         self.max_users = config_params['max_users']
+        self.middleware_backend = config_params['middleware_backend']
 
     def run(self):
-        self.psnd = ResultReceiver(self.results_directory, self.lock)
+        self.psnd = ResultReceiver(self.results_directory, self.lock, middleware_backend=self.middleware_backend)
         self.prcv = ResultSender(self.ip, self.port, self.max_users, self.results_directory, self.lock)
 
         self.psnd.start()
@@ -10,8 +10,8 @@ from utils.serializer.q3OutSerializer import Q3OutSerializer    # type: ignore
 from utils.serializer.q5OutSerializer import Q5OutSerializer    # type: ignore
 
 from utils.persistentMap import PersistentMap
-from utils.middleware.middleware import Middleware, ACK
-from utils.model.message import Message, MessageType
+from utils.middleware.middleware import new_middleware, BLOCKING, ACK
+from utils.model.message import Message, MessageType, TOTAL
 
 
 IN_QUEUE = 'RH-Results'
@@ -25,8 +25,6 @@ BASE_DIRECTORY = "/clients"
 
 TOTAL_BY_QUERY = "TOTAL_BY_QUERY"
 
-TOTAL = "total"
-
 EOF_LINE = "EOF"
 
 
@@ -82,7 +80,7 @@ class ClientTracker():
 
 
 class ResultReceiver(Process):
-    def __init__(self, results_directory, directory_lock, test_middleware=None):
+    def __init__(self, results_directory, directory_lock, test_middleware=None, middleware_backend=BLOCKING):
         super().__init__(name='ResultReceiver', args=())
         self.serializers = {
             'Q1': Q1OutSerializer(),
@@ -92,7 +90,7 @@ class ResultReceiver(Process):
             'Q5': Q5OutSerializer(),
         }
 
-        self.middleware = test_middleware if test_middleware else Middleware()
+        self.middleware = test_middleware if test_middleware else new_middleware(middleware_backend)
         self.middleware.consume(IN_QUEUE, callback=self.save_results)
 
         self.directory_lock = directory_lock
@@ -142,8 +140,7 @@ class ResultReceiver(Process):
                 chunk_ptrs.flush()
 
     def recv_results(self, results_raw, results_type):
-        reader = io.BytesIO(results_raw)
-        results = self.serializers[results_type].from_chunk(reader)
+        results = self.serializers[results_type].from_buffer(results_raw)
 
         complete_line = ""
         for r in results:
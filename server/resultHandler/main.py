@@ -27,6 +27,7 @@ def initialize_config():
         config_params["ip"] = os.getenv('SERVER_IP', config["DEFAULT"]["SERVER_IP"])
         config_params["results_directory"] = os.getenv('RESULTS_DIRECTORY', config["DEFAULT"]["RESULTS_DIRECTORY"])
         config_params['max_users'] = int(os.getenv('MAX_USERS', config["DEFAULT"]["MAX_USERS"]))
+        config_params["middleware_backend"] = os.getenv('MIDDLEWARE', config["DEFAULT"]["MIDDLEWARE"])
 
         config_params["heartbeat_ip"] = os.environ['HEARTBEAT_IP']
         config_params["heartbeat_port"] = int(os.environ['HEARTBEAT_PORT'])
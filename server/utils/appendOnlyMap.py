@@ -0,0 +1,263 @@
+import struct
+import mmap
+import os
+import io
+
+from utils.fsync import sync_directory
+
+PUT = b'\x01'
+DEL = b'\x02'
+
+KEY_LEN = 2
+VALUE_LEN = 4
+# [op][key_len] and [value_len] of every record
+RECORD_HEADER = struct.Struct('>cH')
+RECORD_VALUE_LEN = struct.Struct('>I')
+
+# A checkpoint rewrites the log as a snapshot of the live keys. It is taken
+# once the stale records (overwritten or deleted keys) that a recovery would
+# replay reach CHECKPOINT_RATIO times the live keys, and at least
+# MIN_STALE_RECORDS, so replay stays bounded and rewrites stay amortized.
+CHECKPOINT_RATIO = 1
+MIN_STALE_RECORDS = 1024
+
+
+class LazyValue():
+    """
+    Encoded value still in the mapped file, decoded on first access.
+    """
+    __slots__ = ('buffer', 'start', 'end')
+
+    def __init__(self, buffer, start, end):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+
+    def decode(self, decoder):
+        return decoder(io.BytesIO(self.buffer[self.start:self.end]))
+
+    def raw(self):
+        return bytes(self.buffer[self.start:self.end])
+
+
+class AppendOnlyMap():
+    """
+    Dict-like map persisted as a log of PUT/DEL records.
+
+    `flush` only appends the keys modified since the previous flush, instead
+    of re-encoding the whole map. Keys mutated in place (without going through
+    `__setitem__`) must be reported with `touch`. The file is a snapshot
+    (the last checkpoint) followed by the records appended since then.
+
+    `load` mmaps the file and, if `lazy`, leaves the values encoded in the
+    mapping until they are first read.
+    """
+
+    def __init__(self, path, sync=False):
+        self.path = path
+        # flush and checkpoint return once on disk
+        self.sync = sync
+        self.map = {}
+        self.dirty = set()
+        self.n_records = 0
+        self.tmp_file = path + '_tmp'
+        self.decoder = None
+
+        # until loaded, only blind writes are allowed: they are appended
+        # after the records on disk and win when the file is replayed
+        self.loaded = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        # the tail may be torn by a crash until checked by load or the first flush
+        self.checked = self.loaded
+        if not os.path.exists(self.path):
+            open(self.path, 'w').close()
+
+    def __setitem__(self, k, v):
+        self.dirty.add(k)
+        self.map.__setitem__(k, v)
+
+    def __delitem__(self, k):
+        self.dirty.add(k)
+        return self.map.__delitem__(k)
+
+    def __getitem__(self, k):
+        v = self.map.__getitem__(k)
+        if type(v) is LazyValue:
+            v = v.decode(self.decoder)
+            self.map[k] = v
+        return v
+
+    def __contains__(self, k):
+        return self.map.__contains__(k)
+
+    def __iter__(self):
+        return self.map.__iter__()
+
+    def __repr__(self):
+        return self.map.__repr__()
+
+    def __len__(self):
+        return self.map.__len__()
+
+    def materialize(self):
+        for k, v in self.map.items():
+            if type(v) is LazyValue:
+                self.map[k] = v.decode(self.decoder)
+
+    def values(self):
+        self.materialize()
+        return self.map.values()
+
+    def keys(self):
+        return self.map.keys()
+
+    def items(self):
+        self.materialize()
+        return self.map.items()
+
+    def touch(self, k):
+        self.dirty.add(k)
+
+    def encode_record(self, k):
+        _key = k.encode('utf-8')
+        if k in self.map:
+            v = self.map[k]
+            # values never read since the load are copied as they are
+            _value = v.raw() if type(v) is LazyValue else v.encode()
+            op = PUT
+        else:
+            _value = b''
+            op = DEL
+        return b''.join([
+            op,
+            int.to_bytes(len(_key), length=KEY_LEN, byteorder='big'),
+            _key,
+            int.to_bytes(len(_value), length=VALUE_LEN, byteorder='big'),
+            _value,
+        ])
+
+    def decode(self, buffer, decoder, lazy=False):
+        """
+        Replays the records in `buffer` (a memoryview). Returns the rebuilt
+        map, the amount of records read and the offset of the last complete
+        record, so a torn write at the end of the log can be truncated.
+        """
+        new_map = {}
+        n_records = 0
+        offset = 0
+        end = len(buffer)
+        while offset < end:
+            header_end = offset + RECORD_HEADER.size
+            if header_end > end:
+                break
+            op, key_len = RECORD_HEADER.unpack_from(buffer, offset)
+
+            key_end = header_end + key_len
+            if key_end + RECORD_VALUE_LEN.size > end:
+                break
+            value_len = RECORD_VALUE_LEN.unpack_from(buffer, key_end)[0]
+
+            value_start = key_end + RECORD_VALUE_LEN.size
+            value_end = value_start + value_len
+            if value_end > end:
+                break
+
+            key = str(buffer[header_end:key_end], 'utf-8')
+            if op == PUT:
+                value = LazyValue(buffer, value_start, value_end)
+                new_map[key] = value if lazy else value.decode(decoder)
+            elif op == DEL:
+                new_map.pop(key, None)
+            else:
+                break
+
+            n_records += 1
+            offset = value_end
+        return new_map, n_records, offset
+
+    def complete_length(self):
+        """
+        Offset of the end of the last complete record, reading only the
+        record headers (the values are skipped).
+        """
+        size = os.path.getsize(self.path)
+        offset = 0
+        with open(self.path, 'rb') as fp:
+            while offset < size:
+                fp.seek(offset)
+                header = fp.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                op, key_len = RECORD_HEADER.unpack(header)
+                if op not in (PUT, DEL):
+                    break
+                fp.seek(offset + RECORD_HEADER.size + key_len)
+                value_len = fp.read(RECORD_VALUE_LEN.size)
+                if len(value_len) < RECORD_VALUE_LEN.size:
+                    break
+                value_end = fp.tell() + RECORD_VALUE_LEN.unpack(value_len)[0]
+                if value_end > size:
+                    break
+                offset = value_end
+        return offset
+
+    def truncate_torn(self):
+        # appending after a torn record would hide every later one from load
+        offset = self.complete_length()
+        if offset != os.path.getsize(self.path):
+            os.truncate(self.path, offset)
+
+    def flush(self):
+        if not self.dirty:
+            return
+
+        if not self.checked:
+            self.truncate_torn()
+            self.checked = True
+        records = b''.join([self.encode_record(k) for k in self.dirty])
+        with open(self.path, 'ab') as fp:
+            fp.write(records)
+            if self.sync:
+                fp.flush()
+                os.fdatasync(fp.fileno())
+        self.n_records += len(self.dirty)
+        self.dirty = set()
+
+        if self.needs_checkpoint():
+            self.checkpoint()
+
+    def stale_records(self):
+        return self.n_records - len(self.map)
+
+    def needs_checkpoint(self):
+        if not self.loaded:
+            return False
+        stale = self.stale_records()
+        return stale >= MIN_STALE_RECORDS and stale >= CHECKPOINT_RATIO * len(self.map)
+
+    def checkpoint(self):
+        with open(self.tmp_file, 'wb') as tmp_fp:
+            tmp_fp.write(b''.join([self.encode_record(k) for k in self.map]))
+            if self.sync:
+                tmp_fp.flush()
+                os.fsync(tmp_fp.fileno())
+
+        os.rename(self.tmp_file, self.path)
+        if self.sync:
+            sync_directory(os.path.dirname(self.path))
+        self.n_records = len(self.map)
+        self.dirty = set()
+
+    def load(self, decoder, lazy=False):
+        self.decoder = decoder
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as fp:
+                # the mapping outlives the file object (and later checkpoints)
+                # while lazy values point into it
+                buffer = memoryview(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+            self.map, self.n_records, offset = self.decode(buffer, decoder, lazy)
+            if offset != len(buffer):
+                # Short write: drop the incomplete record at the tail.
+                os.truncate(self.path, offset)
+            self.dirty = set()
+        self.loaded = True
+        self.checked = True
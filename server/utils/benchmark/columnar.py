@@ -0,0 +1,67 @@
+"""
+Size and decode time of row and columnar review chunks, as the query3
+worker gets them.
+
+Usage (from a query3 worker image, or any directory holding `utils/` with
+the query3 serializers):
+    python3 -m utils.benchmark.columnar [n_reviews] [matching %]
+
+  rows:    from_buffer over a row chunk (to_bytes), every review is built
+  columns: from_buffer over a columnar chunk (to_columns), every review is built
+  select:  as columns, only the reviews of a saved book (`matching %` of
+           them) are built, as Query3Worker.select does
+"""
+import random
+import time
+import sys
+
+from model.review import Review
+from utils.serializer.q3ReviewInSerializer import Q3ReviewInSerializer  # type: ignore
+from utils.serializer import columns
+
+N_REVIEWS = 20000
+MATCHING = 10
+CHUNK_SIZES = [10, 100, 1000]
+
+
+def make_reviews(n_reviews):
+    rng = random.Random(0)
+    return [Review(id='', title=f'Book {rng.randrange(1000)}', score=float(rng.randrange(1, 6)), text='')
+            for _ in range(n_reviews)]
+
+
+def run(decode, raw_chunks):
+    start = time.perf_counter()
+    for raw in raw_chunks:
+        decode(raw)
+    return time.perf_counter() - start
+
+
+def main():
+    n_reviews = int(sys.argv[1]) if len(sys.argv) > 1 else N_REVIEWS
+    matching = int(sys.argv[2]) if len(sys.argv) > 2 else MATCHING
+    reviews = make_reviews(n_reviews)
+    titles = {f'Book {i}' for i in range(0, 1000, 100 // matching)} if matching else set()
+    serializer = Q3ReviewInSerializer()
+
+    def select(chunk):
+        return chunk.isin('title', titles)
+
+    print(f'reviews: {len(reviews)} | matching: {matching}% | numpy: {columns.numpy is not None}')
+    for chunk_size in CHUNK_SIZES:
+        chunks = [reviews[i:i + chunk_size] for i in range(0, len(reviews), chunk_size)]
+        raw_rows = [serializer.to_bytes(chunk) for chunk in chunks]
+        raw_columns = [serializer.to_columns(chunk) for chunk in chunks]
+        for name, raw_chunks, decode in [
+            ('rows', raw_rows, serializer.from_buffer),
+            ('columns', raw_columns, serializer.from_buffer),
+            ('select', raw_columns, lambda raw: serializer.from_buffer(raw, select=select)),
+        ]:
+            elapsed = run(decode, raw_chunks)
+            size = sum(len(raw) for raw in raw_chunks)
+            print(f'chunk: {chunk_size:<5} | {name:<7} | bytes/review: {size/len(reviews):6.1f} '
+                  f'| {elapsed/len(reviews)*1e6:5.2f} us/review')
+
+
+if __name__ == '__main__':
+    main()
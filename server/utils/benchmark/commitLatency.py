@@ -0,0 +1,81 @@
+"""
+Commit latency of the per-client WAL for every durability policy.
+
+Usage (from a worker image, or any directory holding `utils/`):
+    python3 -m utils.benchmark.commitLatency [n_commits] [chunks_per_commit]
+
+Every commit logs the metadata and the data changes of `chunks_per_commit`
+chunks as a single record, like a tracker in group-commit mode does.
+"""
+import tempfile
+import shutil
+import uuid
+import time
+import sys
+import os
+
+from utils.logManager import LogManager, DURABILITY_POLICIES
+
+N_COMMITS = 2000
+CHUNKS_PER_COMMIT = 1
+CHANGES_PER_CHUNK = 20
+
+
+def run(durability, n_commits, chunks_per_commit):
+    client_id = uuid.uuid4()
+    os.mkdir(LogManager.BASE_DIRECTORY + '/' + str(client_id))
+    log_manager = LogManager(client_id, durability)
+    log_manager.integers = ['WORKED', 'SENT', 'EXPECTED']
+
+    latencies = []
+    for i in range(n_commits):
+        chunk_ids = [uuid.uuid4() for _ in range(chunks_per_commit)]
+        for j in range(CHANGES_PER_CHUNK * chunks_per_commit):
+            # str has an encode method, like the partials do
+            log_manager.hold_change(f'key-{j}', f'old-value-{i}-{j}', None)
+
+        start = time.perf_counter()
+        log_manager.begin(chunk_ids[0])
+        for key in log_manager.integers:
+            log_manager.log_metadata(key, i)
+        log_manager.log_changes()
+        for chunk_id in chunk_ids[1:]:
+            log_manager.log_chunk(chunk_id)
+        log_manager.write_record()
+        log_manager.commit(chunk_ids[0])
+        latencies.append(time.perf_counter() - start)
+
+    log_manager.close()
+    return latencies
+
+
+def report(durability, latencies, chunks_per_commit):
+    latencies.sort()
+    n = len(latencies)
+    mean = sum(latencies) / n
+    p50 = latencies[n // 2]
+    p99 = latencies[min(n - 1, (n * 99) // 100)]
+    per_chunk = mean / chunks_per_commit
+    print(f'{durability:<8} | mean: {mean*1e6:9.1f} us | p50: {p50*1e6:9.1f} us '
+          f'| p99: {p99*1e6:9.1f} us | per chunk: {per_chunk*1e6:9.1f} us')
+
+
+def main():
+    n_commits = int(sys.argv[1]) if len(sys.argv) > 1 else N_COMMITS
+    chunks_per_commit = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNKS_PER_COMMIT
+
+    # not in /tmp, which may be a tmpfs where fdatasync is free
+    base_directory = tempfile.mkdtemp(prefix='clients-', dir=os.getcwd())
+    LogManager.BASE_DIRECTORY = base_directory
+    try:
+        print(f'commits: {n_commits} | chunks per commit: {chunks_per_commit} | '
+              f'changes per chunk: {CHANGES_PER_CHUNK}')
+        for durability in DURABILITY_POLICIES:
+            latencies = run(durability, n_commits, chunks_per_commit)
+            report(durability, latencies, chunks_per_commit)
+    finally:
+        shutil.rmtree(base_directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Size and CPU cost of every message compression on review chunks.
+
+Usage (from a query5 worker image, or any directory holding `utils/` with
+the query5 serializers):
+    python3 -m utils.benchmark.compression [books_rating.csv] [n_reviews]
+
+Without a csv the reviews are generated. For every chunk size it prints the
+bytes that reach the broker per review and the time to build and to read a
+message, which bounds the reviews per second one core can feed the broker.
+"""
+import random
+import time
+import uuid
+import csv
+import sys
+
+from model.review import Review
+from utils.model.message import Message, MessageType, COMPRESSIONS
+from utils.serializer.q5ReviewInSerializer import Q5ReviewInSerializer  # type: ignore
+
+N_REVIEWS = 20000
+CHUNK_SIZES = [1, 10, 50, 200, 1000]
+WORDS = ('the book this I and a of to is it was in story read characters author great good '
+         'really recommend love enjoyed well written one first series end time much like').split()
+
+
+def load_reviews(path, n_reviews):
+    reviews = []
+    with open(path, newline='', encoding='utf-8') as fp:
+        for row in csv.DictReader(fp):
+            reviews.append(Review(id='', title=row['Title'], score=0.0, text=row['review/text']))
+            if len(reviews) == n_reviews:
+                break
+    return reviews
+
+
+def make_reviews(n_reviews):
+    rng = random.Random(0)
+    return [Review(id='', title=f'Book {rng.randrange(1000)}', score=0.0,
+                   text=' '.join(rng.choices(WORDS, k=rng.randrange(20, 200))))
+            for _ in range(n_reviews)]
+
+
+def run(reviews, chunk_size, compression):
+    serializer = Q5ReviewInSerializer()
+    client_id = uuid.uuid4()
+    chunks = [serializer.to_bytes(reviews[i:i + chunk_size]) for i in range(0, len(reviews), chunk_size)]
+
+    n_bytes = 0
+    start = time.perf_counter()
+    raw_msgs = []
+    for chunk in chunks:
+        raw_msg = Message(client_id, MessageType.DATA, chunk, compression=compression).to_bytes()
+        n_bytes += len(raw_msg)
+        raw_msgs.append(raw_msg)
+    encode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for raw_msg in raw_msgs:
+        Message.from_bytes(raw_msg)
+    decode = time.perf_counter() - start
+    return n_bytes, encode, decode
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    n_reviews = int(sys.argv[2]) if len(sys.argv) > 2 else N_REVIEWS
+    reviews = load_reviews(path, n_reviews) if path else make_reviews(n_reviews)
+
+    print(f'reviews: {len(reviews)} | source: {path or "generated"}')
+    for chunk_size in CHUNK_SIZES:
+        raw_bytes = None
+        for compression in COMPRESSIONS:
+            n_bytes, encode, decode = run(reviews, chunk_size, compression)
+            raw_bytes = raw_bytes or n_bytes
+            print(f'chunk: {chunk_size:<5} | {compression:<5} | bytes/review: {n_bytes/len(reviews):8.1f} '
+                  f'| ratio: {n_bytes/raw_bytes:5.2f} | encode: {encode/len(reviews)*1e6:6.1f} us/review '
+                  f'| decode: {decode/len(reviews)*1e6:6.1f} us/review '
+                  f'| max: {len(reviews)/encode:9.0f} reviews/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Allocations and time to decode a review chunk as the query5 worker gets it.
+
+Usage (from a query5 worker image, or any directory holding `utils/` with
+the query5 serializers):
+    python3 -m utils.benchmark.decoding [n_reviews] [matching %]
+
+Every path starts from the raw message delivered by the middleware:
+  reader: Message.from_bytes, then from_chunk over an io.BytesIO
+  buffer: Message.from_bytes, then from_buffer over the data memoryview
+  lazy:   as buffer, the text is left as a memoryview and only decoded for
+          the reviews of a book of the category (`matching %` of them)
+
+For every chunk size it prints the memory blocks held by a decoded chunk
+and the peak memory while decoding it (tracemalloc: copies of the body and
+of every field count there), then the time per review.
+"""
+import tracemalloc
+import random
+import time
+import uuid
+import sys
+import io
+
+from model.review import Review
+from utils.model.message import Message, MessageType
+from utils.protocol import string_from_bytes
+from utils.serializer.q5ReviewInSerializer import Q5ReviewInSerializer  # type: ignore
+
+N_REVIEWS = 20000
+MATCHING = 10
+CHUNK_SIZES = [10, 100, 1000]
+WORDS = ('the book this I and a of to is it was in story read characters author great good '
+         'really recommend love enjoyed well written one first series end time much like').split()
+
+
+def make_reviews(n_reviews):
+    rng = random.Random(0)
+    return [Review(id='', title=f'Book {rng.randrange(1000)}', score=0.0,
+                   text=' '.join(rng.choices(WORDS, k=rng.randrange(20, 200))))
+            for _ in range(n_reviews)]
+
+
+def decode_reader(serializer, raw_msg, titles):
+    msg = Message.from_bytes(raw_msg)
+    return serializer.from_chunk(io.BytesIO(msg.data))
+
+
+def decode_buffer(serializer, raw_msg, titles):
+    msg = Message.from_bytes(raw_msg)
+    return serializer.from_buffer(msg.data)
+
+
+def decode_lazy(serializer, raw_msg, titles):
+    msg = Message.from_bytes(raw_msg)
+    reviews = serializer.from_buffer(msg.data, lazy=('text',))
+    for review in reviews:
+        if review.title in titles:
+            review.text = string_from_bytes(review.text)
+    return reviews
+
+
+def run(decode, raw_msgs, titles):
+    serializer = Q5ReviewInSerializer()
+    decode(serializer, raw_msgs[0], titles)
+
+    tracemalloc.start()
+    chunk = decode(serializer, raw_msgs[0], titles)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del chunk
+
+    start = time.perf_counter()
+    for raw_msg in raw_msgs:
+        decode(serializer, raw_msg, titles)
+    return blocks, peak, time.perf_counter() - start
+
+
+def main():
+    n_reviews = int(sys.argv[1]) if len(sys.argv) > 1 else N_REVIEWS
+    matching = int(sys.argv[2]) if len(sys.argv) > 2 else MATCHING
+    reviews = make_reviews(n_reviews)
+    titles = {f'Book {i}' for i in range(0, 1000, 100 // matching)} if matching else set()
+    serializer = Q5ReviewInSerializer()
+    client_id = uuid.uuid4()
+
+    print(f'reviews: {len(reviews)} | matching: {matching}%')
+    for chunk_size in CHUNK_SIZES:
+        raw_msgs = [Message(client_id, MessageType.DATA, serializer.to_bytes(reviews[i:i + chunk_size])).to_bytes()
+                    for i in range(0, len(reviews), chunk_size)]
+        for name, decode in [('reader', decode_reader), ('buffer', decode_buffer), ('lazy', decode_lazy)]:
+            blocks, peak, elapsed = run(decode, raw_msgs, titles)
+            print(f'chunk: {chunk_size:<5} | {name:<6} | blocks/chunk: {blocks:6} | peak: {peak/1024:8.1f} KiB '
+                  f'| {elapsed/len(reviews)*1e6:5.2f} us/review')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Throughput of the chunk builders against the chunk size.
+
+Usage (from any server image, or a directory holding `utils/` and `model/`):
+    python3 -m utils.benchmark.serializers [n_reviews]
+
+For every chunk size it serializes the same reviews with ReviewSerializer,
+which writes into a single buffer, and with the previous builder, which
+concatenated bytes objects. The previous builder copies the chunk once per
+field, so its time per review grows with the chunk size; the current one
+stays flat. Both must produce the same bytes.
+"""
+import random
+import time
+import sys
+
+from model.review import Review
+from utils.protocol import TlvTypes, SIZE_LENGTH
+from utils.protocol import code_to_bytes, string_to_bytes, float_to_bytes
+from utils.serializer.reviewSerializer import ReviewSerializer
+
+N_REVIEWS = 20000
+CHUNK_SIZES = [1, 10, 100, 1000, 10000]
+WORDS = ('the book this I and a of to is it was in story read characters author great good '
+         'really recommend love enjoyed well written one first series end time much like').split()
+
+
+def make_reviews(n_reviews):
+    rng = random.Random(0)
+    return [Review(id=str(rng.randrange(10**9)), title=f'Book {rng.randrange(1000)}',
+                   score=float(rng.randrange(1, 6)),
+                   text=' '.join(rng.choices(WORDS, k=rng.randrange(20, 200))))
+            for _ in range(n_reviews)]
+
+
+def concat_to_bytes(chunk):
+    raw_chunk = b''
+    for review in chunk:
+        raw_review = b''
+        raw_review += string_to_bytes(review.id, TlvTypes.REVIEW_ID)
+        raw_review += string_to_bytes(review.title, TlvTypes.REVIEW_TITLE)
+        raw_review += float_to_bytes(review.score, TlvTypes.REVIEW_SCORE)
+        raw_review += string_to_bytes(review.text, TlvTypes.REVIEW_TEXT)
+
+        raw_chunk += code_to_bytes(TlvTypes.REVIEW)
+        raw_chunk += int.to_bytes(len(raw_review), SIZE_LENGTH, 'big')
+        raw_chunk += raw_review
+    return raw_chunk
+
+
+def run(to_bytes, reviews, chunk_size):
+    n_bytes = 0
+    start = time.perf_counter()
+    for i in range(0, len(reviews), chunk_size):
+        n_bytes += len(to_bytes(reviews[i:i + chunk_size]))
+    return n_bytes, time.perf_counter() - start
+
+
+def main():
+    n_reviews = int(sys.argv[1]) if len(sys.argv) > 1 else N_REVIEWS
+    reviews = make_reviews(n_reviews)
+    serializer = ReviewSerializer()
+
+    assert serializer.to_bytes(reviews[:100]) == concat_to_bytes(reviews[:100])
+
+    print(f'reviews: {len(reviews)}')
+    for chunk_size in CHUNK_SIZES:
+        n_bytes, elapsed = run(serializer.to_bytes, reviews, chunk_size)
+        _, elapsed_concat = run(concat_to_bytes, reviews, chunk_size)
+        print(f'chunk: {chunk_size:<6} | bytes/chunk: {n_bytes/max(1, len(reviews)//chunk_size):10.0f} '
+              f'| writer: {n_bytes/elapsed/1e6:7.1f} MB/s {elapsed/len(reviews)*1e6:6.2f} us/review '
+              f'| concat: {n_bytes/elapsed_concat/1e6:7.1f} MB/s {elapsed_concat/len(reviews)*1e6:6.2f} us/review')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,12 @@ import os
 import io
 
 from utils.model.log import LogFactory, LogLineType
-from utils.persistentList import PersistentList
-from utils.persistentMap import PersistentMap
-from utils.persistentMap2 import PersistentMap2
-from utils.logManager import LogManager
+from utils.persistentSet import PersistentSet
+from utils.parkedMessages import ParkedMessages
+from utils.metaStore import MetaStore
+from utils.appendOnlyMap import AppendOnlyMap, MIN_STALE_RECORDS
+from utils.logManager import LogManager, FLUSH
+from utils.fsync import sync_directory
 
 
 BASE_DIRECTORY = '/clients'
@@ -20,26 +22,41 @@ EOF_ID = "EOF_ID"
 
 
 class ClientTracker():
-    def __init__(self, client_id):
+    def __init__(self, client_id, group_commit=False, durability=FLUSH):
 
         if not os.path.exists(BASE_DIRECTORY):
             os.mkdir(BASE_DIRECTORY)
 
-        if not os.path.exists(BASE_DIRECTORY + '/' + str(client_id)):
+        new_client = not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        if new_client:
             os.mkdir(BASE_DIRECTORY + '/' + str(client_id))
 
         self.client_id = client_id
-        self.log_manager = LogManager(client_id)
-
-        self.worked_chunks = PersistentList(BASE_DIRECTORY + '/' + str(client_id) + '/chunks')
-        self.meta_data = PersistentMap(BASE_DIRECTORY + '/' + str(client_id) + '/meta')
-        self.data = PersistentMap2(BASE_DIRECTORY + '/' + str(client_id) + '/data')
+        self.log_manager = LogManager(client_id, durability)
+        # data, meta and chunks are synced before the commit is acked
+        self.sync = durability != FLUSH
+
+        self.worked_chunks = PersistentSet(BASE_DIRECTORY + '/' + str(client_id) + '/chunks', self.sync)
+        self.meta_data = MetaStore(BASE_DIRECTORY + '/' + str(client_id) + '/meta', self.sync)
+        self.data = AppendOnlyMap(BASE_DIRECTORY + '/' + str(client_id) + '/data', self.sync)
+        self.parked = ParkedMessages(BASE_DIRECTORY + '/' + str(client_id) + '/parked', self.sync)
+        if new_client and self.sync:
+            # the new files and directory must outlive a host crash too
+            sync_directory(BASE_DIRECTORY + '/' + str(client_id))
+            sync_directory(BASE_DIRECTORY)
 
         self.meta_data[EXPECTED] = -1
         self.meta_data[WORKED] = 0
         self.meta_data[SENT] = 0
         self.meta_data[EOF_ID] = str(uuid.uuid4())
 
+        # group commit: chunks persisted since the last commit
+        self.group_commit = group_commit
+        self.staged_chunks = []
+        self.staged_meta = {}
+        self.staged_data = False
+        self.replayed_records = 0
+
         # DUMMY PARSER
         self.parser = lambda v: v
 
@@ -51,16 +68,21 @@ class ClientTracker():
         os.rename(f'{BASE_DIRECTORY}/{str(client_id)}', NULL_DIRECTORY)
         shutil.rmtree(NULL_DIRECTORY)
 
+    def close(self):
+        self.log_manager.close()
+        self.meta_data.close()
+
     def undo(self):
-        with open(self.log_manager.log_file, 'rb') as f:
-            aux = f.read()
+        aux = self.log_manager.read()
         log_lines = LogFactory.from_bytes(io.BytesIO(aux), self.parser, self.log_manager.meta_decoder)
         if not log_lines:
             return
         if log_lines[-1].type == LogLineType.COMMIT:
-            chunk_id = log_lines[-1].chunk_id
-            if chunk_id not in self.worked_chunks:
-                self.worked_chunks.append(chunk_id)
+            # the record may commit a whole group of chunks
+            self.worked_chunks.append(log_lines[-1].chunk_id)
+            for log_line in log_lines:
+                if log_line.type == LogLineType.CHUNK:
+                    self.worked_chunks.append(log_line.chunk_id)
             return
 
         log_lines.reverse()
@@ -79,13 +101,31 @@ class ClientTracker():
         self.meta_data.flush()
 
     def recovery(self):
-        self.meta_data.load(lambda k, v: v)
+        # index only: the data is loaded by load_data on first use, the
+        # undo below just appends the old values after the records on disk
+        self.meta_data.load()
         self.worked_chunks.load()
-        self.data.load(self.parser)
 
         if os.path.getsize(self.log_manager.log_file) > 0:
             self.undo()
 
+    def can_unload(self):
+        return not self.staged_chunks and not self.data.dirty and not self.log_manager.changes
+
+    def unload_data(self):
+        self.data = AppendOnlyMap(self.data.path, self.sync)
+
+    def load_data(self):
+        if self.data.loaded:
+            return
+        self.data.load(self.parser, lazy=True)
+
+        # records replayed to rebuild the data, reported by the recovery metric
+        self.replayed_records = self.data.n_records
+        if self.data.stale_records() >= MIN_STALE_RECORDS:
+            # long tail: checkpoint, the next restart only reads the snapshot
+            self.data.checkpoint()
+
     def eof_id(self):
         return uuid.UUID(self.meta_data[EOF_ID])
 
@@ -96,12 +136,9 @@ class ClientTracker():
         return self.meta_data[EXPECTED] == self.meta_data[WORKED]
 
     def persist(self, chunk_id, flush_data=False, **meta_changes):
-        self.log_manager.begin(chunk_id)
         for meta_k in meta_changes:
-            self.log_manager.log_metadata(meta_k, self.meta_data[meta_k])
-
-        if flush_data:
-            self.log_manager.log_changes()
+            if meta_k not in self.staged_meta:
+                self.staged_meta[meta_k] = self.meta_data[meta_k]
 
         for meta_k, meta_v in meta_changes.items():
             if meta_v is None:
@@ -111,12 +148,44 @@ class ClientTracker():
             else:
                 self.meta_data[meta_k] = meta_v
 
-        if flush_data:
+        self.staged_data = self.staged_data or flush_data
+        self.staged_chunks.append(chunk_id)
+        self.worked_chunks.add(chunk_id)
+
+        if not self.group_commit:
+            self.commit()
+
+    def commit(self):
+        if not self.staged_chunks:
+            return
+        chunk_id = self.staged_chunks[0]
+
+        self.log_manager.begin(chunk_id)
+        for meta_k, meta_v in self.staged_meta.items():
+            self.log_manager.log_metadata(meta_k, meta_v)
+
+        if self.staged_data:
+            # values updated in place are only known by the log manager
+            for k in self.log_manager.changes:
+                self.data.touch(k)
+            self.log_manager.log_changes()
+
+        for other_chunk_id in self.staged_chunks[1:]:
+            self.log_manager.log_chunk(other_chunk_id)
+        self.log_manager.write_record()
+
+        if self.staged_data:
             self.data.flush()
 
         self.meta_data.flush()
         self.log_manager.commit(chunk_id)
-        self.worked_chunks.append(chunk_id)
+        # only once committed: an undone chunk must not be marked as worked.
+        # Synced (if self.sync) before the ack, the log holds them until then
+        self.worked_chunks.flush()
+
+        self.staged_chunks = []
+        self.staged_meta = {}
+        self.staged_data = False
 
     def __repr__(self) -> str:
         n_data = len(self.data)
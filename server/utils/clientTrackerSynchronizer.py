@@ -4,10 +4,11 @@ import os
 import io
 
 from utils.model.log import LogFactory, LogLineType
-from utils.persistentList import PersistentList
-from utils.persistentMap import PersistentMap
-from utils.persistentMap2 import PersistentMap2
-from utils.logManager import LogManager
+from utils.persistentSet import PersistentSet
+from utils.metaStore import MetaStore
+from utils.appendOnlyMap import AppendOnlyMap, MIN_STALE_RECORDS
+from utils.logManager import LogManager, FLUSH
+from utils.fsync import sync_directory
 
 
 BASE_DIRECTORY = "/clients"
@@ -18,61 +19,99 @@ EOF_ID = "EOF_ID"
 
 
 class ClientTrackerSynchronizer():
-    def __init__(self, client_id, n_workers):
+    def __init__(self, client_id, n_workers, group_commit=False, durability=FLUSH):
 
         if not os.path.exists(BASE_DIRECTORY):
             os.mkdir(BASE_DIRECTORY)
 
-        if not os.path.exists(BASE_DIRECTORY + '/' + str(client_id)):
+        new_client = not os.path.exists(BASE_DIRECTORY + '/' + str(client_id))
+        if new_client:
             os.mkdir(BASE_DIRECTORY + '/' + str(client_id))
 
         self.client_id = client_id
         self.n_workers = n_workers
-        self.log_manager = LogManager(client_id)
-
-        self.worked_chunks = PersistentList(BASE_DIRECTORY + '/' + str(client_id) + '/' + 'chunks')
-        self.meta_data = PersistentMap(BASE_DIRECTORY + '/' + str(client_id) + '/' + "meta")
-        self.data = PersistentMap2(BASE_DIRECTORY + '/' + str(client_id) + '/' + "data")
+        self.log_manager = LogManager(client_id, durability)
+        # data, meta and chunks are synced before the commit is acked
+        self.sync = durability != FLUSH
+
+        self.worked_chunks = PersistentSet(BASE_DIRECTORY + '/' + str(client_id) + '/' + 'chunks', self.sync)
+        self.meta_data = MetaStore(BASE_DIRECTORY + '/' + str(client_id) + '/' + "meta", self.sync)
+        self.data = AppendOnlyMap(BASE_DIRECTORY + '/' + str(client_id) + '/' + "data", self.sync)
+        if new_client and self.sync:
+            # the new files and directory must outlive a host crash too
+            sync_directory(BASE_DIRECTORY + '/' + str(client_id))
+            sync_directory(BASE_DIRECTORY)
 
         self.meta_data[WORKED_BY_WORKER] = {str(i): 0 for i in range(1, n_workers+1)}
         self.meta_data[TOTAL_BY_WORKER] = {str(i): -1 for i in range(1, n_workers+1)}
         self.meta_data[EOF_ID] = str(uuid.uuid4())
 
+        # group commit: (chunk_id, worker_id, old meta values) persisted
+        # since the last commit, old values are only kept on first change
+        self.group_commit = group_commit
+        self.staged_chunks = []
+        self.staged_keys = set()
+        self.staged_data = False
+        self.replayed_records = 0
+
         # DUMMY PARSER
         self.parser = lambda v: v
         self.log_manager.booleans = []
         self.log_manager.integers = [WORKED_BY_WORKER, TOTAL_BY_WORKER]
 
     def undo(self):
-        with open(self.log_manager.log_file, 'rb') as f:
-            aux = f.read()
+        aux = self.log_manager.read()
         log_lines = LogFactory.from_bytes(io.BytesIO(aux), self.parser, self.log_manager.meta_decoder)
         if not log_lines:
             return
         if log_lines[-1].type == LogLineType.COMMIT:
-            chunk_id = log_lines[-1].chunk_id
-            if chunk_id not in self.worked_chunks:
-                self.worked_chunks.append(chunk_id)
+            # the record may commit a whole group of chunks
+            self.worked_chunks.append(log_lines[-1].chunk_id)
+            for log_line in log_lines:
+                if log_line.type == LogLineType.CHUNK:
+                    self.worked_chunks.append(log_line.chunk_id)
             return
 
-        worker_id = str(log_lines[0].worker_id)
-        log_lines.reverse()
+        # metadata lines belong to the worker of the BEGIN/CHUNK line above them
+        old_values = []
         for log_line in log_lines:
-            if log_line.type == LogLineType.WRITE_METADATA:
-                self.meta_data[log_line.key][worker_id] = log_line.old_value
-            elif log_line.type == LogLineType.BEGIN:
-                break
+            if log_line.type == LogLineType.BEGIN or log_line.type == LogLineType.CHUNK:
+                worker_id = str(log_line.worker_id)
+            elif log_line.type == LogLineType.WRITE_METADATA:
+                old_values.append((log_line.key, worker_id, log_line.old_value))
+
+        old_values.reverse()
+        for key, worker_id, old_value in old_values:
+            self.meta_data[key][worker_id] = old_value
 
         self.meta_data.flush()
 
     def recovery(self):
-        self.meta_data.load(lambda k, v: v)
+        # index only: the data is loaded by load_data on first use, the
+        # undo below just appends the old values after the records on disk
+        self.meta_data.load()
         self.worked_chunks.load()
-        self.data.load(self.parser)
 
         if os.path.getsize(self.log_manager.log_file) > 0:
             self.undo()
 
+    def can_unload(self):
+        return not self.staged_chunks and not self.data.dirty and not self.log_manager.changes
+
+    def unload_data(self):
+        self.data = AppendOnlyMap(self.data.path, self.sync)
+
+    def load_data(self):
+        if self.data.loaded:
+            return
+        self.data.load(self.parser, lazy=True)
+
+        # records replayed to rebuild the data, reported by the recovery metric
+        self.replayed_records = self.data.n_records
+        if self.data.stale_records() >= MIN_STALE_RECORDS:
+            # long tail: checkpoint, the next restart only reads the snapshot
+            self.data.checkpoint()
+
     def all_chunks_received(self):
         return all(
             (self.meta_data[TOTAL_BY_WORKER][str(i)] == self.meta_data[WORKED_BY_WORKER][str(i)])
@@ -86,24 +125,56 @@ class ClientTrackerSynchronizer():
         return uuid.UUID(self.meta_data[EOF_ID])
 
     def clear(self):
+        self.log_manager.close()
+        self.meta_data.close()
         os.rename(f'{BASE_DIRECTORY}/{str(self.client_id)}', NULL_DIRECTORY)
         shutil.rmtree(NULL_DIRECTORY)
 
     def persist(self, chunk_id, worker_id, worked=None, total=None):
-        self.log_manager.begin(chunk_id, int(worker_id))
-        if worked is not None:
-            self.log_manager.log_metadata(WORKED_BY_WORKER, self.meta_data[WORKED_BY_WORKER][worker_id])
-        if total is not None:
-            self.log_manager.log_metadata(TOTAL_BY_WORKER, self.meta_data[TOTAL_BY_WORKER][worker_id])
+        old_values = []
+        if worked is not None and (WORKED_BY_WORKER, worker_id) not in self.staged_keys:
+            self.staged_keys.add((WORKED_BY_WORKER, worker_id))
+            old_values.append((WORKED_BY_WORKER, self.meta_data[WORKED_BY_WORKER][worker_id]))
+        if total is not None and (TOTAL_BY_WORKER, worker_id) not in self.staged_keys:
+            self.staged_keys.add((TOTAL_BY_WORKER, worker_id))
+            old_values.append((TOTAL_BY_WORKER, self.meta_data[TOTAL_BY_WORKER][worker_id]))
         if total is not None:
             self.meta_data[TOTAL_BY_WORKER][worker_id] = total
         if worked is not None:
             self.meta_data[WORKED_BY_WORKER][worker_id] += worked
+            self.staged_data = True
+
+        self.staged_chunks.append((chunk_id, int(worker_id), old_values))
+        self.worked_chunks.add(chunk_id)
+
+        if not self.group_commit:
+            self.commit()
+
+    def commit(self):
+        if not self.staged_chunks:
+            return
+        chunk_id, worker_id, old_values = self.staged_chunks[0]
+
+        self.log_manager.begin(chunk_id, worker_id)
+        for key, old_value in old_values:
+            self.log_manager.log_metadata(key, old_value)
+        for other_chunk_id, other_worker_id, other_old_values in self.staged_chunks[1:]:
+            self.log_manager.log_chunk(other_chunk_id, other_worker_id)
+            for key, old_value in other_old_values:
+                self.log_manager.log_metadata(key, old_value)
+        self.log_manager.write_record()
+
+        if self.staged_data:
             self.data.flush()
         self.meta_data.flush()
-        self.log_manager.commit(chunk_id, int(worker_id))
-        # append & flush chunk_id
-        self.worked_chunks.append(chunk_id)
+        self.log_manager.commit(chunk_id, worker_id)
+        # append & flush chunk_ids, only once committed: an undone chunk must
+        # not be marked as worked. Synced (if self.sync) before the ack
+        self.worked_chunks.flush()
+
+        self.staged_chunks = []
+        self.staged_keys = set()
+        self.staged_data = False
 
     def __repr__(self) -> str:
         return f'ClientTracker({self.client_id})'
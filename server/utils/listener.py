@@ -1,15 +1,112 @@
+from collections import OrderedDict
+import threading
 import logging
 import signal
 
-from utils.middleware.middleware import Middleware
+from utils.middleware.middleware import Middleware, ACK, DEFER
 
 
 class Listener():
-    def __init__(self, middleware: Middleware):
+    def __init__(self, middleware: Middleware, group_size=1, group_timeout=0, max_entries=0):
         signal.signal(signal.SIGTERM, self.__handle_signal)
         self.middleware = middleware
         self.exitcode = 0
 
+        # group commit: up to group_size chunks (or group_timeout ms) are
+        # persisted in a single record, their ACKs wait for that record
+        self.group_size = group_size
+        self.group_timeout = group_timeout
+        self.group = {}
+        self.group_timer = False
+
+        # trackers with their data in memory, least recently used first.
+        # Past max_entries data entries (0: no limit) the idle ones are
+        # unloaded, their data is already on disk
+        self.max_entries = max_entries
+        self.lru = OrderedDict()
+
+        # callbacks may run from several consumer threads (one per queue):
+        # each thread has its own current tracker, a client is handled by
+        # one thread at a time and `lock` guards the state they share
+        self.local = threading.local()
+        self.lock = threading.RLock()
+        self.client_locks = {}
+
+    @property
+    def tracker(self):
+        return getattr(self.local, 'tracker', None)
+
+    @tracker.setter
+    def tracker(self, tracker):
+        self.local.tracker = tracker
+
+    def client_lock(self, client_id):
+        with self.lock:
+            if client_id not in self.client_locks:
+                self.client_locks[client_id] = threading.RLock()
+            return self.client_locks[client_id]
+
+    def cache_tracker(self, tracker):
+        with self.lock:
+            self.lru.pop(tracker.client_id, None)
+            self.lru[tracker.client_id] = tracker
+            if not self.max_entries:
+                return
+
+            entries = sum(len(t.data) for t in self.lru.values())
+            for client_id, t in list(self.lru.items()):
+                if entries <= self.max_entries:
+                    break
+                if t is tracker:
+                    continue
+                # skip the clients some other thread is working on
+                client_lock = self.client_lock(client_id)
+                if not client_lock.acquire(blocking=False):
+                    continue
+                try:
+                    if not t.can_unload():
+                        continue
+                    entries -= len(t.data)
+                    t.unload_data()
+                    del self.lru[client_id]
+                finally:
+                    client_lock.release()
+                logging.debug(f'action: unload_tracker | client: {client_id} | entries: {entries}')
+
+    def forget_tracker(self, client_id):
+        with self.lock:
+            self.lru.pop(client_id, None)
+            self.client_locks.pop(client_id, None)
+
+    def group_commit(self):
+        return self.group_size > 1
+
+    def ack(self, tracker):
+        if tracker is not None and tracker.staged_chunks:
+            self.group[tracker.client_id] = tracker
+        if not self.group:
+            return ACK
+
+        if sum(len(t.staged_chunks) for t in self.group.values()) >= self.group_size:
+            self.commit_group()
+            return ACK
+
+        if not self.group_timer:
+            self.group_timer = True
+            self.middleware.call_later(self.group_timeout / 1000, self.__group_timeout)
+        return DEFER
+
+    def commit_group(self):
+        for tracker in self.group.values():
+            tracker.commit()
+        self.group = {}
+        self.middleware.ack_deferred()
+        logging.debug('action: commit_group | result: success')
+
+    def __group_timeout(self):
+        self.group_timer = False
+        self.commit_group()
+
     def run(self):
         self.middleware.start()
         return self.exitcode
@@ -1,26 +1,49 @@
 import os
 
-from utils.model.log import WriteLine, WriteMetadataLine, BeginLine, CommitLine
+from utils.model.log import WriteLine, WriteMetadataLine, BeginLine, CommitLine, ChunkLine
+
+# Durability policies:
+#  - FLUSH: every write is handed to the OS, it survives a crash of the
+#    process but not of the host.
+#  - SYNC_COMMIT: fdatasync after the record and after the COMMIT line, so
+#    the undo information is on disk before the data files are touched.
+#    The tracker syncs its data, meta and chunks files before acking too:
+#    committed work survives a host crash.
+#  - SYNC_GROUP: as SYNC_COMMIT, without syncing the record first. Acked
+#    work survives a host crash, but a host crash in the middle of a commit
+#    may leave data files modified with no undo record: no recovery
+#    guarantee for the chunks being committed.
+FLUSH = 'flush'
+SYNC_COMMIT = 'commit'
+SYNC_GROUP = 'group'
+DURABILITY_POLICIES = [FLUSH, SYNC_COMMIT, SYNC_GROUP]
 
 
 class LogManager():
     BASE_DIRECTORY = '/clients'
 
-    def __init__(self, client_id):
+    def __init__(self, client_id, durability=FLUSH):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f'Unknown durability policy: {durability}')
+
         self.client_id = client_id
+        self.durability = durability
 
         self.log_file = LogManager.BASE_DIRECTORY + '/' + str(client_id) + '/log'
         if not os.path.exists(self.log_file):
             open(self.log_file, 'wb').close()
+        # kept open (and buffered) for the whole life of the tracker
+        self.fp = open(self.log_file, 'r+b')
 
         self.booleans = []
         self.integers = []
         self.changes = {}
+        self.record = []
 
     def begin(self, chunk_id, worker_id=None):
-        with open(self.log_file, "wb") as log_file:
-            begin_line = BeginLine(chunk_id, worker_id)
-            log_file.write(begin_line.encode())
+        # lines are buffered until write_record, so a whole record
+        # costs a single write no matter how many lines it holds
+        self.record = [BeginLine(chunk_id, worker_id).encode()]
 
     def hold_change(self, k, v_old, v_new):
         if k not in self.changes:
@@ -29,14 +52,15 @@ class LogManager():
             self.changes[k][1] = v_new
 
     def log_changes(self):
-        with open(self.log_file, "ab") as log_file:
-            for k in self.changes:
-                old = self.changes[k][0]
-                write_line = WriteLine(k, old)
-                log_file.write(write_line.encode())
+        for k in self.changes:
+            old = self.changes[k][0]
+            self.record.append(WriteLine(k, old).encode())
 
         self.changes = {}
 
+    def log_chunk(self, chunk_id, worker_id=None):
+        self.record.append(ChunkLine(chunk_id, worker_id).encode())
+
     def meta_decoder(self, k, _b):
         if k in self.booleans:
             return bool.from_bytes(_b, byteorder='big')
@@ -50,14 +74,32 @@ class LogManager():
         return int.to_bytes(v, length=4, byteorder='big', signed=True)
 
     def log_metadata(self, key, v_old):
-        with open(self.log_file, "ab") as log_file:
-            if key in self.booleans:
-                write_line = WriteMetadataLine(key, v_old, self.bool_encoder)
-            else:
-                write_line = WriteMetadataLine(key, v_old, self.int_encoder)
-            log_file.write(write_line.encode())
+        if key in self.booleans:
+            write_line = WriteMetadataLine(key, v_old, self.bool_encoder)
+        else:
+            write_line = WriteMetadataLine(key, v_old, self.int_encoder)
+        self.record.append(write_line.encode())
+
+    def read(self):
+        self.fp.seek(0, os.SEEK_SET)
+        return self.fp.read()
+
+    def write_record(self):
+        # the new record replaces the previous (committed) one
+        self.fp.seek(0, os.SEEK_SET)
+        self.fp.write(b''.join(self.record))
+        self.fp.truncate()
+        self.fp.flush()
+        if self.durability == SYNC_COMMIT:
+            os.fdatasync(self.fp.fileno())
+        self.record = []
 
     def commit(self, chunk_id, worker_id=None):
-        with open(self.log_file, "ab") as log_file:
-            commit_line = CommitLine(chunk_id, worker_id)
-            log_file.write(commit_line.encode())
+        commit_line = CommitLine(chunk_id, worker_id)
+        self.fp.write(commit_line.encode())
+        self.fp.flush()
+        if self.durability != FLUSH:
+            os.fdatasync(self.fp.fileno())
+
+    def close(self):
+        self.fp.close()
@@ -0,0 +1,228 @@
+import struct
+import uuid
+import zlib
+import os
+
+from utils.fsync import sync_directory
+
+# value types
+BOOL = 1
+INT = 2
+UUID = 3
+INT_DICT = 4
+
+FORMATS = {
+    BOOL: '?',
+    INT: 'q',
+    UUID: '16s',
+}
+
+SCHEMA_LEN = struct.Struct('>H')
+SEQ = struct.Struct('>Q')
+CRC = struct.Struct('>I')
+N_SLOTS = 2
+
+
+class MetaStore():
+    """
+    Dict-like map for the tracker metadata: a handful of counters, flags,
+    uuids (as str) and per-worker counters (dicts of str -> int).
+
+    The file starts with the schema (keys and value types, in insertion
+    order) followed by two fixed-size slots [seq][packed values][crc32].
+    `flush` overwrites the oldest slot with a single pwrite, `load` keeps the
+    valid slot with the highest seq, so a torn write only loses that flush.
+    The file is only rewritten (tmp + rename) when the schema changes.
+    With `sync`, flush returns once the slot (or the new file) is on disk.
+    """
+
+    def __init__(self, path, sync=False):
+        self.path = path
+        self.sync = sync
+        self.map = {}
+        self.tmp_file = path + '_tmp'
+
+        self.schema = None
+        self.struct = None
+        self.header_len = 0
+        self.slot_len = 0
+        self.seq = 0
+
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __setitem__(self, k, v):
+        self.map.__setitem__(k, v)
+
+    def __delitem__(self, k):
+        return self.map.__delitem__(k)
+
+    def __getitem__(self, k):
+        return self.map.__getitem__(k)
+
+    def __contains__(self, k):
+        return self.map.__contains__(k)
+
+    def __iter__(self):
+        return self.map.__iter__()
+
+    def __repr__(self):
+        return self.map.__repr__()
+
+    def __len__(self):
+        return self.map.__len__()
+
+    def values(self):
+        return self.map.values()
+
+    def keys(self):
+        return self.map.keys()
+
+    def items(self):
+        return self.map.items()
+
+    @classmethod
+    def value_type(cls, k, v):
+        # bool is a subclass of int, check it first
+        if isinstance(v, bool):
+            return BOOL
+        elif isinstance(v, int):
+            return INT
+        elif isinstance(v, str):
+            return UUID
+        elif isinstance(v, dict):
+            return INT_DICT
+        raise TypeError(f'Unsupported meta value: {k}={v!r}')
+
+    def current_schema(self):
+        return tuple(
+            (k, self.value_type(k, v), tuple(v.keys()) if isinstance(v, dict) else ())
+            for k, v in self.map.items()
+        )
+
+    def set_schema(self, schema):
+        fmt = '>'
+        for _, vtype, subkeys in schema:
+            fmt += FORMATS[INT] * len(subkeys) if vtype == INT_DICT else FORMATS[vtype]
+        self.schema = schema
+        self.struct = struct.Struct(fmt)
+        self.header_len = SCHEMA_LEN.size + len(self.encode_schema(schema))
+        self.slot_len = SEQ.size + self.struct.size + CRC.size
+
+    @classmethod
+    def encode_schema(cls, schema):
+        b = b''
+        for k, vtype, subkeys in schema:
+            _k = k.encode('utf-8')
+            b += int.to_bytes(len(_k), length=1, byteorder='big') + _k
+            b += int.to_bytes(vtype, length=1, byteorder='big')
+            if vtype == INT_DICT:
+                b += int.to_bytes(len(subkeys), length=1, byteorder='big')
+                for sk in subkeys:
+                    _sk = sk.encode('utf-8')
+                    b += int.to_bytes(len(_sk), length=1, byteorder='big') + _sk
+        return b
+
+    @classmethod
+    def decode_schema(cls, b):
+        schema = []
+        offset = 0
+        while offset < len(b):
+            k_len = b[offset]
+            k = b[offset + 1:offset + 1 + k_len].decode('utf-8')
+            offset += 1 + k_len
+            vtype = b[offset]
+            offset += 1
+            subkeys = []
+            if vtype == INT_DICT:
+                n = b[offset]
+                offset += 1
+                for _ in range(n):
+                    sk_len = b[offset]
+                    subkeys.append(b[offset + 1:offset + 1 + sk_len].decode('utf-8'))
+                    offset += 1 + sk_len
+            schema.append((k, vtype, tuple(subkeys)))
+        return tuple(schema)
+
+    def encode_slot(self):
+        values = []
+        for k, vtype, subkeys in self.schema:
+            v = self.map[k]
+            if vtype == UUID:
+                values.append(uuid.UUID(v).bytes)
+            elif vtype == INT_DICT:
+                values.extend(v[sk] for sk in subkeys)
+            else:
+                values.append(v)
+        b = SEQ.pack(self.seq) + self.struct.pack(*values)
+        return b + CRC.pack(zlib.crc32(b))
+
+    def decode_slot(self, b):
+        """
+        Returns (seq, map) or None if the slot is empty or torn.
+        """
+        if len(b) != self.slot_len:
+            return None
+        payload, crc = b[:-CRC.size], b[-CRC.size:]
+        if CRC.unpack(crc)[0] != zlib.crc32(payload):
+            return None
+        seq = SEQ.unpack_from(payload)[0]
+        values = iter(self.struct.unpack_from(payload, SEQ.size))
+        new_map = {}
+        for k, vtype, subkeys in self.schema:
+            if vtype == UUID:
+                new_map[k] = str(uuid.UUID(bytes=next(values)))
+            elif vtype == INT_DICT:
+                new_map[k] = {sk: next(values) for sk in subkeys}
+            else:
+                new_map[k] = next(values)
+        return seq, new_map
+
+    def flush(self):
+        schema = self.current_schema()
+        self.seq += 1
+        if schema != self.schema:
+            self.rewrite(schema)
+            return
+        offset = self.header_len + (self.seq % N_SLOTS) * self.slot_len
+        os.pwrite(self.fd, self.encode_slot(), offset)
+        if self.sync:
+            os.fdatasync(self.fd)
+
+    def rewrite(self, schema):
+        self.set_schema(schema)
+        _schema = self.encode_schema(schema)
+        slot = self.encode_slot()
+        # the current values go to their slot, the other one is left empty
+        slots = [b'\x00' * self.slot_len] * N_SLOTS
+        slots[self.seq % N_SLOTS] = slot
+        with open(self.tmp_file, 'wb') as tmp_fp:
+            tmp_fp.write(SCHEMA_LEN.pack(len(_schema)) + _schema + b''.join(slots))
+            if self.sync:
+                tmp_fp.flush()
+                os.fsync(tmp_fp.fileno())
+
+        os.rename(self.tmp_file, self.path)
+        if self.sync:
+            sync_directory(os.path.dirname(self.path))
+        os.close(self.fd)
+        self.fd = os.open(self.path, os.O_RDWR)
+
+    def load(self):
+        if os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb') as f:
+            aux = f.read()
+        schema_len = SCHEMA_LEN.unpack_from(aux)[0]
+        self.set_schema(self.decode_schema(aux[SCHEMA_LEN.size:SCHEMA_LEN.size + schema_len]))
+
+        slots = []
+        for i in range(N_SLOTS):
+            offset = self.header_len + i * self.slot_len
+            slot = self.decode_slot(aux[offset:offset + self.slot_len])
+            if slot:
+                slots.append(slot)
+        if slots:
+            self.seq, self.map = max(slots, key=lambda slot: slot[0])
+
+    def close(self):
+        os.close(self.fd)
@@ -0,0 +1,319 @@
+import pika     # type: ignore
+import asyncio
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pika.adapters.asyncio_connection import AsyncioConnection     # type: ignore
+
+from utils.middleware.middleware import HOST, STOP, ACK, NACK, DEFER, ACK_TIMEOUT, BATCH_TIMEOUT, Batcher, unbatched
+from utils.middleware.middleware import delivery_mode
+logging.getLogger('pika').setLevel(logging.ERROR)
+
+
+class AsyncMiddleware:
+    """
+    Same API as Middleware, on an asyncio event loop.
+
+    The loop thread only does I/O: deliveries, acks, publishes and heartbeats.
+    Callbacks and timers run one at a time in a single handler thread, so the
+    listener state needs no locks. publish, produce, ack_deferred and
+    call_later hand their work to the loop and return right away.
+
+    With publish_window > 0 the channel is in confirm mode: at most
+    publish_window publishes are unconfirmed at a time, and a delivery is only
+    answered once everything published before its answer was confirmed.
+
+    With batch_size > 0 the handler thread batches the publishes, flushing
+    them before answering anything but a DEFER: batches only span
+    deliveries within a group commit.
+    """
+
+    def __init__(self, prefetch_count=0, ack_batch=1, publish_window=0, batch_size=0, transient_routes=()):
+        self.loop = asyncio.new_event_loop()
+        self.handler = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+        self.channel = None
+        self.running = False
+        self.closed = False
+
+        self.prefetch_count = prefetch_count
+        self.consumers = []
+        self.bindings = []
+        # publishes issued before the channel is open (e.g. during recovery)
+        self.outbox = []
+
+        # loop thread only
+        self.ack_batch = ack_batch
+        self.deferred = []
+        self.pending = []
+        self.ack_timer = False
+
+        self.publish_window = publish_window
+        self.published = 0
+        self.unconfirmed = set()
+        self.waiting = []
+        # shared with the handler thread
+        self.outstanding = 0
+        self.window = threading.Condition()
+
+        # handler thread only
+        self.batcher = Batcher(self.__send_now, batch_size) if batch_size else None
+        self.batch_timer = False
+
+        self.transient_routes = set(transient_routes)
+
+    def start(self):
+        asyncio.set_event_loop(self.loop)
+        self.connection = AsyncioConnection(
+            pika.ConnectionParameters(host=HOST),
+            on_open_callback=self.__on_connection_open,
+            on_open_error_callback=self.__on_connection_error,
+            on_close_callback=self.__on_connection_closed,
+            custom_ioloop=self.loop
+        )
+        self.running = True
+        try:
+            self.loop.run_forever()
+        finally:
+            # deliveries still queued for the handler are redelivered
+            self.closed = True
+            self.running = False
+            with self.window:
+                self.window.notify_all()
+            self.handler.shutdown(wait=True)
+            self.loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.__close)
+
+    def stop_threadsafe(self):
+        self.stop()
+
+    def __close(self):
+        if self.connection.is_closing or self.connection.is_closed:
+            return
+        self.connection.close()
+
+    def __on_connection_open(self, connection):
+        connection.channel(on_open_callback=self.__on_channel_open)
+
+    def __on_connection_error(self, connection, error):
+        logging.error(f'action: pika_connect | result: fail | error: {str(error)}')
+        self.loop.stop()
+
+    def __on_connection_closed(self, connection, reason):
+        logging.debug(f'action: pika_close | reason: {str(reason)}')
+        self.loop.stop()
+
+    def __on_channel_open(self, channel):
+        self.channel = channel
+        if self.prefetch_count:
+            channel.basic_qos(prefetch_count=self.prefetch_count)
+        if self.publish_window:
+            channel.confirm_delivery(self.__on_confirm)
+
+        for exchange, routing_key, data in self.outbox:
+            self.__publish(exchange, routing_key, data)
+        self.outbox = []
+
+        for topic, tags, queue_name, callback in self.bindings:
+            self.__bind(topic, tags, queue_name, callback)
+        for queue_name, callback in self.consumers:
+            channel.basic_consume(queue=queue_name, on_message_callback=self.__make_callback(callback))
+
+    def __bind(self, topic, tags, queue_name, callback):
+        def __on_declared(frame):
+            _queue_name = frame.method.queue
+            logging.debug(f"action: subscribe | creating_queue | qname: {_queue_name}")
+            for tag in tags:
+                self.channel.queue_bind(exchange=topic, queue=_queue_name, routing_key=tag)
+                logging.debug(f"action: subscribe | binding_queue | qname: {_queue_name} | topic/tag: {topic}/{tag}")
+            self.channel.basic_consume(queue=_queue_name, on_message_callback=self.__make_callback(callback))
+
+        if not queue_name:
+            self.channel.queue_declare(queue='', exclusive=True, callback=__on_declared)
+        else:
+            self.channel.queue_declare(queue=queue_name, passive=True, callback=__on_declared)
+
+    # handler thread
+
+    def __handle(self, callback, *args):
+        if self.closed:
+            return
+        try:
+            return callback(*args)
+        except Exception as e:
+            # unanswered deliveries are redelivered once the connection is closed
+            self.closed = True
+            logging.error(f'action: handle_message | result: fail | error: {str(e)}')
+            logging.error(traceback.format_exc())
+            self.stop()
+
+    def __make_callback(self, callback):
+        callback = unbatched(callback, self.stop)
+
+        def __handle_delivery(body, method):
+            response = self.__handle(callback, body, method.routing_key)
+            if response is not None and response != DEFER:
+                self.flush_batches()
+            if response is not None:
+                self.loop.call_soon_threadsafe(self.__answer, method.delivery_tag, response)
+
+        def __wrapper(ch, method, properties, body):
+            self.handler.submit(__handle_delivery, body, method)
+
+        return __wrapper
+
+    def call_later(self, delay, callback):
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, self.handler.submit, self.__handle, callback)
+
+    def ack_deferred(self):
+        self.flush_batches()
+        self.loop.call_soon_threadsafe(self.__after_confirm, self.__ack_deferred)
+
+    def confirm(self):
+        self.flush_batches()
+        # waits until every publish so far was confirmed by the broker
+        with self.window:
+            self.window.wait_for(lambda: not self.running or self.outstanding == 0)
+
+    def flush_batches(self):
+        if self.batcher:
+            self.batcher.flush()
+
+    def __batch_timeout(self):
+        self.batch_timer = False
+        self.flush_batches()
+
+    def __send_msg(self, data, exchange: str, routing_key: str):
+        if not self.batcher:
+            return self.__send_now(data, exchange, routing_key)
+        self.batcher.add(data, exchange, routing_key)
+        if not self.batcher.empty() and not self.batch_timer:
+            self.batch_timer = True
+            self.call_later(BATCH_TIMEOUT, self.__batch_timeout)
+
+    def __send_now(self, data, exchange: str, routing_key: str):
+        if self.publish_window:
+            with self.window:
+                self.window.wait_for(lambda: not self.running or self.outstanding < self.publish_window)
+                self.outstanding += 1
+        self.loop.call_soon_threadsafe(self.__publish, exchange, routing_key, data)
+
+    def produce(self, data, out_queue_name):
+        return self.__send_msg(data=data, exchange='', routing_key=out_queue_name)
+
+    def publish(self, data, topic, tag):
+        return self.__send_msg(data=data, exchange=topic, routing_key=tag)
+
+    def consume(self, queue_name: str, callback):
+        logging.debug(f"action: consume | qname: {queue_name}")
+        self.consumers.append((queue_name, callback))
+
+    def subscribe(self, topic: str, tags: list, callback, queue_name: str = None):
+        if len(tags) == 0:
+            tags = ['']
+        logging.debug(f"action: subscribe | setting_up | qname: {queue_name}")
+        self.bindings.append((topic, tags, queue_name, callback))
+        return queue_name
+
+    # loop thread
+
+    def __publish(self, exchange, routing_key, data):
+        if self.channel is None:
+            self.outbox.append((exchange, routing_key, data))
+            return
+        self.channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=data,
+            properties=pika.BasicProperties(
+                delivery_mode=delivery_mode(self.transient_routes, exchange, routing_key)
+            )
+        )
+        if self.publish_window:
+            self.published += 1
+            self.unconfirmed.add(self.published)
+
+    def __on_confirm(self, frame):
+        if isinstance(frame.method, pika.spec.Basic.Nack):
+            # the broker lost a publish: drop the connection, so the
+            # deliveries that produced it are redelivered
+            logging.error(f'action: publish | result: fail | delivery_tag: {frame.method.delivery_tag}')
+            self.closed = True
+            self.__close()
+            return
+
+        tag = frame.method.delivery_tag
+        if frame.method.multiple:
+            confirmed = {seq for seq in self.unconfirmed if seq <= tag}
+        else:
+            confirmed = {tag} & self.unconfirmed
+        self.unconfirmed -= confirmed
+        with self.window:
+            self.outstanding -= len(confirmed)
+            self.window.notify_all()
+
+        # answers wait for the publishes issued before them
+        upto = min(self.unconfirmed) - 1 if self.unconfirmed else self.published
+        while self.waiting and self.waiting[0][0] <= upto:
+            _, action = self.waiting.pop(0)
+            action()
+
+    def __after_confirm(self, action):
+        if self.publish_window and (self.unconfirmed or self.waiting):
+            self.waiting.append((self.published, action))
+            return
+        action()
+
+    def __answer(self, delivery_tag, response):
+        # every answer goes in order, a DEFER must not overtake an earlier
+        # ack_deferred still waiting for its confirms
+        self.__after_confirm(lambda: self.__apply(delivery_tag, response))
+
+    def __apply(self, delivery_tag, response):
+        if response == STOP:
+            self.__stop(delivery_tag)
+        elif response == ACK:
+            self.__ack(delivery_tag)
+        elif response == NACK:
+            self.channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+        elif response == DEFER:
+            self.deferred.append(delivery_tag)
+        else:
+            logging.error(f"action: callback | unexpected value: {response}")
+            self.closed = True
+            self.__close()
+
+    def __stop(self, delivery_tag):
+        self.channel.basic_ack(delivery_tag=delivery_tag)
+        self.__flush_acks()
+        self.__close()
+
+    def __ack_deferred(self):
+        self.pending.extend(self.deferred)
+        self.deferred = []
+        self.__flush_acks()
+
+    def __flush_acks(self):
+        # a deferred delivery is not committed yet, multiple=True would ack it
+        if not self.pending or self.deferred:
+            return
+        self.channel.basic_ack(delivery_tag=max(self.pending), multiple=True)
+        self.pending = []
+
+    def __ack(self, delivery_tag):
+        if self.ack_batch <= 1:
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+            return
+        self.pending.append(delivery_tag)
+        if len(self.pending) >= self.ack_batch:
+            self.__flush_acks()
+        elif not self.ack_timer:
+            self.ack_timer = True
+            self.loop.call_later(ACK_TIMEOUT, self.__ack_timeout)
+
+    def __ack_timeout(self):
+        self.ack_timer = False
+        self.__flush_acks()
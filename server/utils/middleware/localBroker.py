@@ -0,0 +1,402 @@
+"""
+Local stand-in for RabbitMQ, to run the whole pipeline in one machine.
+
+Usage:
+    python3 localBroker.py [definitions.json] [port] [directory]
+
+Queues, exchanges and bindings come from the same definitions file RabbitMQ
+loads (rabbitmq/definitions.json). Durable queues log persistent messages on
+disk, so they survive a broker restart until acked. Deliveries go round robin
+to the consumers of a queue, bounded by their prefetch; unacked deliveries of
+a connection that goes away are redelivered. Components connect to it through
+LocalMiddleware (MIDDLEWARE = local), at BROKER_HOST:BROKER_PORT (rabbitmq:5673
+by default, the service set_up_docker_compose.py creates with LOCAL_BROKER).
+"""
+from collections import deque
+import threading
+import logging
+import socket
+import struct
+import queue
+import json
+import sys
+import os
+
+PORT = 5673
+DIRECTORY = 'broker'
+DEFINITIONS = 'rabbitmq/definitions.json'
+
+# unacked deliveries per consumer when it does not set a prefetch
+MAX_IN_FLIGHT = 1024
+# a queue log is rewritten once it holds this many acked messages
+COMPACT_ACKED = 100000
+
+# frames: [type][len][payload]
+HEADER = struct.Struct('>cI')
+STR_LEN = struct.Struct('>H')
+TAG = struct.Struct('>Q')
+FLAG = struct.Struct('>?')
+PREFETCH = struct.Struct('>I')
+
+# client -> broker
+CONSUME = b'\x01'
+PUBLISH = b'\x02'
+ACK = b'\x03'
+NACK = b'\x04'
+SYNC = b'\x05'
+DECLARE = b'\x06'
+BIND = b'\x07'
+# broker -> client
+DELIVER = b'\x0a'
+SYNC_OK = b'\x0b'
+DECLARE_OK = b'\x0c'
+
+# queue log records
+LOG_PUB = b'P'
+LOG_ACK = b'A'
+BODY_LEN = struct.Struct('>I')
+
+
+def encode_str(s):
+    b = s.encode('utf-8')
+    return STR_LEN.pack(len(b)) + b
+
+
+def decode_str(payload, offset):
+    n = STR_LEN.unpack_from(payload, offset)[0]
+    offset += STR_LEN.size
+    return bytes(payload[offset:offset + n]).decode('utf-8'), offset + n
+
+
+def frame(frame_type, payload):
+    return HEADER.pack(frame_type, len(payload)) + payload
+
+
+def read_exactly(reader, n):
+    b = reader.read(n)
+    if len(b) != n:
+        raise ConnectionError('connection closed')
+    return b
+
+
+def read_frame(reader):
+    frame_type, n = HEADER.unpack(read_exactly(reader, HEADER.size))
+    return frame_type, read_exactly(reader, n)
+
+
+class QueueLog():
+    """
+    Durable queue on disk: [P][msg_id][routing key][len][body] for every
+    published message and [A][msg_id] for every ack.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_file = path + '_tmp'
+        self.n_acked = 0
+        self.fp = None
+
+    def load(self):
+        messages = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as fp:
+                aux = fp.read()
+            offset = 0
+            try:
+                while offset < len(aux):
+                    op = aux[offset:offset + 1]
+                    msg_id = TAG.unpack_from(aux, offset + 1)[0]
+                    offset += 1 + TAG.size
+                    if op == LOG_ACK:
+                        messages.pop(msg_id, None)
+                        continue
+                    routing_key, offset = decode_str(aux, offset)
+                    n = BODY_LEN.unpack_from(aux, offset)[0]
+                    offset += BODY_LEN.size
+                    if offset + n > len(aux):
+                        break
+                    messages[msg_id] = (routing_key, aux[offset:offset + n])
+                    offset += n
+            except struct.error:
+                # torn record at the tail
+                pass
+        self.compact(messages)
+        return messages
+
+    def compact(self, messages):
+        if self.fp:
+            self.fp.close()
+        with open(self.tmp_file, 'wb') as tmp:
+            tmp.write(b''.join([self.encode_pub(msg_id, rk, body) for msg_id, (rk, body) in messages.items()]))
+        os.rename(self.tmp_file, self.path)
+        self.fp = open(self.path, 'ab')
+        self.n_acked = 0
+
+    @classmethod
+    def encode_pub(cls, msg_id, routing_key, body):
+        return LOG_PUB + TAG.pack(msg_id) + encode_str(routing_key) + BODY_LEN.pack(len(body)) + body
+
+    def publish(self, msg_id, routing_key, body):
+        self.fp.write(self.encode_pub(msg_id, routing_key, body))
+        self.fp.flush()
+
+    def ack(self, msg_id):
+        self.fp.write(LOG_ACK + TAG.pack(msg_id))
+        self.fp.flush()
+        self.n_acked += 1
+
+
+class Queue():
+    def __init__(self, name, durable, directory, owner=None):
+        self.name = name
+        self.ready = deque()
+        self.consumers = []
+        self.next_consumer = 0
+        self.next_id = 0
+        # unacked and ready messages, for compaction
+        self.live = {}
+        self.owner = owner
+        self.log = QueueLog(f'{directory}/{name}.log') if durable else None
+        if self.log:
+            self.live = self.log.load()
+            for msg_id, (routing_key, body) in self.live.items():
+                self.ready.append((msg_id, routing_key, body, True))
+            self.next_id = max(self.live, default=-1) + 1
+
+    def put(self, routing_key, body, persistent=True):
+        msg_id = self.next_id
+        self.next_id += 1
+        if self.log and persistent:
+            self.log.publish(msg_id, routing_key, body)
+            self.live[msg_id] = (routing_key, body)
+        self.ready.append((msg_id, routing_key, body, False))
+
+    def ack(self, msg_id):
+        if msg_id not in self.live:
+            # transient, never logged
+            return
+        self.log.ack(msg_id)
+        self.live.pop(msg_id, None)
+        if self.log.n_acked >= COMPACT_ACKED:
+            self.log.compact(self.live)
+
+
+class Connection():
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.outbox = queue.Queue()
+        self.next_tag = 1
+        # delivery tag -> (queue, message)
+        self.unacked = {}
+        # queue name -> prefetch
+        self.consuming = {}
+        self.in_flight = {}
+
+    def send(self, frame_type, payload):
+        self.outbox.put(frame(frame_type, payload))
+
+    def writer(self):
+        while True:
+            b = self.outbox.get()
+            if b is None:
+                return
+            try:
+                self.sock.sendall(b)
+            except OSError:
+                return
+
+    def has_capacity(self, queue_name):
+        return self.in_flight[queue_name] < (self.consuming[queue_name] or MAX_IN_FLIGHT)
+
+    def deliver(self, q, message):
+        msg_id, routing_key, body, redelivered = message
+        tag = self.next_tag
+        self.next_tag += 1
+        self.unacked[tag] = (q, message)
+        self.in_flight[q.name] += 1
+        self.send(DELIVER, TAG.pack(tag) + FLAG.pack(redelivered) + encode_str(q.name)
+                  + encode_str(routing_key) + body)
+
+    def settle(self, tag):
+        q, message = self.unacked.pop(tag)
+        self.in_flight[q.name] -= 1
+        return q, message
+
+
+class LocalBroker():
+    def __init__(self, definitions_path=DEFINITIONS, port=PORT, directory=DIRECTORY):
+        self.lock = threading.Lock()
+        self.directory = directory
+        self.port = port
+        self.queues = {}
+        # exchange -> (type, [(queue, routing key)])
+        self.exchanges = {}
+        self.n_anonymous = 0
+        self.running = True
+
+        os.makedirs(directory, exist_ok=True)
+        with open(definitions_path) as fp:
+            definitions = json.load(fp)
+        for q in definitions.get('queues', []):
+            self.queues[q['name']] = Queue(q['name'], q.get('durable', True), directory)
+        for e in definitions.get('exchanges', []):
+            self.exchanges[e['name']] = (e.get('type', 'direct'), [])
+        for b in definitions.get('bindings', []):
+            self.exchanges[b['source']][1].append((b['destination'], b['routing_key']))
+
+    @classmethod
+    def matches(cls, exchange_type, binding_key, routing_key):
+        if exchange_type == 'fanout':
+            return True
+        if exchange_type == 'direct':
+            return binding_key == routing_key
+        # topic: '*' is one word, '#' zero or more
+        return cls.topic_matches(binding_key.split('.'), routing_key.split('.'))
+
+    @classmethod
+    def topic_matches(cls, pattern, words):
+        if not pattern:
+            return not words
+        if pattern[0] == '#':
+            return any(cls.topic_matches(pattern[1:], words[i:]) for i in range(len(words) + 1))
+        if not words:
+            return False
+        return (pattern[0] == '*' or pattern[0] == words[0]) and cls.topic_matches(pattern[1:], words[1:])
+
+    def route(self, exchange, routing_key):
+        if exchange == '':
+            return [routing_key] if routing_key in self.queues else []
+        if exchange not in self.exchanges:
+            return []
+        exchange_type, bindings = self.exchanges[exchange]
+        return [q for q, key in bindings if self.matches(exchange_type, key, routing_key)]
+
+    def dispatch(self, q):
+        while q.ready and q.consumers:
+            for _ in range(len(q.consumers)):
+                c = q.consumers[q.next_consumer % len(q.consumers)]
+                q.next_consumer += 1
+                if c.has_capacity(q.name):
+                    c.deliver(q, q.ready.popleft())
+                    break
+            else:
+                return
+
+    def handle(self, c, frame_type, payload):
+        if frame_type == PUBLISH:
+            exchange, offset = decode_str(payload, 0)
+            routing_key, offset = decode_str(payload, offset)
+            persistent = FLAG.unpack_from(payload, offset)[0]
+            body = bytes(payload[offset + FLAG.size:])
+            for queue_name in self.route(exchange, routing_key):
+                q = self.queues[queue_name]
+                q.put(routing_key, body, persistent)
+                self.dispatch(q)
+        elif frame_type == ACK:
+            tag = TAG.unpack_from(payload)[0]
+            multiple = FLAG.unpack_from(payload, TAG.size)[0]
+            tags = [t for t in c.unacked if t <= tag] if multiple else [tag]
+            touched = set()
+            for t in tags:
+                q, message = c.settle(t)
+                q.ack(message[0])
+                touched.add(q.name)
+            for queue_name in touched:
+                self.dispatch(self.queues[queue_name])
+        elif frame_type == NACK:
+            tag = TAG.unpack_from(payload)[0]
+            requeue = FLAG.unpack_from(payload, TAG.size)[0]
+            q, message = c.settle(tag)
+            msg_id, routing_key, body, _ = message
+            if requeue:
+                # to the tail, so a NACKed message does not starve the rest
+                q.ready.append((msg_id, routing_key, body, True))
+            else:
+                q.ack(msg_id)
+            self.dispatch(q)
+        elif frame_type == CONSUME:
+            queue_name, offset = decode_str(payload, 0)
+            c.consuming[queue_name] = PREFETCH.unpack_from(payload, offset)[0]
+            c.in_flight[queue_name] = 0
+            self.queues[queue_name].consumers.append(c)
+            self.dispatch(self.queues[queue_name])
+        elif frame_type == SYNC:
+            # frames are handled in order, every publish before it is stored
+            c.send(SYNC_OK, payload)
+        elif frame_type == DECLARE:
+            queue_name, _ = decode_str(payload, 0)
+            if not queue_name:
+                self.n_anonymous += 1
+                queue_name = f'local.gen-{self.n_anonymous}'
+                self.queues[queue_name] = Queue(queue_name, False, self.directory, owner=c)
+            elif queue_name not in self.queues:
+                self.queues[queue_name] = Queue(queue_name, True, self.directory)
+            c.send(DECLARE_OK, encode_str(queue_name))
+        elif frame_type == BIND:
+            exchange, offset = decode_str(payload, 0)
+            queue_name, offset = decode_str(payload, offset)
+            routing_key, _ = decode_str(payload, offset)
+            self.exchanges.setdefault(exchange, ('direct', []))[1].append((queue_name, routing_key))
+
+    def disconnect(self, c):
+        requeued = set()
+        # back to the head, in their original order
+        for tag in sorted(c.unacked, reverse=True):
+            q, message = c.settle(tag)
+            msg_id, routing_key, body, _ = message
+            q.ready.appendleft((msg_id, routing_key, body, True))
+            requeued.add(q.name)
+        for q in list(self.queues.values()):
+            if c in q.consumers:
+                q.consumers.remove(c)
+            if q.owner is c:
+                del self.queues[q.name]
+                for _, bindings in self.exchanges.values():
+                    bindings[:] = [(queue_name, key) for queue_name, key in bindings if queue_name != q.name]
+        for queue_name in requeued:
+            if queue_name in self.queues:
+                self.dispatch(self.queues[queue_name])
+
+    def serve(self, sock):
+        c = Connection(self, sock)
+        writer = threading.Thread(target=c.writer, daemon=True)
+        writer.start()
+        reader = sock.makefile('rb')
+        try:
+            while True:
+                frame_type, payload = read_frame(reader)
+                with self.lock:
+                    self.handle(c, frame_type, payload)
+        except (ConnectionError, OSError) as e:
+            logging.debug(f'action: broker_disconnect | error: {str(e) or repr(e)}')
+        except Exception as e:
+            logging.error(f'action: broker_frame | result: fail | error: {str(e) or repr(e)}')
+        finally:
+            with self.lock:
+                self.disconnect(c)
+            c.outbox.put(None)
+            sock.close()
+
+    def run(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('', self.port))
+        server.listen()
+        logging.info(f'action: broker_start | port: {self.port} | queues: {len(self.queues)}')
+        while self.running:
+            sock, addr = server.accept()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self.serve, args=(sock,), daemon=True).start()
+
+
+def main():
+    logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.INFO)
+    definitions_path = sys.argv[1] if len(sys.argv) > 1 else DEFINITIONS
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else PORT
+    directory = sys.argv[3] if len(sys.argv) > 3 else DIRECTORY
+    LocalBroker(definitions_path, port, directory).run()
+
+
+if __name__ == '__main__':
+    main()
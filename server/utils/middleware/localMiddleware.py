@@ -0,0 +1,251 @@
+from collections import deque
+import traceback
+import logging
+import socket
+import select
+import heapq
+import time
+import os
+
+from utils.middleware.middleware import HOST, STOP, ACK, NACK, DEFER, ACK_TIMEOUT, BATCH_TIMEOUT, Batcher, unbatched
+from utils.middleware.localBroker import PORT, HEADER, TAG, FLAG, PREFETCH, frame, encode_str, decode_str
+from utils.middleware.localBroker import CONSUME, PUBLISH, SYNC, DECLARE, BIND, DELIVER, SYNC_OK, DECLARE_OK
+from utils.middleware.localBroker import ACK as ACK_FRAME, NACK as NACK_FRAME
+
+RECV_SIZE = 1 << 16
+
+
+def broker_address():
+    # BROKER_HOST/BROKER_PORT: e.g. localhost, for a component run outside compose
+    return os.getenv('BROKER_HOST', HOST), int(os.getenv('BROKER_PORT', PORT))
+
+
+class LocalMiddleware:
+    """
+    Same API as Middleware, against the local broker (localBroker.py).
+
+    A single thread reads deliveries, runs the callbacks and fires the
+    call_later timers. The broker handles the frames of a connection in
+    order, so a publish is stored before any ack sent after it; `confirm`
+    waits for the broker to catch up with every frame sent so far.
+    """
+
+    def __init__(self, prefetch_count=0, ack_batch=1, publish_window=0, batch_size=0, transient_routes=()):
+        self.sock = socket.create_connection(broker_address())
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+        # deliveries read while waiting for a reply
+        self.inbox = deque()
+        self.replies = deque()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.running = False
+
+        self.prefetch_count = prefetch_count
+        self.callbacks = {}
+        self.timers = []
+        self.n_timers = 0
+
+        self.ack_batch = ack_batch
+        self.deferred = []
+        self.pending = []
+        self.ack_timer = False
+
+        self.publish_window = publish_window
+        self.unconfirmed = 0
+        self.n_syncs = 0
+
+        self.batcher = Batcher(self.__publish, batch_size) if batch_size else None
+        self.batch_timer = False
+        self.transient_routes = set(transient_routes)
+
+    def start(self):
+        self.running = True
+        try:
+            while self.running:
+                while self.inbox and self.running:
+                    self.__deliver(self.inbox.popleft())
+                self.__fire_timers()
+                if not self.running or self.inbox:
+                    continue
+                timeout = max(0, self.timers[0][0] - time.monotonic()) if self.timers else None
+                readable, _, _ = select.select([self.sock, self.wakeup_r], [], [], timeout)
+                if self.wakeup_r in readable:
+                    self.wakeup_r.recv(RECV_SIZE)
+                if self.sock in readable:
+                    self.__read()
+        except Exception as e:
+            logging.error(f'action: local_consume | result: fail | error: {str(e)}')
+            logging.error(traceback.format_exc())
+        finally:
+            self.sock.close()
+            self.wakeup_r.close()
+            self.wakeup_w.close()
+
+    def stop(self):
+        self.running = False
+
+    def stop_threadsafe(self):
+        self.running = False
+        self.wakeup_w.send(b'\x00')
+
+    def is_open(self):
+        return self.sock.fileno() != -1
+
+    def close(self):
+        self.sock.close()
+        self.wakeup_r.close()
+        self.wakeup_w.close()
+
+    def __read(self):
+        data = self.sock.recv(RECV_SIZE)
+        if not data:
+            raise ConnectionError('broker closed the connection')
+        self.buffer += data
+        while len(self.buffer) >= HEADER.size:
+            frame_type, n = HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < HEADER.size + n:
+                break
+            payload = bytes(self.buffer[HEADER.size:HEADER.size + n])
+            del self.buffer[:HEADER.size + n]
+            if frame_type == DELIVER:
+                self.inbox.append(payload)
+            else:
+                self.replies.append((frame_type, payload))
+
+    def __wait_reply(self, frame_type):
+        while not self.replies:
+            self.__read()
+        _frame_type, payload = self.replies.popleft()
+        if _frame_type != frame_type:
+            raise RuntimeError(f'Unexpected reply: {_frame_type}, expected: {frame_type}')
+        return payload
+
+    def __send(self, frame_type, payload):
+        self.sock.sendall(frame(frame_type, payload))
+
+    def __fire_timers(self):
+        now = time.monotonic()
+        while self.timers and self.timers[0][0] <= now and self.running:
+            _, _, callback = heapq.heappop(self.timers)
+            callback()
+
+    def call_later(self, delay, callback):
+        # only fired while consuming, from the same thread as the callbacks
+        self.n_timers += 1
+        heapq.heappush(self.timers, (time.monotonic() + delay, self.n_timers, callback))
+
+    def __sync(self):
+        self.n_syncs += 1
+        self.__send(SYNC, TAG.pack(self.n_syncs))
+        self.__wait_reply(SYNC_OK)
+
+    def confirm(self):
+        self.flush_batches()
+        if not self.unconfirmed:
+            return
+        self.__sync()
+        self.unconfirmed = 0
+
+    def ack_deferred(self):
+        # the callbacks run one at a time: every delivery older than the
+        # last deferred one was already answered, or is deferred too
+        self.pending.extend(self.deferred)
+        self.deferred = []
+        self.flush_acks()
+
+    def flush_acks(self):
+        # a deferred delivery is not committed yet, multiple=True would ack it
+        if not self.pending or self.deferred:
+            return
+        self.flush_batches()
+        self.__send(ACK_FRAME, TAG.pack(max(self.pending)) + FLAG.pack(True))
+        self.pending = []
+
+    def __ack(self, delivery_tag):
+        if self.ack_batch <= 1:
+            self.flush_batches()
+            self.__send(ACK_FRAME, TAG.pack(delivery_tag) + FLAG.pack(False))
+            return
+        self.pending.append(delivery_tag)
+        if len(self.pending) >= self.ack_batch:
+            self.flush_acks()
+        elif not self.ack_timer:
+            self.ack_timer = True
+            self.call_later(ACK_TIMEOUT, self.__ack_timeout)
+
+    def __ack_timeout(self):
+        self.ack_timer = False
+        # if a group commit is pending, its ack_deferred sends them
+        self.flush_acks()
+
+    def flush_batches(self):
+        if self.batcher:
+            self.batcher.flush()
+
+    def __batch_timeout(self):
+        self.batch_timer = False
+        self.flush_batches()
+
+    def __deliver(self, payload):
+        delivery_tag = TAG.unpack_from(payload)[0]
+        offset = TAG.size + FLAG.size
+        queue_name, offset = decode_str(payload, offset)
+        routing_key, offset = decode_str(payload, offset)
+        response = self.callbacks[queue_name](payload[offset:], routing_key)
+        if response == STOP:
+            self.flush_batches()
+            self.__send(ACK_FRAME, TAG.pack(delivery_tag) + FLAG.pack(False))
+            self.flush_acks()
+            self.stop()
+        elif response == ACK:
+            self.__ack(delivery_tag)
+        elif response == NACK:
+            self.__send(NACK_FRAME, TAG.pack(delivery_tag) + FLAG.pack(True))
+        elif response == DEFER:
+            self.deferred.append(delivery_tag)
+        else:
+            logging.error(f"action: callback | unexpected value: {response}")
+            raise RuntimeError(f"Unexpected value: {response}")
+
+    def consume(self, queue_name: str, callback):
+        logging.debug(f"action: consume | qname: {queue_name}")
+        self.callbacks[queue_name] = unbatched(callback, self.stop)
+        self.__send(CONSUME, encode_str(queue_name) + PREFETCH.pack(self.prefetch_count))
+
+    def subscribe(self, topic: str, tags: list, callback, queue_name: str = None):
+        if len(tags) == 0:
+            tags = ['']
+
+        logging.debug(f"action: subscribe | setting_up | qname: {queue_name}")
+        self.__send(DECLARE, encode_str(queue_name or ''))
+        queue_name, _ = decode_str(self.__wait_reply(DECLARE_OK), 0)
+
+        for tag in tags:
+            self.__send(BIND, encode_str(topic) + encode_str(queue_name) + encode_str(tag))
+            logging.debug(f"action: subscribe | binding_queue | qname: {queue_name} | topic/tag: {topic}/{tag}")
+        # bound before returning, as queue_bind does
+        self.__sync()
+
+        self.consume(queue_name, callback)
+        return queue_name
+
+    def __send_msg(self, data, exchange: str, routing_key: str):
+        if not self.batcher:
+            return self.__publish(data, exchange, routing_key)
+        self.batcher.add(data, exchange, routing_key)
+        if not self.batcher.empty() and not self.batch_timer:
+            self.batch_timer = True
+            self.call_later(BATCH_TIMEOUT, self.__batch_timeout)
+
+    def __publish(self, data, exchange: str, routing_key: str):
+        persistent = (exchange or routing_key) not in self.transient_routes
+        self.__send(PUBLISH, encode_str(exchange) + encode_str(routing_key) + FLAG.pack(persistent) + data)
+        self.unconfirmed += 1
+        if self.publish_window and self.unconfirmed >= self.publish_window:
+            self.confirm()
+
+    def produce(self, data, out_queue_name):
+        return self.__send_msg(data=data, exchange='', routing_key=out_queue_name)
+
+    def publish(self, data, topic, tag):
+        return self.__send_msg(data=data, exchange=topic, routing_key=tag)
@@ -1,24 +1,138 @@
 import pika     # type: ignore
 import logging
 import traceback
+from utils.model.message import pack_batch, unpack_batch, is_batch
 logging.getLogger('pika').setLevel(logging.ERROR)
 
 HOST = 'rabbitmq'
 STOP = 0
 ACK = 1
 NACK = 2
+# acked later, through ack_deferred
+DEFER = 3
+
+# seconds an ACK may wait for its batch to fill
+ACK_TIMEOUT = 0.1
+# seconds a message may wait for its batch to fill
+BATCH_TIMEOUT = 0.1
+
+
+def delivery_mode(transient_routes, exchange, routing_key):
+    # a route is the exchange, or the queue when publishing to the default one
+    if (exchange or routing_key) in transient_routes:
+        return pika.spec.TRANSIENT_DELIVERY_MODE
+    return pika.spec.PERSISTENT_DELIVERY_MODE
+
+
+# backends
+BLOCKING = 'blocking'
+ASYNC = 'async'
+LOCAL = 'local'
+BACKENDS = [BLOCKING, ASYNC, LOCAL]
 
 
 class ChannelAlreadyConsuming(Exception):
     pass
 
 
+class Batcher:
+    """
+    Packs the messages sent to the same exchange and routing key into a
+    single BATCH message, sent once it holds batch_size bytes or on flush.
+    The middleware flushes it before acking anything, so an acked delivery
+    never leaves its output behind in memory.
+    """
+
+    def __init__(self, send, batch_size):
+        self.send = send
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.sizes = {}
+
+    def empty(self):
+        return not self.buffers
+
+    def add(self, data, exchange, routing_key):
+        route = (exchange, routing_key)
+        self.buffers.setdefault(route, []).append(data)
+        self.sizes[route] = self.sizes.get(route, 0) + len(data)
+        if self.sizes[route] >= self.batch_size:
+            self.__flush(route)
+
+    def flush(self):
+        for route in list(self.buffers):
+            self.__flush(route)
+
+    def __flush(self, route):
+        raw_msgs = self.buffers.pop(route)
+        del self.sizes[route]
+        data = raw_msgs[0] if len(raw_msgs) == 1 else pack_batch(raw_msgs)
+        self.send(data, *route)
+
+
+def unbatched(callback, stop):
+    """
+    Callback wrapper: the messages of a BATCH go to callback one by one and
+    the batch is answered as a whole. On NACK the batch is redelivered, the
+    messages already handled are dropped as duplicates.
+    """
+    def __wrapper(body, routing_key):
+        if not is_batch(body):
+            return callback(body, routing_key)
+        raw_msgs = unpack_batch(body)
+        answer = ACK
+        for i, raw_msg in enumerate(raw_msgs):
+            response = callback(raw_msg, routing_key)
+            if response == STOP and i < len(raw_msgs) - 1:
+                # the rest of the batch is redelivered
+                stop()
+                return NACK
+            if response != ACK and response != DEFER:
+                return response
+            if response == DEFER:
+                # acked with the next ack_deferred, even if a later message
+                # of the batch committed it already
+                answer = DEFER
+        return answer
+
+    return __wrapper
+
+
 class Middleware:
-    def __init__(self):
+    def __init__(self, prefetch_count=0, ack_batch=1, publish_window=0, batch_size=0, transient_routes=()):
         self.connection = pika.BlockingConnection(
                                pika.ConnectionParameters(host=HOST))
         self.channel = self.connection.channel()
         self.active_channel = False
+        self.deferred = []
+
+        # prefetch_count: unacked deliveries per consumer (0: no limit).
+        # ack_batch: ACKs are sent as a single basic_ack(multiple=True)
+        # every ack_batch messages, or after ACK_TIMEOUT if fewer arrive
+        if prefetch_count:
+            self.channel.basic_qos(prefetch_count=prefetch_count)
+        self.ack_batch = ack_batch
+        self.pending = []
+        self.ack_timer = False
+
+        # publish_window: publishes (and acks) go in a transaction, committed
+        # every publish_window publishes and before any delivery is acked.
+        # tx_commit returns once the broker took them all, a single round
+        # trip for the whole window (0: fire and forget)
+        self.publish_window = publish_window
+        self.unconfirmed = 0
+        if publish_window:
+            self.channel.tx_select()
+
+        # batch_size: messages to the same route are sent in BATCH messages
+        # of up to batch_size bytes, or after BATCH_TIMEOUT (0: one by one)
+        self.batcher = Batcher(self.__publish, batch_size) if batch_size else None
+        self.batch_timer = False
+
+        # transient_routes: exchanges and queues whose messages are not
+        # written to the broker disk. They are lost if the broker restarts,
+        # only for hops where that is acceptable
+        self.transient_routes = set(transient_routes)
 
     def start(self):
         try:
@@ -33,18 +147,96 @@ class Middleware:
     def stop(self):
         self.channel.stop_consuming()
 
+    def stop_threadsafe(self):
+        self.connection.add_callback_threadsafe(self.stop)
+
+    def is_open(self):
+        # a publisher only reads from the socket here: heartbeats, or the
+        # broker closing an idle connection
+        if self.connection.is_open:
+            try:
+                self.connection.process_data_events(time_limit=0)
+            except pika.exceptions.AMQPError as e:
+                logging.debug(f'action: pika_poll | result: fail | error: {str(e) or repr(e)}')
+        return self.connection.is_open and self.channel.is_open
+
+    def close(self):
+        if self.connection.is_open:
+            self.connection.close()
+
+    def confirm(self):
+        self.flush_batches()
+        if not self.publish_window:
+            return
+        self.channel.tx_commit()
+        self.unconfirmed = 0
+
+    def ack_deferred(self):
+        # the callbacks run one at a time: every delivery older than the
+        # last deferred one was already answered, or is deferred too
+        self.pending.extend(self.deferred)
+        self.deferred = []
+        self.flush_acks()
+
+    def flush_acks(self):
+        # a deferred delivery is not committed yet, multiple=True would ack it
+        if not self.pending or self.deferred:
+            return
+        self.flush_batches()
+        self.channel.basic_ack(delivery_tag=max(self.pending), multiple=True)
+        self.pending = []
+        self.confirm()
+
+    def __ack(self, delivery_tag):
+        if self.ack_batch <= 1:
+            self.flush_batches()
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+            self.confirm()
+            return
+        self.pending.append(delivery_tag)
+        if len(self.pending) >= self.ack_batch:
+            self.flush_acks()
+        elif not self.ack_timer:
+            self.ack_timer = True
+            self.call_later(ACK_TIMEOUT, self.__ack_timeout)
+
+    def __ack_timeout(self):
+        self.ack_timer = False
+        # if a group commit is pending, its ack_deferred sends them
+        self.flush_acks()
+
+    def flush_batches(self):
+        if self.batcher:
+            self.batcher.flush()
+
+    def __batch_timeout(self):
+        self.batch_timer = False
+        self.flush_batches()
+
+    def call_later(self, delay, callback):
+        # only fired while consuming, from the same thread as the callbacks
+        self.connection.call_later(delay, callback)
+
     def __make_callback(self, callback):
+        callback = unbatched(callback, self.stop)
+
         def __wrapper(ch, method, properties, body):
             response = callback(body, method.routing_key)
             if response == STOP:
+                self.flush_batches()
                 ch.basic_ack(delivery_tag=method.delivery_tag)
+                self.flush_acks()
+                self.confirm()
                 self.stop()
                 return
             elif response == ACK:
-                ch.basic_ack(delivery_tag=method.delivery_tag)
+                self.__ack(method.delivery_tag)
                 return
             elif response == NACK:
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                self.confirm()
+            elif response == DEFER:
+                self.deferred.append(method.delivery_tag)
             else:
                 logging.error(f"action: callback | unexpected value: {response}")
                 raise RuntimeError(f"Unexpected value: {response}")
@@ -76,17 +268,47 @@ class Middleware:
         return queue_name
 
     def __send_msg(self, data, exchange: str, routing_key: str):
+        if not self.batcher:
+            return self.__publish(data, exchange, routing_key)
+        self.batcher.add(data, exchange, routing_key)
+        if not self.batcher.empty() and not self.batch_timer:
+            self.batch_timer = True
+            self.call_later(BATCH_TIMEOUT, self.__batch_timeout)
+
+    def __publish(self, data, exchange: str, routing_key: str):
         self.channel.basic_publish(
             exchange=exchange,
             routing_key=routing_key,
             body=data,
             properties=pika.BasicProperties(
-                delivery_mode=pika.spec.PERSISTENT_DELIVERY_MODE
+                delivery_mode=delivery_mode(self.transient_routes, exchange, routing_key)
             )
         )
+        if self.publish_window:
+            self.unconfirmed += 1
+            if self.unconfirmed >= self.publish_window:
+                self.confirm()
 
     def produce(self, data, out_queue_name):
         return self.__send_msg(data=data, exchange='', routing_key=out_queue_name)
 
     def publish(self, data, topic, tag):
         return self.__send_msg(data=data, exchange=topic, routing_key=tag)
+
+
+def new_middleware(backend=BLOCKING, parallel=False, **kwargs):
+    if parallel:
+        # imported here, it depends on this module
+        from utils.middleware.parallelMiddleware import ParallelMiddleware
+        return ParallelMiddleware(lambda: new_middleware(backend, **kwargs))
+    if backend == BLOCKING:
+        return Middleware(**kwargs)
+    if backend == ASYNC:
+        # imported here, it depends on this module
+        from utils.middleware.asyncMiddleware import AsyncMiddleware
+        return AsyncMiddleware(**kwargs)
+    if backend == LOCAL:
+        # local broker for load tests, see localBroker.py
+        from utils.middleware.localMiddleware import LocalMiddleware
+        return LocalMiddleware(**kwargs)
+    raise ValueError(f'Unknown middleware backend: {backend}, expected one of {BACKENDS}')
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+import threading
+import logging
+import queue
+
+
+class MiddlewarePool:
+    """
+    Publishing middlewares shared by many threads, at most `size` of them.
+
+    A middleware (connection and channel) is not thread safe: `checkout`
+    lends one to a single thread at a time, creating it on first need and
+    waiting for a free one once `size` exist. A middleware that raised or
+    whose connection was closed by the broker is replaced.
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        # idle middlewares, None for a slot whose middleware was discarded
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self):
+        middleware = self.__get()
+        try:
+            yield middleware
+        except Exception:
+            self.__discard(middleware)
+            raise
+        self.idle.put(middleware)
+
+    def __get(self):
+        while True:
+            middleware = self.__get_slot()
+            if middleware is None:
+                return self.__create()
+            if middleware.is_open():
+                return middleware
+            logging.info('action: pool_checkout | result: replacing | reason: connection closed')
+            self.__discard(middleware)
+
+    def __get_slot(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                return None
+        return self.idle.get()
+
+    def __create(self):
+        try:
+            return self.factory()
+        except Exception:
+            self.idle.put(None)
+            raise
+
+    def __discard(self, middleware):
+        self.idle.put(None)
+        try:
+            middleware.close()
+        except Exception as e:
+            logging.debug(f'action: pool_discard | result: skip | error: {str(e) or repr(e)}')
+
+    def close(self):
+        while True:
+            try:
+                middleware = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            if middleware is not None:
+                middleware.close()
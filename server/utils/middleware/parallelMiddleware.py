@@ -0,0 +1,83 @@
+import logging
+import threading
+
+
+class ParallelMiddleware:
+    """
+    One middleware (connection and channel) per consumed queue, each one
+    consuming from its own thread.
+
+    produce, publish, ack_deferred, call_later and confirm go to the
+    middleware whose callback (or timer) is running, or to the first one
+    outside them (e.g. during recovery). Callbacks set it themselves: a
+    backend may run them in a thread other than the one calling start
+    (AsyncMiddleware has its own handler thread). The callbacks of
+    different queues run at the same time, the listener serializes them
+    per client.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.middlewares = []
+        self.local = threading.local()
+
+    def current(self):
+        return getattr(self.local, 'middleware', None) or self.middlewares[0]
+
+    def __new_middleware(self):
+        middleware = self.factory()
+        self.middlewares.append(middleware)
+        return middleware
+
+    def __bound(self, middleware, callback):
+        # the calls made by callback go to middleware, whatever the thread
+        def __wrapper(*args):
+            self.local.middleware = middleware
+            return callback(*args)
+        return __wrapper
+
+    def __run(self, middleware):
+        self.local.middleware = middleware
+        try:
+            middleware.start()
+        finally:
+            # a dead consumer takes the others down, their messages are redelivered
+            self.stop()
+
+    def start(self):
+        threads = [threading.Thread(target=self.__run, args=(m,)) for m in self.middlewares]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self):
+        for middleware in self.middlewares:
+            try:
+                middleware.stop_threadsafe()
+            except Exception as e:
+                logging.debug(f'action: stop_consumer | result: skip | error: {str(e) or repr(e)}')
+
+    def consume(self, queue_name: str, callback):
+        middleware = self.__new_middleware()
+        middleware.consume(queue_name, self.__bound(middleware, callback))
+
+    def subscribe(self, topic: str, tags: list, callback, queue_name: str = None):
+        middleware = self.__new_middleware()
+        return middleware.subscribe(topic, tags, self.__bound(middleware, callback), queue_name)
+
+    def ack_deferred(self):
+        self.current().ack_deferred()
+
+    def call_later(self, delay, callback):
+        middleware = self.current()
+        middleware.call_later(delay, self.__bound(middleware, callback))
+
+    def confirm(self):
+        self.current().confirm()
+
+    def produce(self, data, out_queue_name):
+        return self.current().produce(data, out_queue_name)
+
+    def publish(self, data, topic, tag):
+        return self.current().publish(data, topic, tag)
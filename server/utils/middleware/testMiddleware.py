@@ -1,4 +1,4 @@
-from utils.middleware.middleware import ACK
+from utils.middleware.middleware import ACK, DEFER, unbatched
 
 
 class TestMiddleware:
@@ -8,25 +8,53 @@ class TestMiddleware:
         self.sent = []
         self.sent_by_tag = {}
         self.callback_counter = 0
+        self.deferred = []
+        self.timers = []
 
     def add_message(self, msg, q_name):
         self.messages.append((msg, q_name))
 
     def start(self):
-        while len(self.messages) != 0:
+        try:
+            self.consume_all()
+        except Exception:
+            # unacked messages are redelivered when the consumer dies
+            self.messages.extend(self.deferred)
+            self.deferred = []
+            self.timers = []
+            raise
+
+    def consume_all(self):
+        while len(self.messages) != 0 or len(self.timers) != 0:
             _messages = self.messages.copy()
             for msg, q_name in _messages:
                 r = self.callbacks[q_name](msg, q_name)
                 if r == ACK:
                     self.messages.remove((msg, q_name))
+                elif r == DEFER:
+                    self.messages.remove((msg, q_name))
+                    self.deferred.append((msg, q_name))
                 else:
                     self.messages.remove((msg, q_name))
                     self.requeue_msg(msg, q_name)
                 self.callback_counter += 1
 
+            # timers fire once the queues are idle
+            if len(self.messages) == 0 and len(self.timers) != 0:
+                self.timers.pop(0)()
+
+    def ack_deferred(self):
+        self.deferred = []
+
+    def call_later(self, delay, callback):
+        self.timers.append(callback)
+
     def stop(self):
         return
 
+    def stop_threadsafe(self):
+        return
+
     def requeue_msg(self, msg, q_name):
         self.messages.append((msg, q_name))
 
@@ -35,10 +63,10 @@ class TestMiddleware:
             self.messages.append(self.messages.pop(0))
 
     def consume(self, queue_name: str, callback):
-        self.callbacks[queue_name] = callback
+        self.callbacks[queue_name] = unbatched(callback, self.stop)
 
     def subscribe(self, topic: str, tags: list, callback, queue_name: str = None):
-        self.callbacks[queue_name] = callback
+        self.callbacks[queue_name] = unbatched(callback, self.stop)
         return 'test-queue'
 
     def produce(self, data, out_queue_name):
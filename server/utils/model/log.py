@@ -15,6 +15,7 @@ class LogLineType(enum.Enum):
     COMMIT = b"\x02"
     WRITE = b"\x03"
     WRITE_METADATA = b"\x04"
+    CHUNK = b"\x05"
 
 
 class WriteMetadataLine():
@@ -274,6 +275,71 @@ class CommitLine():
             return cls(chunk_id)
 
 
+class ChunkLine():
+    """
+    Extra chunk committed by the same record (group commit). The record's
+    own chunk is the one in its BEGIN and COMMIT lines.
+    """
+
+    REPR = 'CHUNK'
+
+    def __init__(self, chunk_id: UUID, worker_id=None):
+        self.type = LogLineType.CHUNK
+        self.chunk_id = chunk_id
+        self.worker_id = worker_id if worker_id else 0
+
+    def encode(self):
+        b = b''
+        b += self.type.value
+        b += self.chunk_id.bytes
+        b += int.to_bytes(self.worker_id, length=1, byteorder='big')
+        return b
+
+    @classmethod
+    def decode(cls, reader, header=True):
+        if header:
+            _r = reader.read(1)
+            if len(_r) != 1:
+                raise ShortLine
+            ltype = LogLineType(_r)
+            if ltype != LogLineType.CHUNK:
+                raise ShortLine
+
+        _r = reader.read(16)
+        if len(_r) != 16:
+            raise ShortLine
+        luuid = UUID(bytes=_r)
+
+        _r = reader.read(1)
+        if len(_r) != 1:
+            raise ShortLine
+        lworker_id = int.from_bytes(_r, byteorder='big')
+
+        return cls(
+            luuid,
+            lworker_id,
+        )
+
+    def to_line(self):
+        if self.worker_id:
+            return f'{ChunkLine.REPR};{str(self.chunk_id)};{self.worker_id}\n'
+        else:
+            return f'{ChunkLine.REPR};{str(self.chunk_id)}\n'
+
+    @classmethod
+    def from_line(cls, line: str):
+        splitted = line.split(';')
+        if splitted[0] != ChunkLine.REPR:
+            raise TypeError(f"Line '{line}' is not of type {ChunkLine.REPR}.")
+
+        chunk_id = UUID(splitted[1])
+        if len(splitted) > 2:
+            worker_id = splitted[2]
+            return cls(chunk_id, worker_id)
+        else:
+            return cls(chunk_id)
+
+
 class LogFactory():
     @classmethod
     def from_line(cls, line: str):
@@ -288,6 +354,8 @@ class LogFactory():
             return BeginLine.from_line(line)
         elif splitted[0] == CommitLine.REPR:
             return CommitLine.from_line(line)
+        elif splitted[0] == ChunkLine.REPR:
+            return ChunkLine.from_line(line)
         return None
 
     @classmethod
@@ -328,6 +396,9 @@ class LogFactory():
                 elif ltype == LogLineType.BEGIN:
                     line = BeginLine.decode(reader, header=False)
                     lines.append(line)
+                elif ltype == LogLineType.CHUNK:
+                    line = ChunkLine.decode(reader, header=False)
+                    lines.append(line)
             except ShortLine:
                 logging.debug(f"action: parsing_log | result: bad_line | truncating_to: {len(lines)}")
                 break
@@ -1,7 +1,13 @@
 from uuid import UUID, uuid4
 
 import pickle
+import struct
 import enum
+import io
+import zlib
+import lzma
+
+from utils.model.reviewDictionary import REVIEW_ZDICT
 
 
 UUID_LEN = 16  # uuid4() yields 16 bytes
@@ -11,8 +17,84 @@ TYPE_LEN = 1
 MSG_ID = 0
 MSG_CLI_ID = MSG_ID + UUID_LEN
 MSG_TYPE = MSG_CLI_ID + UUID_LEN
-MSG_ARGS_LEN = MSG_TYPE + TYPE_LEN
-MSG_ARGS = MSG_ARGS_LEN + 4
+MSG_VERSION = MSG_TYPE + TYPE_LEN
+
+# HEADER: id, client id, type, version, flags, worker id, total and the
+# length of the extension area, then the extension area and the data
+HEADER = struct.Struct('>16s16sBBBiqH')
+VERSION = 1
+# args, flagged when present
+TOTAL = "total"
+WORKER_ID = "worker_id"
+HAS_TOTAL = 0x01
+HAS_WORKER_ID = 0x02
+# EXTENSION AREA: [code][len][value] for every other int arg, unknown
+# codes are skipped. Codes are never reused.
+EXTENSION_ARGS = {}
+EXTENSION_TL = struct.Struct('>BH')
+EXTENSION_VALUE = struct.Struct('>q')
+
+# LEGACY: before the version byte, [args len (4)][pickled args]. The
+# high byte of the length was always 0, so it reads as version 0.
+LEGACY_VERSION = 0
+LEGACY_ARGS_LEN = 4
+
+# BATCH: data is [len][raw message] for every inner message
+BATCH_MSG_LEN = 4
+BATCH_CLIENT_ID = UUID(int=0)
+
+# COMPRESSION: flag in the high bits of the type byte, every message says
+# how its data was compressed
+NO_COMPRESSION = 'none'
+ZLIB = 'zlib'
+LZMA = 'lzma'
+COMPRESSIONS = [NO_COMPRESSION, ZLIB, LZMA]
+COMPRESSION_FLAGS = {ZLIB: 0x40, LZMA: 0x80}
+TYPE_MASK = 0x3f
+# smaller data is sent as it is
+COMPRESS_MIN = 256
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == ZLIB:
+        compressor = zlib.compressobj(zdict=REVIEW_ZDICT.encode())
+        return compressor.compress(data) + compressor.flush()
+    return lzma.compress(data, format=lzma.FORMAT_RAW, filters=[{'id': lzma.FILTER_LZMA2, 'preset': 1}])
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == ZLIB:
+        decompressor = zlib.decompressobj(zdict=REVIEW_ZDICT.encode())
+        return decompressor.decompress(data) + decompressor.flush()
+    return lzma.decompress(data, format=lzma.FORMAT_RAW, filters=[{'id': lzma.FILTER_LZMA2, 'preset': 1}])
+
+
+class ArgsUnpickler(pickle.Unpickler):
+    # legacy args are a dict of str to int: nothing to import
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f'Forbidden global in message args: {module}.{name}')
+
+
+def encode_extensions(args: dict) -> bytes:
+    extensions = []
+    for name, value in args.items():
+        if name in (TOTAL, WORKER_ID):
+            continue
+        if name not in EXTENSION_ARGS:
+            raise ValueError(f"Unknown message arg: {name}, add it to EXTENSION_ARGS")
+        extensions.append(EXTENSION_TL.pack(EXTENSION_ARGS[name], EXTENSION_VALUE.size))
+        extensions.append(EXTENSION_VALUE.pack(value))
+    return b"".join(extensions)
+
+
+def decode_extensions(raw, offset: int, end: int, args: dict):
+    names = {code: name for name, code in EXTENSION_ARGS.items()}
+    while offset < end:
+        code, length = EXTENSION_TL.unpack_from(raw, offset)
+        offset += EXTENSION_TL.size
+        if code in names:
+            args[names[code]] = EXTENSION_VALUE.unpack_from(raw, offset)[0]
+        offset += length
 
 
 class MessageType(enum.Enum):
@@ -20,11 +102,13 @@ class MessageType(enum.Enum):
     EOF = b"\x01"
     ACK = b"\x02"
     NACK = b"\x03"
+    BATCH = b"\x04"
 
 
 class Message():
 
-    def __init__(self, client_id: UUID, type: MessageType, data: bytes, ID=None, args: dict = {}):
+    def __init__(self, client_id: UUID, type: MessageType, data: bytes, ID=None, args: dict = {},
+                 compression=NO_COMPRESSION):
         self.ID = ID if ID else uuid4()
 
         if not isinstance(client_id, UUID):
@@ -35,8 +119,8 @@ class Message():
             raise TypeError("`type` must be of type MessageType")
         self.type = type
 
-        if not isinstance(data, bytes):
-            raise TypeError("`data` must be of type bytes")
+        if not isinstance(data, (bytes, memoryview)):
+            raise TypeError("`data` must be of type bytes or memoryview")
         self.data = data
 
         if isinstance(args, dict) and len(args) > 0:
@@ -44,45 +128,89 @@ class Message():
         else:
             self.args = {}
 
-    def to_bytes(self) -> bytes:
-        # header
-        raw = self.ID.bytes
-        raw += self.client_id.bytes
-        raw += self.type.value
-
-        # metadata + body
-        raw_args = b""
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"`compression` must be one of {COMPRESSIONS}")
+        self.compression = compression
 
-        if self.args:
-            raw_args = pickle.dumps(self.args)
-
-        raw += len(raw_args).to_bytes(length=4, byteorder='big')
-        raw += raw_args
-        raw += self.data
-        return raw
+    def to_bytes(self) -> bytes:
+        data = self.data
+        type_byte = self.type.value[0]
+        if self.compression != NO_COMPRESSION and len(data) >= COMPRESS_MIN:
+            compressed = compress(data, self.compression)
+            if len(compressed) < len(data):
+                data = compressed
+                type_byte |= COMPRESSION_FLAGS[self.compression]
+
+        flags = 0
+        if TOTAL in self.args:
+            flags |= HAS_TOTAL
+        if WORKER_ID in self.args:
+            flags |= HAS_WORKER_ID
+        extensions = encode_extensions(self.args)
+
+        header = HEADER.pack(
+            self.ID.bytes,
+            self.client_id.bytes,
+            type_byte,
+            VERSION,
+            flags,
+            self.args.get(WORKER_ID, 0),
+            self.args.get(TOTAL, 0),
+            len(extensions),
+        )
+        # one copy of the body, whatever its size
+        return b"".join([header, extensions, data])
 
     @classmethod
     def from_bytes(cls, raw):
-        ID = UUID(bytes=raw[MSG_ID: MSG_CLI_ID])
-        client_id = UUID(bytes=raw[MSG_CLI_ID: MSG_TYPE])
-        type = MessageType(value=raw[MSG_TYPE: MSG_ARGS_LEN])
-
-        args_len = int.from_bytes(bytes=raw[MSG_ARGS_LEN: MSG_ARGS], byteorder='big')
+        # data is a memoryview of raw, the body is not copied
+        raw = memoryview(raw)
+        if raw[MSG_VERSION] == LEGACY_VERSION:
+            return cls.from_legacy_bytes(raw)
+        raw_id, raw_client_id, type_byte, version, flags, worker_id, total, extensions_len = HEADER.unpack_from(raw)
+        if version != VERSION:
+            raise ValueError(f"Unknown message version: {version}")
+
+        args = {}
+        if flags & HAS_TOTAL:
+            args[TOTAL] = total
+        if flags & HAS_WORKER_ID:
+            args[WORKER_ID] = worker_id
+        if extensions_len:
+            decode_extensions(raw, HEADER.size, HEADER.size + extensions_len, args)
+
+        return cls.__from_parts(raw_id, raw_client_id, type_byte, args, raw[HEADER.size + extensions_len:])
 
-        if args_len > 0:
-            args = pickle.loads(raw[MSG_ARGS: MSG_ARGS + args_len])
-        else:
-            args = {}
-        data = raw[MSG_ARGS + args_len:]
+    @classmethod
+    def from_legacy_bytes(cls, raw):
+        # messages written before the fixed header, still in queues or parked
+        args_start = MSG_VERSION + LEGACY_ARGS_LEN
+        args_len = int.from_bytes(bytes=raw[MSG_VERSION: args_start], byteorder='big')
+        args = ArgsUnpickler(io.BytesIO(raw[args_start: args_start + args_len])).load() if args_len else {}
+        return cls.__from_parts(
+            bytes(raw[MSG_ID: MSG_CLI_ID]), bytes(raw[MSG_CLI_ID: MSG_TYPE]), raw[MSG_TYPE], args,
+            raw[args_start + args_len:]
+        )
 
-        m = cls(
-            client_id=client_id,
+    @classmethod
+    def __from_parts(cls, raw_id, raw_client_id, type_byte, args, data):
+        type = MessageType(value=bytes([type_byte & TYPE_MASK]))
+        compression = NO_COMPRESSION
+        for _compression, flag in COMPRESSION_FLAGS.items():
+            if type_byte & flag:
+                compression = _compression
+
+        if compression != NO_COMPRESSION:
+            data = decompress(data, compression)
+
+        return cls(
+            client_id=UUID(bytes=raw_client_id),
             type=type,
             args=args,
             data=data,
+            ID=UUID(bytes=raw_id),
+            compression=compression,
         )
-        m.ID = ID
-        return m
 
     def __eq__(self, other) -> bool:
         return self.ID == other.ID
@@ -95,3 +223,25 @@ class Message():
 
     def __repr__(self) -> str:
         return f'Message({str(self.ID)})'
+
+
+def pack_batch(raw_msgs: list) -> bytes:
+    data = b"".join([len(raw).to_bytes(length=BATCH_MSG_LEN, byteorder='big') + raw for raw in raw_msgs])
+    return Message(client_id=BATCH_CLIENT_ID, type=MessageType.BATCH, data=data).to_bytes()
+
+
+def is_batch(raw) -> bool:
+    return raw[MSG_TYPE] & TYPE_MASK == MessageType.BATCH.value[0]
+
+
+def unpack_batch(raw) -> list:
+    # inner messages keep their own ID, duplicates are detected as usual
+    data = Message.from_bytes(raw).data
+    raw_msgs = []
+    offset = 0
+    while offset < len(data):
+        n = int.from_bytes(bytes=data[offset: offset + BATCH_MSG_LEN], byteorder='big')
+        offset += BATCH_MSG_LEN
+        raw_msgs.append(data[offset: offset + n])
+        offset += n
+    return raw_msgs
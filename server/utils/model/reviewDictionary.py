@@ -0,0 +1,42 @@
+"""
+Preset dictionary for zlib compressed messages. It is a hand-curated list
+of words and phrases common in book reviews, not derived from the dataset.
+zlib matches against it before the first bytes of a message are seen, which
+is what makes small chunks compress. The strings expected to be most common
+go last, closer to the data.
+
+Changing it breaks every zlib message already in the queues: add a new
+compression id instead.
+"""
+
+REVIEW_ZDICT = (
+    "Kindle Edition Paperback Hardcover Audio CD Mass Market edition publisher "
+    "translation chapter chapters pages page-turner sequel series trilogy volume "
+    "biography memoir history science fiction fantasy romance mystery thriller "
+    "poetry textbook cookbook religion philosophy psychology children teenagers "
+    "I received this book as a gift. I bought this book for my son. "
+    "I bought this book for my daughter. I bought this for my husband. "
+    "I was not disappointed. I was disappointed. I couldn't put it down. "
+    "I could not put it down. I can't wait to read the next one. "
+    "I would recommend this book to anyone who "
+    "I highly recommend this book to anyone "
+    "Highly recommended. Would not recommend. Don't waste your money. "
+    "One of the best books I have ever read. "
+    "This is one of the best books I've ever read. "
+    "This book is a must read for anyone interested in "
+    "The author does a great job of "
+    "The characters are well developed and the story "
+    "The story is well written and the characters "
+    "well written, interesting, beautiful, wonderful, excellent, amazing, "
+    "boring, predictable, slow, confusing, disappointing, "
+    "the main character, the characters, the plot, the ending, the writing, "
+    "the reader, the author's, the first book, the second book, the last book "
+    "reading this book, read this book, read it again, a great read, "
+    "a good read, an easy read, a quick read, I loved this book. "
+    "I really enjoyed this book. I enjoyed reading it. I love this book. "
+    "This is a great book. This is a good book. This book is great. "
+    "If you like , you will love this book. "
+    "stars out of 5 stars five stars four stars three stars two stars one star "
+    "and the of to a in that it is was I for with as his on but this "
+    "book the book this book. "
+)
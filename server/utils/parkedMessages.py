@@ -0,0 +1,73 @@
+import struct
+import os
+
+from utils.fsync import sync_directory
+
+MSG_LEN = struct.Struct('>I')
+
+
+class ParkedMessages():
+    """
+    Raw messages set aside until their client can process them, in arrival
+    order. On disk every message is [len][raw message]; a torn message at
+    the tail is dropped by `read` and truncated before the next `append`.
+    With `sync`, append returns once the message is on disk (it is acked
+    right after). The file only exists while something is parked.
+    """
+
+    def __init__(self, path, sync=False):
+        self.path = path
+        self.sync = sync
+        # the tail may be torn by a crash until checked by the first append
+        self.checked = False
+
+    def append(self, raw_msg):
+        if not self.checked:
+            self.truncate_torn()
+            self.checked = True
+        created = not self.exists()
+        with open(self.path, 'ab') as fp:
+            fp.write(MSG_LEN.pack(len(raw_msg)) + raw_msg)
+            if self.sync:
+                fp.flush()
+                os.fdatasync(fp.fileno())
+        if created and self.sync:
+            sync_directory(os.path.dirname(self.path))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def truncate_torn(self):
+        # appending after a torn message would misalign every later one
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as fp:
+            aux = fp.read()
+        _, offset = self.decode(aux)
+        if offset != len(aux):
+            os.truncate(self.path, offset)
+
+    @classmethod
+    def decode(cls, aux):
+        # complete messages and the offset where they end
+        messages = []
+        offset = 0
+        while offset + MSG_LEN.size <= len(aux):
+            msg_len = MSG_LEN.unpack_from(aux, offset)[0]
+            if offset + MSG_LEN.size + msg_len > len(aux):
+                break
+            offset += MSG_LEN.size
+            messages.append(aux[offset:offset + msg_len])
+            offset += msg_len
+        return messages, offset
+
+    def read(self):
+        if not self.exists():
+            return []
+        with open(self.path, 'rb') as fp:
+            aux = fp.read()
+        return self.decode(aux)[0]
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
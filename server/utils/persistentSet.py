@@ -0,0 +1,74 @@
+import uuid
+import os
+
+UUID_LEN = 16
+
+
+class PersistentSet():
+    """
+    Append-only set of UUIDs.
+
+    Membership is checked against an in-memory set while insertion order is
+    kept in a list, so the items can still be iterated and indexed in the
+    order they were added. On disk every item takes UUID_LEN raw bytes.
+    With `sync`, flush returns once the items are on disk.
+    """
+
+    def __init__(self, path, sync=False):
+        self.path = path
+        self.sync = sync
+        self.list = []
+        self.set = set()
+        self.n_flushed = 0
+
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+
+    def add(self, item):
+        # in memory only, persisted by the next flush
+        if item in self.set:
+            return
+        self.list.append(item)
+        self.set.add(item)
+
+    def append(self, item):
+        self.add(item)
+        self.flush()
+
+    def flush(self):
+        if self.n_flushed == len(self.list):
+            return
+        with open(self.path, "ab") as fp:
+            fp.write(b''.join([item.bytes for item in self.list[self.n_flushed:]]))
+            if self.sync:
+                fp.flush()
+                os.fdatasync(fp.fileno())
+        self.n_flushed = len(self.list)
+
+    def __contains__(self, item):
+        return self.set.__contains__(item)
+
+    def __getitem__(self, index):
+        return self.list[index]
+
+    def __len__(self):
+        return self.list.__len__()
+
+    def __iter__(self):
+        return self.list.__iter__()
+
+    def __repr__(self):
+        return self.list.__repr__()
+
+    def load(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as fp:
+                aux = fp.read()
+            n = len(aux) // UUID_LEN
+            if len(aux) != n * UUID_LEN:
+                # Short write: drop the incomplete uuid at the tail.
+                os.truncate(self.path, n * UUID_LEN)
+
+            self.list = [uuid.UUID(bytes=aux[i*UUID_LEN:(i+1)*UUID_LEN]) for i in range(n)]
+            self.set = set(self.list)
+            self.n_flushed = n
@@ -1,28 +1,29 @@
 import logging
 import shutil
 import uuid
-import io
+import time
 import os
 
 from utils.clientTrackerSynchronizer import ClientTrackerSynchronizer
 from utils.clientTrackerSynchronizer import BASE_DIRECTORY, NULL_DIRECTORY
-from utils.model.message import Message, MessageType
+from utils.model.message import Message, MessageType, TOTAL, WORKER_ID
+from utils.logManager import FLUSH
 from utils.middleware.middleware import ACK
 from utils.listener import Listener
 
-TOTAL = "total"
-WORKER_ID = "worker_id"
-
 
 class Synchronizer(Listener):
-    def __init__(self, middleware, n_workers, in_serializer, out_serializer, chunk_size):
-        super().__init__(middleware)
+    def __init__(self, middleware, n_workers, in_serializer, out_serializer, chunk_size,
+                 group_size=1, group_timeout=0, durability=FLUSH, max_entries=0):
+        super().__init__(middleware, group_size, group_timeout, max_entries)
+        self.durability = durability
         self.chunk_size = chunk_size
         self.in_serializer = in_serializer
         self.out_serializer = out_serializer
         self.n_workers = n_workers
         self.clients = {}
         self.tracker = None
+        self.recovery_time = 0
 
     def process_chunk(self, chunk, chunk_id):
         raise RuntimeError("Must be redefined")
@@ -33,28 +34,41 @@ class Synchronizer(Listener):
     def adapt_tracker(self):
         return
 
-    def context_switch(self, client_id):
+    def context_switch(self, client_id, load_data=True):
         if client_id not in self.clients:
-            self.clients[client_id] = ClientTrackerSynchronizer(client_id, self.n_workers)
+            self.clients[client_id] = ClientTrackerSynchronizer(client_id, self.n_workers, self.group_commit(),
+                                                                self.durability)
         self.tracker = self.clients[client_id]
         self.adapt_tracker()
+        if load_data:
+            self.tracker.load_data()
+            self.cache_tracker(self.tracker)
 
     def recovery(self):
-        if not os.path.exists(BASE_DIRECTORY):
-            return
-        for directory in os.listdir(BASE_DIRECTORY):
-            if BASE_DIRECTORY + '/' + directory == NULL_DIRECTORY:
-                shutil.rmtree(NULL_DIRECTORY)
-                continue
-            client_id = uuid.UUID(directory)
-            self.context_switch(client_id)
-            self.tracker.recovery()
-
-            if self.tracker.all_chunks_received():
-                self.terminator()
-                self.tracker.clear()
-                del self.clients[self.tracker.client_id]
-                self.tracker = None
+        start = time.perf_counter()
+        n_clients = 0
+        n_records = 0
+        if os.path.exists(BASE_DIRECTORY):
+            for directory in os.listdir(BASE_DIRECTORY):
+                if BASE_DIRECTORY + '/' + directory == NULL_DIRECTORY:
+                    shutil.rmtree(NULL_DIRECTORY)
+                    continue
+                client_id = uuid.UUID(directory)
+                self.context_switch(client_id, load_data=False)
+                self.tracker.recovery()
+                n_clients += 1
+
+                if self.tracker.all_chunks_received():
+                    self.tracker.load_data()
+                    n_records += self.tracker.replayed_records
+                    self.terminator()
+                    self.tracker.clear()
+                    del self.clients[self.tracker.client_id]
+                    self.tracker = None
+
+        self.recovery_time = time.perf_counter() - start
+        logging.info(f'action: recovery | result: success | clients: {n_clients} | '
+                     f'records: {n_records} | time: {self.recovery_time * 1000:.2f}ms')
 
     def recv(self, raw_msg, key):
         msg = Message.from_bytes(raw_msg)
@@ -76,18 +90,19 @@ class Synchronizer(Listener):
                 str(msg.args[WORKER_ID])
             )
 
-        return ACK
+        return self.ack(self.tracker)
 
     def _recv_raw(self, data, chunk_id, worker_id):
-        reader = io.BytesIO(data)
-        input_chunk = self.in_serializer.from_chunk(reader)
+        input_chunk = self.in_serializer.from_buffer(data)
         self.process_chunk(input_chunk, chunk_id)
 
         self.tracker.persist(chunk_id, worker_id, worked=len(input_chunk))
 
         if self.tracker.all_chunks_received():
+            self.commit_group()
             self.terminator()
             self.tracker.clear()
+            self.forget_tracker(self.tracker.client_id)
             del self.clients[self.tracker.client_id]
             self.tracker = None
         return
@@ -97,8 +112,10 @@ class Synchronizer(Listener):
         self.tracker.persist(eof_id, worker_id, total=total)
 
         if self.tracker.all_chunks_received():
+            self.commit_group()
             self.terminator()
             self.tracker.clear()
+            self.forget_tracker(self.tracker.client_id)
             del self.clients[self.tracker.client_id]
             self.tracker = None
         return
@@ -0,0 +1,83 @@
+import struct
+import uuid
+import time
+import os
+
+UUID_LEN = 16
+TIMESTAMP = struct.Struct('>d')
+RECORD_LEN = UUID_LEN + TIMESTAMP.size
+
+# expire old clients every COMPACT_EVERY appends
+COMPACT_EVERY = 1024
+
+
+class WorkedClients():
+    """
+    Persistent set of finished clients, each stored with the time it finished.
+
+    Membership is a dict lookup, so checking an incoming message does not
+    depend on how many clients were ever served. Clients older than `ttl`
+    seconds are dropped by `compact`, which runs on `load` and every
+    COMPACT_EVERY appends; a ttl of 0 keeps every client forever. On disk
+    every record is [uuid][finished at].
+    """
+
+    def __init__(self, path, ttl=0):
+        self.path = path
+        self.tmp_file = path + '_tmp'
+        self.ttl = ttl
+        self.map = {}
+        self.n_appended = 0
+
+        if not os.path.exists(self.path):
+            open(self.path, 'wb').close()
+
+    def append(self, item):
+        now = time.time()
+        self.map[item] = now
+        with open(self.path, "ab") as fp:
+            fp.write(item.bytes + TIMESTAMP.pack(now))
+        self.n_appended += 1
+
+        if self.ttl and self.n_appended >= COMPACT_EVERY:
+            self.compact()
+
+    def __contains__(self, item):
+        return self.map.__contains__(item)
+
+    def __len__(self):
+        return self.map.__len__()
+
+    def __iter__(self):
+        return self.map.__iter__()
+
+    def __repr__(self):
+        return self.map.__repr__()
+
+    def expire(self, now=None):
+        if not self.ttl:
+            return
+        now = time.time() if now is None else now
+        self.map = {k: t for k, t in self.map.items() if now - t < self.ttl}
+
+    def compact(self, now=None):
+        self.expire(now)
+        with open(self.tmp_file, 'wb') as tmp:
+            tmp.write(b''.join([k.bytes + TIMESTAMP.pack(t) for k, t in self.map.items()]))
+            tmp.flush()
+        os.rename(self.tmp_file, self.path)
+        self.n_appended = 0
+
+    def load(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as fp:
+                aux = fp.read()
+            n = len(aux) // RECORD_LEN
+            self.map = {}
+            for i in range(n):
+                offset = i * RECORD_LEN
+                client_id = uuid.UUID(bytes=aux[offset:offset + UUID_LEN])
+                self.map[client_id] = TIMESTAMP.unpack_from(aux, offset + UUID_LEN)[0]
+            # also drops a torn record at the tail
+            if self.ttl or len(aux) != n * RECORD_LEN:
+                self.compact()
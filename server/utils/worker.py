@@ -1,34 +1,39 @@
 import logging
 import shutil
 import uuid
-import io
+import time
 import os
 
 from utils.listener import Listener
 from utils.clientTracker import ClientTracker
 from utils.clientTracker import BASE_DIRECTORY, NULL_DIRECTORY
-from utils.persistentList import PersistentList
-from utils.model.message import Message, MessageType
+from utils.workedClients import WorkedClients
+from utils.logManager import FLUSH
+from utils.model.message import Message, MessageType, TOTAL, WORKER_ID
 from utils.middleware.middleware import ACK
 
-
-TOTAL = "total"
-WORKER_ID = "worker_id"
-
 WORKED_CLIENTS_FILE_PATH = '/worked_clients'
+# finished clients are forgotten after a day, late duplicates arrive way before
+WORKED_CLIENTS_TTL = 24 * 60 * 60
 
 
 class Worker(Listener):
-    def __init__(self, middleware, in_serializer, out_serializer, peer_id, peers, chunk_size):
-        super().__init__(middleware)
+    # input fields decoded lazily (serializer.from_buffer), work decodes them if needed
+    LAZY_FIELDS = ()
+
+    def __init__(self, middleware, in_serializer, out_serializer, peer_id, peers, chunk_size,
+                 group_size=1, group_timeout=0, durability=FLUSH, max_entries=0):
+        super().__init__(middleware, group_size, group_timeout, max_entries)
+        self.durability = durability
         self.peer_id = peer_id
         self.peers = peers
         self.chunk_size = chunk_size
         self.in_serializer = in_serializer
         self.out_serializer = out_serializer
         self.clients = {}
-        self.worked_clients = PersistentList(WORKED_CLIENTS_FILE_PATH)
+        self.worked_clients = WorkedClients(WORKED_CLIENTS_FILE_PATH, WORKED_CLIENTS_TTL)
         self.tracker = None
+        self.recovery_time = 0
 
     def forward_eof(self, eof):
         raise RuntimeError("Must be redefined")
@@ -39,6 +44,11 @@ class Worker(Listener):
     def work(self, input):
         return
 
+    def select(self, columns):
+        # rows of a columnar chunk to work, None for all. Must only leave
+        # out rows work would ignore
+        return None
+
     def do_after_work(self, chunk_id):
         return
 
@@ -48,39 +58,85 @@ class Worker(Listener):
     def adapt_tracker(self):
         return
 
+    def ready_for_parked(self):
+        return True
+
+    def park(self, raw_msg):
+        # durable once appended (synced unless durability is flush), the delivery can be acked
+        logging.debug(f'action: park | client: {self.tracker.client_id}')
+        self.tracker.parked.append(raw_msg)
+
+    def release_parked(self):
+        parked = self.tracker.parked
+        if not parked.exists():
+            return
+        # what made the client ready is committed before the parked
+        # messages are worked, a crash replays them (worked chunks are skipped)
+        self.commit_group()
+        client_id = self.tracker.client_id
+        messages = parked.read()
+        logging.debug(f'action: release_parked | client: {client_id} | n: {len(messages)}')
+        for raw_msg in messages:
+            self.recv(raw_msg, None)
+        self.commit_group()
+        parked.clear()
+        if client_id in self.clients:
+            self.context_switch(client_id)
+
     def sign_uuid(self, u):
         b = int.to_bytes(self.peer_id, length=1, byteorder='big')
         b += u.bytes[1:]
         return uuid.UUID(bytes=b)
 
-    def context_switch(self, client_id):
+    def context_switch(self, client_id, load_data=True):
         if client_id not in self.clients:
-            self.clients[client_id] = ClientTracker(client_id)
+            self.clients[client_id] = ClientTracker(client_id, self.group_commit(), self.durability)
         self.tracker = self.clients[client_id]
         self.adapt_tracker()
+        if load_data:
+            self.tracker.load_data()
+            self.cache_tracker(self.tracker)
 
     def recovery(self):
+        start = time.perf_counter()
+        n_clients = 0
+        n_records = 0
         self.worked_clients.load()
-        if not os.path.exists(BASE_DIRECTORY):
-            return
-        for directory in os.listdir(BASE_DIRECTORY):
-            if BASE_DIRECTORY + '/' + directory == NULL_DIRECTORY:
-                shutil.rmtree(NULL_DIRECTORY)
+        if os.path.exists(BASE_DIRECTORY):
+            for directory in os.listdir(BASE_DIRECTORY):
+                if BASE_DIRECTORY + '/' + directory == NULL_DIRECTORY:
+                    shutil.rmtree(NULL_DIRECTORY)
+                    continue
+                client_id = uuid.UUID(directory)
+                if client_id in self.worked_clients:
+                    ClientTracker.clear(client_id)
+                    continue
+
+                self.context_switch(client_id, load_data=False)
+                self.tracker.recovery()
+                n_clients += 1
+
+                if self.tracker.is_completed():
+                    self.tracker.load_data()
+                    n_records += self.tracker.replayed_records
+                    self.terminator()
+                    self.worked_clients.append(client_id)
+                    self.tracker.close()
+                    ClientTracker.clear(client_id)
+                    del self.clients[self.tracker.client_id]
+                    self.tracker = None
+
+        self.recovery_time = time.perf_counter() - start
+        logging.info(f'action: recovery | result: success | clients: {n_clients} | '
+                     f'records: {n_records} | time: {self.recovery_time * 1000:.2f}ms')
+
+        # parked before a crash, while their client was already able to take them
+        for client_id in list(self.clients):
+            if not self.clients[client_id].parked.exists():
                 continue
-            client_id = uuid.UUID(directory)
-            if client_id in self.worked_clients:
-                ClientTracker.clear(client_id)
-                continue
-
             self.context_switch(client_id)
-            self.tracker.recovery()
-
-            if self.tracker.is_completed():
-                self.terminator()
-                self.worked_clients.append(client_id)
-                ClientTracker.clear(client_id)
-                del self.clients[self.tracker.client_id]
-                self.tracker = None
+            if self.ready_for_parked():
+                self.release_parked()
 
     def send_chunk(self, chunk, chunk_id):
         logging.debug(f'action: send_results | status: in_progress | forwarding_chunk | len(chunk): {len(chunk)}')
@@ -128,35 +184,41 @@ class Worker(Listener):
     def recv(self, raw_msg, key):
         msg = Message.from_bytes(raw_msg)
 
-        if msg.client_id in self.worked_clients:
-            return ACK
+        with self.client_lock(msg.client_id):
+            if msg.client_id in self.worked_clients:
+                return ACK
 
-        self.context_switch(msg.client_id)
+            self.context_switch(msg.client_id)
 
-        if msg.ID in self.tracker.worked_chunks:
-            return ACK
+            if msg.ID in self.tracker.worked_chunks:
+                return ACK
 
-        if msg.type == MessageType.EOF:
-            self.recv_eof(msg.args[TOTAL], msg.ID)
-        else:
-            self.recv_raw(msg.data, msg.ID)
+            if msg.type == MessageType.EOF:
+                self.recv_eof(msg.args[TOTAL], msg.ID)
+            else:
+                self.recv_raw(msg.data, msg.ID)
 
-        return ACK
+            return self.ack(self.tracker)
 
     def recv_raw(self, data, chunk_id):
-        reader = io.BytesIO(data)
-        input_chunk = self.in_serializer.from_chunk(reader)
+        input_chunk = self.in_serializer.from_buffer(data, lazy=self.LAZY_FIELDS, select=self.select)
         logging.debug(f'action: recv_raw | status: new_chunk | len(chunk): {len(input_chunk)}')
         for input in input_chunk:
             self.work(input)
         sent = self.do_after_work(chunk_id)
 
-        self.tracker.persist(chunk_id, flush_data=True, WORKED=len(input_chunk), SENT=sent)
+        self.tracker.persist(chunk_id, flush_data=True, WORKED=self.in_serializer.chunk_len(data), SENT=sent)
 
         if self.tracker.is_completed():
+            self.commit_group()
             self.terminator()
-            self.worked_clients.append(self.tracker.client_id)
-            ClientTracker.clear(self.tracker.client_id)
+            # with parallel queues both threads may finish a client: they
+            # share the tombstone directory clear renames into
+            with self.lock:
+                self.worked_clients.append(self.tracker.client_id)
+                self.tracker.close()
+                ClientTracker.clear(self.tracker.client_id)
+            self.forget_tracker(self.tracker.client_id)
             del self.clients[self.tracker.client_id]
             self.tracker = None
         return
@@ -165,9 +227,15 @@ class Worker(Listener):
         self.tracker.persist(eof_id, EXPECTED=total)
 
         if self.tracker.is_completed():
+            self.commit_group()
             self.terminator()
-            self.worked_clients.append(self.tracker.client_id)
-            ClientTracker.clear(self.tracker.client_id)
+            # with parallel queues both threads may finish a client: they
+            # share the tombstone directory clear renames into
+            with self.lock:
+                self.worked_clients.append(self.tracker.client_id)
+                self.tracker.close()
+                ClientTracker.clear(self.tracker.client_id)
+            self.forget_tracker(self.tracker.client_id)
             del self.clients[self.tracker.client_id]
             self.tracker = None
         return
@@ -29,7 +29,12 @@ set_up_config('client/config.ini',
 # CLIENT HANDLER
 set_up_config('server/clientHandler/config.ini',
               SERVER_PORT=SERVER_PORT,
-              MAX_USERS=3)
+              MAX_USERS=3,
+              PUBLISH_WINDOW=0,
+              MIDDLEWARE='blocking',
+              POOL_SIZE=3,
+              REVIEW_COMPRESSION='none',
+              COLUMNAR_CHUNKS=0)
 
 # QUERY 1
 # ## WORKER
@@ -39,22 +44,62 @@ set_up_config('server/query1/worker/config.ini',
               PUBLISHED_DATE_MIN=2000,
               PUBLISHED_DATE_MAX=2023,
               CATEGORY='computers',
-              TITLE='distributed')
+              TITLE='distributed',
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 # ## SYNCH
 set_up_config('server/query1/synchronizer/config.ini',
               LOGGING_LEVEL='INFO',
-              CHUNK_SIZE=5000)
+              CHUNK_SIZE=5000,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 
 # QUERY 2
 # ## WORKER
 set_up_config('server/query2/worker/config.ini',
               LOGGING_LEVEL='INFO',
               MIN_DECADES=10,
-              CHUNK_SIZE=2500)
+              CHUNK_SIZE=2500,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 # ## SYNCH
 set_up_config('server/query2/synchronizer/config.ini',
               LOGGING_LEVEL='INFO',
-              CHUNK_SIZE=5000)
+              CHUNK_SIZE=5000,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 
 # QUERY 3
 # ## WORKER
@@ -63,26 +108,68 @@ set_up_config('server/query3/worker/config.ini',
               CHUNK_SIZE=850,
               MIN_AMOUNT_REVIEWS=500,
               MINIMUN_DATE=1990,
-              MAXIMUN_DATE=1999)
+              MAXIMUN_DATE=1999,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking',
+              PARALLEL_QUEUES=0)
 
 # ## SYNCH
 set_up_config('server/query3/synchronizer/config.ini',
               LOGGING_LEVEL='INFO',
               CHUNK_SIZE=900,
-              N_TOP=10)
+              N_TOP=10,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 
 # QUERY 5
 # ## WORKER
 set_up_config('server/query5/worker/config.ini',
               LOGGING_LEVEL='INFO',
               CHUNK_SIZE=1500,
-              CATEGORY='Fiction')
+              CATEGORY='Fiction',
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking',
+              PARALLEL_QUEUES=0)
 
 # ## SYNCH
 set_up_config('server/query5/synchronizer/config.ini',
               LOGGING_LEVEL='INFO',
               CHUNK_SIZE=1800,
-              PERCENTILE=90)
+              PERCENTILE=90,
+              GROUP_SIZE=1,
+              GROUP_TIMEOUT=100,
+              DURABILITY='flush',
+              MAX_ENTRIES=0,
+              PREFETCH_COUNT=0,
+              ACK_BATCH=1,
+              PUBLISH_WINDOW=0,
+              BATCH_SIZE=0,
+              TRANSIENT_ROUTES='',
+              MIDDLEWARE='blocking')
 
 # RESULT HANDLER
 set_up_config('server/resultHandler/config.ini',
@@ -90,7 +177,8 @@ set_up_config('server/resultHandler/config.ini',
               SERVER_PORT=RESULT_PORT,
               SERVER_IP=RESULT_IP,
               FILE_NAME='results.csv',
-              MAX_USERS=3)
+              MAX_USERS=3,
+              MIDDLEWARE='blocking')
 
 # DOCTOR
 set_up_config('server/doctor/config.ini',
@@ -7,11 +7,16 @@ from config import AMOUNT_OF_QUERY2_WORKERS
 from config import AMOUNT_OF_QUERY3_WORKERS
 from config import AMOUNT_OF_QUERY5_WORKERS
 from config import AMOUNT_OF_DOCTOR
+from config import LOCAL_BROKER
 
 NETWORK_NAME = "amazon-network"
 
 HEARTBEAT_PORT = '12349'
 
+# components reach the broker (either one) by this service name
+BROKER_HOST = 'rabbitmq'
+LOCAL_BROKER_PORT = '5673'
+
 
 def create_network(external: bool):
     net = {
@@ -56,6 +61,33 @@ def create_middleware():
         ],
     }
 
+
+def create_local_broker():
+    return {
+        'image': 'server-base:latest',
+        'entrypoint': f'python3 /utils/middleware/localBroker.py /definitions.json {LOCAL_BROKER_PORT} /broker',
+        'environment': [
+            'PYTHONUNBUFFERED=1',
+        ],
+        'healthcheck': {
+            'test': ['CMD', 'python3', '-c',
+                     f"import socket; socket.create_connection(('localhost', {LOCAL_BROKER_PORT}))"],
+            'interval': '10s',
+            'timeout': '10s',
+            'retries': '5',
+        },
+        'volumes': [
+            './rabbitmq/definitions.json:/definitions.json:ro'
+        ],
+        'networks': [
+            NETWORK_NAME,
+        ],
+    }
+
+
+def middleware_environment():
+    return ['MIDDLEWARE=local'] if LOCAL_BROKER else []
+
 ###############
 # SERVER SIDE #
 ###############
@@ -128,7 +160,7 @@ def create_query1Worker(i):
             'PEER_ID='+str(i),
             f'HEARTBEAT_IP=query1Worker{i}',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query1/worker/config.ini:/config.ini',
         ],
@@ -152,7 +184,7 @@ def create_query1Synchronizer():
             'N_WORKERS='+str(AMOUNT_OF_QUERY1_WORKERS),
             'HEARTBEAT_IP=query1Synchronizer',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query1/synchronizer/config.ini:/config.ini',
         ],
@@ -177,7 +209,7 @@ def create_query2Worker(i):
             'PEER_ID='+str(i),
             f'HEARTBEAT_IP=query2Worker{i}',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query2/worker/config.ini:/config.ini',
         ],
@@ -201,7 +233,7 @@ def create_query2Synchronizer():
             'N_WORKERS='+str(AMOUNT_OF_QUERY2_WORKERS),
             'HEARTBEAT_IP=query2Synchronizer',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query2/synchronizer/config.ini:/config.ini',
         ],
@@ -226,7 +258,7 @@ def create_query3Worker(i):
             'PEER_ID='+str(i),
             f'HEARTBEAT_IP=query3Worker{i}',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query3/worker/config.ini:/config.ini',
         ],
@@ -250,7 +282,7 @@ def create_query3Synchronizer():
             'N_WORKERS='+str(AMOUNT_OF_QUERY3_WORKERS),
             'HEARTBEAT_IP=query3Synchronizer',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query3/synchronizer/config.ini:/config.ini',
         ],
@@ -275,7 +307,7 @@ def create_query5Worker(i):
             'PEER_ID='+str(i),
             f'HEARTBEAT_IP=query5Worker{i}',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query5/worker/config.ini:/config.ini',
         ],
@@ -299,7 +331,7 @@ def create_query5Synchronizer():
             'N_WORKERS='+str(AMOUNT_OF_QUERY5_WORKERS),
             'HEARTBEAT_IP=query5Synchronizer',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/query5/synchronizer/config.ini:/config.ini',
         ],
@@ -322,7 +354,7 @@ def create_resultHandler():
             f'LOGGING_LEVEL={LOGGING_LEVEL}',
             'HEARTBEAT_IP=resultHandler',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/resultHandler/config.ini:/config.ini',
         ],
@@ -351,7 +383,7 @@ def create_clientHandler():
             f'N_WORKERS_Q5={AMOUNT_OF_QUERY5_WORKERS}',
             'HEARTBEAT_IP=clientHandler',
             f'HEARTBEAT_PORT={HEARTBEAT_PORT}',
-        ],
+        ] + middleware_environment(),
         'volumes': [
             './server/clientHandler/config.ini:/config.ini',
         ],
@@ -377,7 +409,7 @@ def create_server_side():
     config['services'] = {}
 
     # MIDDLEWARE
-    config['services']['rabbitmq'] = create_middleware()
+    config['services'][BROKER_HOST] = create_local_broker() if LOCAL_BROKER else create_middleware()
 
     # CLIENT HANDLER
     config['services']['clientHandler'] = create_clientHandler()
@@ -3,6 +3,7 @@ from config import AMOUNT_OF_QUERY1_WORKERS
 from config import AMOUNT_OF_QUERY2_WORKERS
 from config import AMOUNT_OF_QUERY3_WORKERS
 from config import AMOUNT_OF_QUERY5_WORKERS
+from config import TRANSIENT_QUEUES, LAZY_QUEUES
 
 N_QUERIES = 5
 
@@ -11,9 +12,9 @@ def QUEUE_DEF(q_name: str):
     return {
         "name": q_name,
         "vhost": "/",
-        "durable": True,
+        "durable": q_name not in TRANSIENT_QUEUES,
         "auto_delete": False,
-        "arguments": {}
+        "arguments": {"x-queue-mode": "lazy"} if q_name in LAZY_QUEUES else {}
     }
 
 
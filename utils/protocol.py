@@ -5,6 +5,10 @@ SIZE_LENGTH = 4
 MSG_ID_LEN = 16
 UUID_LEN = 16
 
+# type and length of a field
+TL = struct.Struct('!II')
+LENGTH = struct.Struct('!I')
+
 i = -1
 
 
@@ -144,7 +148,8 @@ def string_to_bytes(s: str, code: int):
 
 
 def string_from_bytes(bytes_s):
-    return bytes_s.decode('utf-8')
+    # bytes or a memoryview of them
+    return str(bytes_s, 'utf-8')
 
 
 def float_to_bytes(f: float, code: int):
@@ -160,13 +165,8 @@ def float_from_bytes(bytes_f):
 
 
 def intarr_to_bytes(int_array, code: int):
-    bytes = code_to_bytes(code)
-    bytes_arr = b''
-    for i in int_array:
-        bytes_arr += int.to_bytes(i, SIZE_LENGTH, 'big')
-    bytes += int.to_bytes(len(bytes_arr), SIZE_LENGTH, 'big')
-    bytes += bytes_arr
-    return bytes
+    bytes_arr = struct.pack(f'!{len(int_array)}I', *int_array)
+    return TL.pack(code, len(bytes_arr)) + bytes_arr
 
 def intarr_from_bytes(bytes_arr):
     array = []
@@ -189,5 +189,48 @@ def paging_args_from_bytes(raw):
     page = int.from_bytes(raw, "big")
     return page
 
+class TlvWriter:
+    """
+    Builds a chunk in a single growing buffer, so the cost is linear in its
+    size. An object's length is reserved by `begin` and written by `end`,
+    once its fields are in the buffer.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def header(self, code: int, n: int):
+        self.buffer += TL.pack(code, n)
+
+    def begin(self, code: int):
+        position = len(self.buffer)
+        self.buffer += TL.pack(code, 0)
+        return position
+
+    def end(self, position: int):
+        LENGTH.pack_into(self.buffer, position + TlvTypes.SIZE_CODE_MSG, len(self.buffer) - position - TL.size)
+
+    def raw(self, raw: bytes, code: int):
+        self.buffer += TL.pack(code, len(raw))
+        self.buffer += raw
+
+    def string(self, s: str, code: int):
+        self.raw(s.encode('utf-8'), code)
+
+    def integer(self, i: int, code: int):
+        self.buffer += TL.pack(code, SIZE_LENGTH)
+        self.buffer += LENGTH.pack(i)
+
+    def float(self, f: float, code: int):
+        self.buffer += TL.pack(code, 4)
+        self.buffer += struct.pack('!f', f)
+
+    def intarr(self, int_array, code: int):
+        self.raw(struct.pack(f'!{len(int_array)}I', *int_array), code)
+
+    def to_bytes(self):
+        return bytes(self.buffer)
+
+
 class UnexpectedType(Exception):
     pass
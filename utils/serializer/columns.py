@@ -0,0 +1,170 @@
+"""
+Columnar chunks: the fields of the objects of a chunk travel as one array
+per field instead of one TLV per field per object.
+
+    [columns code][n objects]
+    for every field: [field code][len][column]
+
+Columns, by field kind:
+  string:     [n lengths, utf-8 bytes][the strings, utf-8]
+  dictionary: [n distinct][len][their string column][n indexes, uint16 or uint32]
+  float:      [n float32]
+  integer:    [n uint32]
+  repeated fields and intarr: [n counts][column of all the items]
+
+A worker decodes the columns it filters on, picks the rows it needs and
+only builds those objects.
+"""
+from itertools import accumulate
+import struct
+
+from utils.protocol import TlvWriter, TL, LENGTH
+from utils.serializer.schema import STRING, FLOAT, INTARR
+
+try:
+    import numpy
+except ImportError:
+    # not in every image, filters fall back to plain Python
+    numpy = None
+
+DICTIONARY = struct.Struct('!II')
+MAX_SHORT_INDEX = 0xffff
+
+
+def pack_array(fmt: str, values) -> bytes:
+    return struct.pack(f'!{len(values)}{fmt}', *values)
+
+
+def unpack_array(fmt: str, raw, offset: int, n: int) -> tuple:
+    return struct.unpack_from(f'!{n}{fmt}', raw, offset)
+
+
+def encode_strings(values) -> bytes:
+    encoded = [value.encode('utf-8') for value in values]
+    return pack_array('I', [len(value) for value in encoded]) + b''.join(encoded)
+
+
+def decode_strings(raw, offset: int, end: int, n: int, lazy: bool = False) -> list:
+    ends = list(accumulate(unpack_array('I', raw, offset, n)))
+    offset += n * LENGTH.size
+    if lazy:
+        view = raw[offset:end]
+        return [view[start:stop] for start, stop in zip([0] + ends, ends)]
+    # the whole column in one decode, byte offsets are char offsets if it is ascii
+    text = str(raw[offset:end], 'utf-8')
+    if len(text) == end - offset:
+        return [text[start:stop] for start, stop in zip([0] + ends, ends)]
+    return [str(raw[offset + start:offset + stop], 'utf-8') for start, stop in zip([0] + ends, ends)]
+
+
+def encode_dictionary(values) -> bytes:
+    index = {}
+    indexes = [index.setdefault(value, len(index)) for value in values]
+    words = encode_strings(list(index))
+    fmt = 'H' if len(index) <= MAX_SHORT_INDEX else 'I'
+    return DICTIONARY.pack(len(index), len(words)) + words + pack_array(fmt, indexes)
+
+
+def decode_dictionary(raw, offset: int, end: int, n: int) -> list:
+    n_words, words_len = DICTIONARY.unpack_from(raw, offset)
+    offset += DICTIONARY.size
+    words = decode_strings(raw, offset, offset + words_len, n_words)
+    fmt = 'H' if n_words <= MAX_SHORT_INDEX else 'I'
+    return [words[i] for i in unpack_array(fmt, raw, offset + words_len, n)]
+
+
+def encode_values(field, values) -> bytes:
+    if field.kind == STRING:
+        return encode_dictionary(values) if field.dictionary else encode_strings(values)
+    return pack_array('f' if field.kind == FLOAT else 'I', values)
+
+
+def decode_values(field, raw, offset: int, end: int, n: int, lazy: bool) -> list:
+    if field.kind == STRING:
+        if field.dictionary:
+            return decode_dictionary(raw, offset, end, n)
+        return decode_strings(raw, offset, end, n, lazy)
+    return list(unpack_array('f' if field.kind == FLOAT else 'I', raw, offset, n))
+
+
+def encode_column(field, values) -> bytes:
+    if field.repeated or field.kind == INTARR:
+        counts = pack_array('I', [len(value) for value in values])
+        return counts + encode_values(field, [item for value in values for item in value])
+    return encode_values(field, values)
+
+
+def decode_column(field, raw, offset: int, end: int, n: int, lazy: bool) -> list:
+    if field.repeated or field.kind == INTARR:
+        ends = list(accumulate(unpack_array('I', raw, offset, n)))
+        offset += n * LENGTH.size
+        items = decode_values(field, raw, offset, end, ends[-1] if ends else 0, lazy)
+        return [items[start:stop] for start, stop in zip([0] + ends, ends)]
+    return decode_values(field, raw, offset, end, n, lazy)
+
+
+def encode(schema, chunk: list) -> bytes:
+    writer = TlvWriter()
+    writer.header(schema.columns_code, len(chunk))
+    for field in schema.fields:
+        values = [obj if field.attribute is None else getattr(obj, field.attribute) for obj in chunk]
+        writer.raw(encode_column(field, values), field.code)
+    return writer.to_bytes()
+
+
+def decode(schema, raw, offset: int, end: int, n: int, lazy: tuple = ()):
+    values = [None] * schema.n_fields
+    while offset < end:
+        code, length = TL.unpack_from(raw, offset)
+        offset += TL.size
+        if code in schema.decoders:
+            position = schema.decoders[code][0]
+            field = schema.fields[position]
+            values[position] = decode_column(field, raw, offset, offset + length, n, field.attribute in lazy)
+        # else: a column this side does not know of
+        offset += length
+
+    for i, label, _ in schema.required:
+        assert values[i] is not None, f"Invalid {schema.name}: no {label} provided"
+    for i, default in schema.optional:
+        if values[i] is None:
+            values[i] = [default() for _ in range(n)]
+    return Columns(schema, n, values)
+
+
+class Columns:
+    """
+    The decoded columns of a chunk. `between` and `isin` give the rows a
+    worker needs, `rows` builds the objects of those rows only.
+    """
+
+    def __init__(self, schema, n: int, values: list):
+        self.schema = schema
+        self.n = n
+        self.values = values
+        self.positions = {field.attribute: i for i, field in enumerate(schema.fields)}
+
+    def __getitem__(self, attribute: str) -> list:
+        return self.values[self.positions[attribute]]
+
+    def between(self, attribute: str, low: int, high: int) -> list:
+        # rows whose value, as an integer, is in [low, high]
+        values = self[attribute]
+        if numpy is not None:
+            array = numpy.asarray(values).astype(numpy.int64)
+            return numpy.flatnonzero((array >= low) & (array <= high)).tolist()
+        return [i for i, value in enumerate(values) if low <= int(value) <= high]
+
+    def isin(self, attribute: str, keys) -> list:
+        # a hash lookup per row, numpy.isin is slower on strings
+        return [i for i, value in enumerate(self[attribute]) if value in keys]
+
+    def rows(self, rows: list = None) -> list:
+        columns = self.values
+        if rows is not None:
+            columns = [[column[i] for i in rows] for column in columns]
+        # a required number must be there, anything else must not be empty
+        for i, label, number in self.schema.required:
+            assert all(value is not None if number else value for value in columns[i]), \
+                f"Invalid {self.schema.name}: no {label} provided"
+        return list(map(self.schema.build, *columns))
@@ -0,0 +1,166 @@
+import struct
+
+from utils.protocol import TlvWriter, TL, LENGTH
+
+STRING = 'string'
+FLOAT = 'float'
+INTEGER = 'integer'
+INTARR = 'intarr'
+
+FLOAT_STRUCT = struct.Struct('!f')
+
+# value of an optional field that did not arrive
+DEFAULTS = {
+    STRING: str,
+    FLOAT: float,
+    INTEGER: int,
+    INTARR: list,
+}
+
+
+def decode_string(raw, offset, length):
+    return str(raw[offset:offset + length], 'utf-8')
+
+
+def decode_float(raw, offset, length):
+    return FLOAT_STRUCT.unpack_from(raw, offset)[0]
+
+
+def decode_integer(raw, offset, length):
+    return LENGTH.unpack_from(raw, offset)[0]
+
+
+def decode_view(raw, offset, length):
+    # a lazy field: a slice of the received buffer, no copy
+    return raw[offset:offset + length]
+
+
+def decode_intarr(raw, offset, length):
+    return list(struct.unpack_from(f'!{length // LENGTH.size}I', raw, offset))
+
+
+DECODERS = {
+    STRING: decode_string,
+    FLOAT: decode_float,
+    INTEGER: decode_integer,
+    INTARR: decode_intarr,
+}
+
+ENCODERS = {
+    STRING: TlvWriter.string,
+    FLOAT: TlvWriter.float,
+    INTEGER: TlvWriter.integer,
+    INTARR: TlvWriter.intarr,
+}
+
+
+class Field:
+    """
+    A TLV field of an object. `attribute` is read from the object when
+    encoding, None to encode the object itself (a chunk of strings).
+    A required field must arrive and not be empty. A `dictionary` string
+    field repeats a few values, columnar chunks send each of them once.
+    """
+
+    def __init__(self, code: int, attribute: str = None, kind: str = STRING,
+                 repeated: bool = False, required: bool = True, label: str = None,
+                 dictionary: bool = False):
+        self.code = code
+        self.attribute = attribute
+        self.kind = kind
+        self.repeated = repeated
+        self.required = required
+        self.label = label or attribute
+        self.dictionary = dictionary
+
+
+class Schema:
+    """
+    Wire layout of a serializer: the object type code, its fields in the
+    order they are written and `build`, called with the decoded fields in
+    that same order. `chunk_code` is the code of the chunk header, None for
+    chunks sent without it. `columns_code` is the header code of the same
+    chunk in the columnar layout (see columns.py), None if not supported.
+
+    The encoder and decoder tables are built once, when the serializer
+    module is imported: decoding an object is a loop of `unpack_from` over
+    its bytes with no per object dicts.
+    """
+
+    def __init__(self, name: str, object_code: int, fields: list, build, chunk_code: int = None,
+                 columns_code: int = None):
+        self.name = name
+        self.object_code = object_code
+        self.chunk_code = chunk_code
+        self.columns_code = columns_code
+        self.fields = fields
+        self.build = build
+
+        # code -> (position, decoder, repeated)
+        self.decoders = {
+            field.code: (i, DECODERS[field.kind], field.repeated) for i, field in enumerate(fields)
+        }
+        self.encoders = [
+            (field.code, field.attribute, ENCODERS[field.kind], field.repeated) for field in fields
+        ]
+        self.lazy_decoders = {}
+        self.n_fields = len(fields)
+        # a required number must arrive, anything else must not be empty either
+        self.required = [
+            (i, field.label, field.kind in (FLOAT, INTEGER) and not field.repeated)
+            for i, field in enumerate(fields) if field.required
+        ]
+        self.optional = [
+            (i, list if field.repeated else DEFAULTS[field.kind]) for i, field in enumerate(fields) if not field.required
+        ]
+
+    def encode(self, chunk: list):
+        writer = TlvWriter()
+        if self.chunk_code is not None:
+            writer.header(self.chunk_code, len(chunk))
+
+        for obj in chunk:
+            position = writer.begin(self.object_code)
+            for code, attribute, encoder, repeated in self.encoders:
+                value = obj if attribute is None else getattr(obj, attribute)
+                if repeated:
+                    for item in value:
+                        encoder(writer, item, code)
+                else:
+                    encoder(writer, value, code)
+            writer.end(position)
+
+        return writer.to_bytes()
+
+    def decoders_for(self, lazy: tuple):
+        # fields in `lazy` are left as memoryviews of their bytes,
+        # string_from_bytes makes a str of them when (if) they are used
+        if lazy not in self.lazy_decoders:
+            self.lazy_decoders[lazy] = {
+                field.code: (i, decode_view if field.attribute in lazy else DECODERS[field.kind], field.repeated)
+                for i, field in enumerate(self.fields)
+            }
+        return self.lazy_decoders[lazy]
+
+    def decode(self, raw, offset: int, end: int, lazy: tuple = ()):
+        values = [None] * self.n_fields
+        decoders = self.decoders_for(lazy) if lazy else self.decoders
+        while offset < end:
+            code, length = TL.unpack_from(raw, offset)
+            offset += TL.size
+            position, decoder, repeated = decoders[code]
+            value = decoder(raw, offset, length)
+            offset += length
+            if not repeated:
+                values[position] = value
+            elif values[position] is None:
+                values[position] = [value]
+            else:
+                values[position].append(value)
+
+        for i, label, number in self.required:
+            assert values[i] is not None if number else values[i], f"Invalid {self.name}: no {label} provided"
+        for i, default in self.optional:
+            if values[i] is None:
+                values[i] = default()
+        return self.build(*values)
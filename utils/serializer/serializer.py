@@ -1,8 +1,12 @@
-from utils.protocol import TlvTypes, SIZE_LENGTH
+from utils.protocol import TlvTypes, SIZE_LENGTH, TL
 from utils.protocol import integer_from_bytes
+from utils.serializer import columns
 
 
 class Serializer:
+    # wire layout (schema.Schema), defined by every serializer
+    SCHEMA = None
+
     def read_t(self, reader):
         _type_raw = reader.read(TlvTypes.SIZE_CODE_MSG)
         _type = integer_from_bytes(_type_raw)
@@ -22,38 +26,50 @@ class Serializer:
 
         _list = []
         for i in range(n_chunks):
-            _tlv_type, tlv_len = self.read_tl(reader)
+            _tlv_type, tlv_len = TL.unpack(reader.read(TL.size))
             obj = self.from_bytes(reader, tlv_len)
             _list.append(obj)
 
         return _list
 
-    def from_bytes(self, reader, obj_length):
-        raw_dict = self.make_raw_dict()
-
-        bytes_readed = 0
-        while bytes_readed < obj_length:
-
-            field_type = self.read_t(reader)
-            bytes_readed += TlvTypes.SIZE_CODE_MSG
+    def from_buffer(self, raw, header=True, n_chunks=None, lazy=(), select=None):
+        """
+        Same as from_chunk, straight from the received bytes: objects are
+        decoded in place, by offset, without copying their fields out first.
+        Without a header nor n_chunks, objects are read up to the end.
+
+        A columnar chunk (to_columns) is decoded column by column, then
+        only the objects of the rows `select(columns)` returns are built
+        (all of them without select). Row chunks ignore select.
+        """
+        view = memoryview(raw)
+        offset = 0
+        if header:
+            code, n_chunks = TL.unpack_from(view, offset)
+            offset += TL.size
+            if code == self.SCHEMA.columns_code:
+                chunk = columns.decode(self.SCHEMA, view, offset, len(view), n_chunks, lazy)
+                return chunk.rows(select(chunk) if select else None)
 
-            length = self.read_l(reader)
-            bytes_readed += SIZE_LENGTH
+        _list = []
+        while offset < len(view) and (n_chunks is None or len(_list) < n_chunks):
+            _tlv_type, tlv_len = TL.unpack_from(view, offset)
+            offset += TL.size
+            _list.append(self.SCHEMA.decode(view, offset, offset + tlv_len, lazy))
+            offset += tlv_len
 
-            raw_field = reader.read(length)
-            bytes_readed += length
+        return _list
 
-            if isinstance(raw_dict[field_type], list):
-                raw_dict[field_type].append(raw_field)
-            else:
-                raw_dict[field_type] = raw_field
-        return self.from_raw_dict(raw_dict)
+    def from_bytes(self, reader, obj_length):
+        raw_obj = reader.read(obj_length)
+        return self.SCHEMA.decode(raw_obj, 0, len(raw_obj))
 
-    def make_raw_dict(self):
-        raise RuntimeError("Must be redefined")
+    def to_bytes(self, chunk: list):
+        return self.SCHEMA.encode(chunk)
 
-    def from_raw_dict(self, raw_dict):
-        raise RuntimeError("Must be redefined")
+    def to_columns(self, chunk: list):
+        return columns.encode(self.SCHEMA, chunk)
 
-    def to_bytes(self, chunk: list):
-        raise RuntimeError("Must be redefined")
+    def chunk_len(self, raw):
+        # objects in a chunk with header, as sent, whatever from_buffer selects
+        return TL.unpack_from(raw, 0)[1]